@@ -0,0 +1,113 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# The API lives in backend/ and is imported as top-level modules (main, models, ...)
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from main import app  # noqa: E402
+from database import Base, get_db  # noqa: E402
+from models import User, Hall, RoleEnum  # noqa: E402
+from auth import create_access_token, get_password_hash  # noqa: E402
+from metrics import instrument_engine  # noqa: E402
+from query_profiler import install_profiler, profile_queries  # noqa: E402
+from rate_limit import limiter  # noqa: E402
+from cache import cache  # noqa: E402
+
+_PASSWORD_HASHES = {}
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    instrument_engine(engine)
+    install_profiler(engine)
+    # Row ids repeat across per-test databases; never serve one test's rows to another
+    cache.clear_local()
+    cache.backend.flushall()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(db_engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db_engine):
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # Every test starts with full rate limit buckets
+    limiter.reset()
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    if previous is None:
+        app.dependency_overrides.pop(get_db, None)
+    else:
+        app.dependency_overrides[get_db] = previous
+
+
+@pytest.fixture
+def query_budget(db_engine):
+    """with query_budget(3): ... fails if the block runs more than 3 statements or an N+1"""
+    @contextmanager
+    def budget(max_queries, allow_n_plus_one=False):
+        with profile_queries() as profile:
+            yield profile
+        assert profile.count <= max_queries, f"query budget {max_queries} exceeded\n{profile.report()}"
+        if not allow_n_plus_one:
+            assert not profile.n_plus_one(), f"N+1 query pattern\n{profile.report()}"
+    return budget
+
+
+def make_user(db, email, role=RoleEnum.USER, password="secret123"):
+    # bcrypt is slow on purpose, so hash each test password only once
+    if password not in _PASSWORD_HASHES:
+        _PASSWORD_HASHES[password] = get_password_hash(password)
+    user = User(email=email, password=_PASSWORD_HASHES[password], full_name=email.split("@")[0], role=role)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def make_hall(db, owner, **fields):
+    values = {
+        "name": "Test Hall",
+        "capacity": 100,
+        "price_per_hour": 1000.0,
+        "facilities": "AC, Parking",
+        "location": "Chennai",
+        "available": True,
+    }
+    values.update(fields)
+    hall = Hall(owner_id=owner.id, **values)
+    db.add(hall)
+    db.commit()
+    db.refresh(hall)
+    return hall
+
+
+def auth_headers(user):
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
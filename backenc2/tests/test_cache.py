@@ -0,0 +1,154 @@
+import json
+import pickle
+import threading
+import time
+
+from .conftest import make_user, auth_headers, make_hall
+from cache import FakeRedis, TwoLevelCache, cache
+from models import RoleEnum
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_workers_share_the_second_tier_and_pubsub_invalidation():
+    server = FakeRedis()
+    worker_a, worker_b = TwoLevelCache(server), TwoLevelCache(server)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"name": "Grand Hall"}
+
+    assert worker_a.get_or_load("halls", 1, loader) == {"name": "Grand Hall"}
+    assert worker_b.get_or_load("halls", 1, loader) == {"name": "Grand Hall"}
+    assert len(calls) == 1
+
+    # B holds the value in its local tier; A's invalidation must reach it
+    server.delete(worker_b._shared_key("halls", 0, 1))
+    worker_a.invalidate("halls", 1)
+    assert _wait_for(lambda: worker_b.get("halls", 1) is None)
+
+
+def test_namespace_version_bump_retires_every_key():
+    server = FakeRedis()
+    worker_a, worker_b = TwoLevelCache(server), TwoLevelCache(server)
+    worker_a.set("recommendations", "similar:1:5", [2, 3])
+    assert worker_b.get("recommendations", "similar:1:5") == [2, 3]
+
+    worker_a.invalidate_namespace("recommendations")
+    assert worker_a.get("recommendations", "similar:1:5") is None
+    assert _wait_for(lambda: worker_b.get("recommendations", "similar:1:5") is None)
+
+
+def test_concurrent_misses_run_the_loader_once():
+    cache = TwoLevelCache(FakeRedis())
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("stats", "k", slow_loader)))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 10
+    assert len(calls) == 1
+
+
+def test_current_user_is_served_from_cache(client, db_session, query_budget):
+    user = make_user(db_session, "customer@example.com")
+    assert client.get("/api/auth/me", headers=auth_headers(user)).status_code == 200
+
+    with query_budget(0):
+        response = client.get("/api/auth/me", headers=auth_headers(user))
+    assert response.json()["email"] == "customer@example.com"
+
+
+def test_hall_update_is_visible_immediately(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    hall = make_hall(db_session, owner)
+    assert client.get(f"/api/halls/{hall.id}").json()["name"] == hall.name
+
+    response = client.put(f"/api/halls/{hall.id}", json={"name": "Renamed Hall"}, headers=auth_headers(owner))
+    assert response.status_code == 200
+    assert client.get(f"/api/halls/{hall.id}").json()["name"] == "Renamed Hall"
+
+
+def test_shared_tier_holds_json_without_credentials(client, db_session):
+    user = make_user(db_session, "customer@example.com")
+    assert client.get("/api/auth/me", headers=auth_headers(user)).status_code == 200
+    blob = cache.backend.get(cache._shared_key("users", cache.namespace_version("users"), user.email))
+    assert json.loads(blob)["email"] == user.email and "password" not in json.loads(blob)
+
+    # Handlers that need the hash still get it, loaded on access
+    response = client.put("/api/auth/profile", headers=auth_headers(user), json={
+        "current_password": "secret123", "new_password": "secret456", "confirm_password": "secret456"})
+    assert response.status_code == 200
+    assert client.post("/api/auth/login", json={"email": user.email, "password": "secret456"}).status_code == 200
+
+    # Bytes planted in the shared tier are never unpickled
+    server = FakeRedis()
+    worker = TwoLevelCache(server)
+    server.set(worker._shared_key("halls", 0, 1), pickle.dumps({"name": "Grand Hall"}))
+    assert worker.get("halls", 1) is None
+
+
+def test_load_lock_is_only_released_by_its_owner():
+    server = FakeRedis()
+    worker = TwoLevelCache(server)
+    lock_key = f"{worker._shared_key('stats', 0, 'k')}:lock"
+    server.set(lock_key, "other-worker", px=60_000, nx=True)
+    # The other worker never finishes; this one loads after waiting, and leaves that lock alone
+    assert worker.get_or_load("stats", "k", lambda: 42) == 42
+    assert server.get(lock_key) == b"other-worker"
+
+
+def test_lost_namespace_invalidation_is_bounded_by_the_local_ttl():
+    server = FakeRedis()
+    worker = TwoLevelCache(server, local_ttl=0.05)
+    worker.set("recommendations", "similar:1:5", [2, 3])
+    # A version bump whose pub/sub message never arrived
+    server.incr(f"{worker.prefix}:version:recommendations")
+    assert _wait_for(lambda: worker.get("recommendations", "similar:1:5") is None)
+
+
+def test_a_load_racing_an_invalidation_is_not_cached():
+    server = FakeRedis()
+    worker_a, worker_b = TwoLevelCache(server), TwoLevelCache(server)
+    rows = {"name": "Grand Hall"}
+
+    def racing_loader():
+        read = dict(rows)
+        # Another worker commits a change and invalidates while this load is in flight
+        rows["name"] = "Renamed"
+        worker_b.invalidate("halls", 1)
+        return read
+
+    assert worker_a.get_or_load("halls", 1, racing_loader) == {"name": "Grand Hall"}
+    assert worker_a.get("halls", 1) is None and worker_b.get("halls", 1) is None
+    assert worker_a.get_or_load("halls", 1, lambda: dict(rows)) == {"name": "Renamed"}
+    assert worker_b.get("halls", 1) == {"name": "Renamed"}
+
+
+def test_a_load_racing_a_namespace_invalidation_is_not_cached():
+    worker = TwoLevelCache(FakeRedis())
+
+    def racing_loader():
+        worker.invalidate_namespace("recommendations")
+        return [2, 3]
+
+    assert worker.get_or_load("recommendations", "similar:1:5", racing_loader) == [2, 3]
+    assert worker.get("recommendations", "similar:1:5") is None
@@ -0,0 +1,153 @@
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from .conftest import make_user, make_hall
+from catalog import Catalog, get_snapshot, prune_changes, start_pruning, stop_pruning
+from models import Hall, HallChange, RoleEnum
+from seed_data import generate
+from versioning import bump_hall_version, bump_owner_halls
+
+
+def _seed(db_engine, halls=2000):
+    generate(db_engine, owners=20, halls=halls, users=1, bookings=0, rollups=False, password_hash="x",
+             log=lambda message: None)
+
+
+def test_snapshot_matches_sql(db_engine, db_session):
+    _seed(db_engine)
+    snapshot = get_snapshot(db_session)
+
+    for filters in [{}, {"min_capacity": 200}, {"max_price": 1500, "location": "chennai"},
+                    {"min_capacity": 100, "max_price": 3000, "available": True}]:
+        query = db_session.query(Hall)
+        if "min_capacity" in filters:
+            query = query.filter(Hall.capacity >= filters["min_capacity"])
+        if "max_price" in filters:
+            query = query.filter(Hall.price_per_hour <= filters["max_price"])
+        if "location" in filters:
+            query = query.filter(Hall.location.ilike(f"%{filters['location']}%"))
+        if "available" in filters:
+            query = query.filter(Hall.available == filters["available"])
+
+        expected = [hall.id for hall in query.order_by(Hall.id)]
+        assert [hall.id for hall in snapshot.select(**filters)] == expected
+        by_price = [hall.id for hall in query.order_by(Hall.price_per_hour.desc(), Hall.id.desc())]
+        assert [hall.id for hall in snapshot.select(sort="-price", **filters)] == by_price
+
+
+def test_other_workers_catch_up_within_the_staleness_bound(db_engine, db_session):
+    _seed(db_engine, halls=300)
+    # A catalog outside the registry is not told about local commits, like another worker's
+    other_worker = Catalog(max_staleness_ms=50)
+    before = other_worker.snapshot(db_session)
+    untouched = before.get(2)
+
+    hall = db_session.get(Hall, 1)
+    hall.price_per_hour = 1.0
+    db_session.delete(db_session.get(Hall, 3))
+    db_session.commit()
+    bump_owner_halls(db_session, untouched.owner_id)
+    db_session.commit()
+
+    assert other_worker.snapshot(db_session) is before
+    time.sleep(0.06)
+    after = other_worker.snapshot(db_session)
+    assert after.get(1).price_per_hour == 1.0
+    assert after.get(3) is None and len(after) == 299
+    assert after.get(2) is not untouched  # reloaded: its owner's details are part of the row
+    assert after.get(300) is before.get(300)  # everything else is shared, not reloaded
+
+
+def test_out_of_order_commits_are_not_missed(db_engine, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    first, second = make_hall(db_session, owner, name="First"), make_hall(db_session, owner, name="Second")
+    other_worker = Catalog(max_staleness_ms=0)
+    last_seq = other_worker.snapshot(db_session).last_seq
+
+    # seq N+2 commits before N+1
+    first.name, second.name = "First v2", "Second v2"
+    db_session.flush()
+    db_session.query(HallChange).filter(HallChange.seq > last_seq).delete()
+    db_session.add(HallChange(seq=last_seq + 2, hall_id=second.id))
+    db_session.commit()
+    assert other_worker.snapshot(db_session).get(second.id).name == "Second v2"
+
+    db_session.add(HallChange(seq=last_seq + 1, hall_id=first.id))
+    db_session.commit()
+    assert other_worker.snapshot(db_session).get(first.id).name == "First v2"
+
+
+def test_fresh_listing_runs_no_queries(client, db_engine, query_budget):
+    _seed(db_engine, halls=50)
+    params = {"min_capacity": 100, "location": "mumbai", "limit": 10}
+    first = client.get("/api/halls/", params=params)
+    assert first.status_code == 200
+
+    with query_budget(0):
+        second = client.get("/api/halls/", params=params)
+    assert second.json() == first.json()
+    assert all(hall["owner"]["email"].startswith("owner") for hall in second.json())
+
+
+def test_local_writes_are_visible_immediately(client, db_engine):
+    session = sessionmaker(bind=db_engine)()
+    owner = make_user(session, "owner@example.com", RoleEnum.HALL_OWNER)
+    assert client.get("/api/halls/available").json() == []
+
+    make_hall(session, owner, name="Fresh Hall")
+    assert [hall["name"] for hall in client.get("/api/halls/available").json()] == ["Fresh Hall"]
+    session.close()
+
+
+def test_the_pruner_trims_the_change_log(db_engine, db_session):
+    db_session.add(HallChange(hall_id=999, changed_at=datetime.utcnow() - timedelta(days=1)))
+    db_session.commit()
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    hall = make_hall(db_session, owner)
+    assert db_session.query(HallChange).count() == 2
+
+    # The first round runs at start, so stopping straight away still prunes once
+    start_pruning(db_engine)
+    stop_pruning()
+    db_session.expire_all()
+    # Only the day-old entry is gone; recent changes may still be replayed by other workers
+    assert [change.hall_id for change in db_session.query(HallChange)] == [hall.id]
+    assert db_session.query(HallChange).one().changed_at > datetime.utcnow() - timedelta(minutes=1)
+
+
+def test_pruning_never_reuses_seqs(db_engine, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    hall = make_hall(db_session, owner)
+    db_session.query(HallChange).update({HallChange.changed_at: datetime.utcnow() - timedelta(days=1)})
+    db_session.commit()
+    other_worker = Catalog(max_staleness_ms=0)
+    last_seq = other_worker.snapshot(db_session).last_seq
+    prune_changes(db_engine)
+
+    hall.name = "Renamed"
+    bump_hall_version(db_session, hall)
+    db_session.commit()
+    assert db_session.query(func.min(HallChange.seq)).scalar() <= last_seq < \
+        db_session.query(func.max(HallChange.seq)).scalar()
+    assert other_worker.snapshot(db_session).get(hall.id).name == "Renamed"
+
+
+def test_version_moved_without_visible_changes_reloads(db_engine, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    hall = make_hall(db_session, owner)
+    other_worker = Catalog(max_staleness_ms=0)
+    before = other_worker.snapshot(db_session)
+
+    # A change whose log entry is gone (pruned, or its seq reused below last_seq)
+    hall.name = "Renamed"
+    bump_hall_version(db_session, hall)
+    db_session.flush()
+    db_session.query(HallChange).filter(HallChange.seq > before.last_seq).delete()
+    db_session.commit()
+
+    after = other_worker.snapshot(db_session)
+    assert after.catalog_version > before.catalog_version
+    assert after.get(hall.id).name == "Renamed"
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import scipy.sparse as sparse
+
+from .conftest import make_user, make_hall, auth_headers
+import collaborative
+from models import Booking, BookingStatusEnum, RoleEnum
+from seed_data import generate
+
+
+def _book(db, user, hall, status=BookingStatusEnum.APPROVED):
+    start = datetime(2030, 1, 1) + timedelta(days=db.query(Booking).count())
+    db.add(Booking(user_id=user.id, hall_id=hall.id, start_time=start, end_time=start + timedelta(hours=2),
+                   status=status))
+    db.commit()
+
+
+def test_fit_keeps_the_top_k_cosine_neighbours():
+    rng = np.random.default_rng(7)
+    bookings = (rng.random((400, 60)) < 0.08).astype(np.float32)
+    model = collaborative.fit(sparse.csr_matrix(bookings), np.arange(100, 160), top_k=4, chunk_size=9,
+                              log=lambda message: None)
+
+    norms = np.linalg.norm(bookings, axis=0)
+    normalized = bookings / np.where(norms > 0, norms, 1)
+    expected = normalized.T @ normalized
+    np.fill_diagonal(expected, 0)
+    for hall in range(60):
+        row = model.similarity[hall].toarray().ravel()
+        assert np.count_nonzero(row) <= 4 and row[hall] == 0
+        best = np.sort(expected[hall])[::-1][:np.count_nonzero(row)]
+        assert np.allclose(np.sort(row[row > 0])[::-1], best, atol=1e-6)
+    assert model.popularity.tolist() == bookings.sum(axis=0).astype(int).tolist()
+
+
+def test_train_from_bookings_and_reload(db_engine, db_session, tmp_path):
+    generate(db_engine, owners=10, halls=300, users=200, bookings=3000, rollups=False, password_hash="x",
+             log=lambda message: None)
+    model = collaborative.train(db_engine, top_k=10, chunk_size=64, log=lambda message: None)
+
+    pairs = {(user_id, hall_id) for user_id, hall_id, status in
+             db_session.query(Booking.user_id, Booking.hall_id, Booking.status)
+             if status not in collaborative.IGNORED_STATUSES}
+    assert int(model.popularity.sum()) == len(pairs)
+
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = collaborative.get_model(path)
+    assert collaborative.get_model(path) is loaded
+    assert (loaded.similarity != model.similarity).nnz == 0
+    booked = [hall_id for user_id, hall_id in pairs if user_id == 20]
+    assert loaded.recommend(booked, 5) == model.recommend(booked, 5)
+    assert not set(hall_id for hall_id, _ in loaded.recommend(booked)) & set(booked)
+
+
+def test_collaborative_endpoint(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(collaborative, "COLLABORATIVE_MODEL_PATH", str(tmp_path / "model.npz"))
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    wedding, reception, conference, popular = [make_hall(db_session, owner, name=name) for name in
+                                               ("Wedding Hall", "Reception Hall", "Conference Hall", "Popular Hall")]
+    customers = [make_user(db_session, f"customer{index}@example.com") for index in range(4)]
+    for customer in customers[:2]:
+        _book(db_session, customer, wedding)
+        _book(db_session, customer, reception)
+    for customer in customers:
+        _book(db_session, customer, popular)
+    _book(db_session, customers[3], conference, BookingStatusEnum.CANCELLED)
+
+    me = make_user(db_session, "me@example.com")
+    _book(db_session, me, wedding)
+    headers = auth_headers(me)
+
+    # No model yet: popular halls by sampling
+    assert len(client.get("/api/ai/collaborative?top_n=2", headers=headers).json()) == 2
+
+    collaborative.train(db_session.get_bind(), log=lambda message: None).save()
+    names = [hall["name"] for hall in client.get("/api/ai/collaborative", headers=headers).json()]
+    assert names[0] == "Reception Hall" and "Wedding Hall" not in names and "Conference Hall" not in names
+
+    # Without history, the most booked halls come first
+    stranger = make_user(db_session, "stranger@example.com")
+    response = client.get("/api/ai/collaborative?top_n=1", headers=auth_headers(stranger))
+    assert [hall["name"] for hall in response.json()] == ["Popular Hall"]
@@ -0,0 +1,31 @@
+from .conftest import make_user, make_hall
+from compression import choose_encoding
+from models import RoleEnum
+
+
+def test_choose_encoding_honours_q_values():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("") is None
+
+
+def test_large_responses_are_compressed(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    for number in range(30):
+        make_hall(db_session, owner, name=f"Hall {number}", description="x" * 100)
+
+    res = client.get("/api/halls/", headers={"Accept-Encoding": "gzip"})
+    assert res.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in res.headers["vary"].lower()
+    # httpx decodes transparently; the raw body must be smaller than the JSON
+    assert len(res.json()) == 30
+    assert int(res.headers["content-length"]) < len(res.content)
+
+    # The suffixed ETag still revalidates to a 304
+    etag = res.headers["etag"]
+    assert etag.endswith('-gzip"')
+    cached = client.get("/api/halls/", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .conftest import make_user, make_hall, auth_headers
+import demand_forecast
+import timeseries
+from demand_forecast import catalog_demand_curve, demand_curve, hour_of_week, rebuild_demand, slot_hours
+from models import Booking, Hall, HallDemand, RoleEnum
+from pricing import PriceCurve, quote_booking
+from seed_data import generate
+
+# 2030-01-05 is a Saturday
+SATURDAY_EVENING = datetime(2030, 1, 5, 18)
+
+
+def _curves(db_session):
+    return {(row.hall_id, row.hour_of_week): round(row.booked_hours, 6) for row in db_session.query(HallDemand)}
+
+
+def test_slot_hours_split_partial_hours_and_wrap_the_week():
+    # Sunday 22:30 -> Monday 01:15 crosses the end of the week
+    booking, slots, hours = slot_hours([datetime(2030, 1, 6, 22, 30)], [datetime(2030, 1, 7, 1, 15)])
+    assert slots.tolist() == [166, 167, 0, 1] and hours.tolist() == [0.5, 1.0, 1.0, 0.25]
+    assert booking.tolist() == [0, 0, 0, 0]
+
+
+def test_suggestions_bookings_and_quotes_agree_on_the_slot(monkeypatch):
+    monkeypatch.setattr(timeseries, "ANALYTICS_TIMEZONE", "America/New_York")
+    curve = PriceCurve.from_prices([float(slot) for slot in range(168)])
+    # Naive moments are UTC everywhere: 2030-01-05 23:00 UTC is Saturday 18:00 in New York
+    moment = datetime(2030, 1, 5, 23)
+    _, slots, _ = slot_hours([moment], [moment + timedelta(hours=1)])
+    assert hour_of_week(moment) == slots[0] == curve.quote(moment, moment + timedelta(hours=1)) == 5 * 24 + 18
+
+
+def test_rebuild_matches_a_booking_by_booking_sum(db_engine, db_session):
+    now = datetime(2030, 1, 1)
+    generate(db_engine, owners=5, halls=40, users=30, bookings=800, rollups=False, password_hash="x", now=now,
+             log=lambda message: None)
+    assert rebuild_demand(db_session, window_days=90, halls_per_chunk=16, now=now) > 0
+
+    expected = {}
+    for booking in db_session.query(Booking).filter(Booking.start_time >= now - timedelta(days=90)):
+        if booking.status in demand_forecast.IGNORED_STATUSES:
+            continue
+        moment = booking.start_time
+        while moment < booking.end_time:
+            step = min(booking.end_time, moment.replace(minute=0, second=0) + timedelta(hours=1))
+            hours = (step - moment).total_seconds() / 3600
+            key = (booking.hall_id, moment.weekday() * 24 + moment.hour)
+            expected[key] = expected.get(key, 0.0) + hours
+            moment = step
+    assert _curves(db_session) == {key: round(hours, 6) for key, hours in expected.items()}
+
+
+def test_bookings_update_curves_and_prices(client, db_session, query_budget):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "user@example.com")
+    busy = make_hall(db_session, owner, name="Busy Hall", price_per_hour=1000.0, capacity=100)
+    quiet = make_hall(db_session, owner, name="Quiet Hall", price_per_hour=1000.0, capacity=100)
+    headers = auth_headers(user)
+
+    def suggest(hall, when, duration=1):
+        response = client.get(f"/api/ai/pricing/suggest/{hall.id}", headers=headers,
+                              params={"event_datetime": when.isoformat(), "duration_hours": duration})
+        assert response.status_code == 200
+        return response.json()["suggested_price"]
+
+    # No history anywhere: the fixed rules
+    assert suggest(busy, SATURDAY_EVENING) == 1200.0
+
+    booking_ids = []
+    for week in range(10):
+        start = SATURDAY_EVENING + timedelta(weeks=week)
+        response = client.post("/api/bookings/", headers=headers, json={
+            "hall_id": busy.id, "start_time": start.isoformat(), "end_time": (start + timedelta(hours=4)).isoformat()})
+        assert response.status_code == 200, response.json()
+        booking_ids.append(response.json()["id"])
+    curve = demand_curve(db_session, busy.id)
+    assert curve[5 * 24 + 18] == 10.0 and curve.sum() == 40.0
+    assert np.array_equal(catalog_demand_curve(db_session), curve)
+
+    saturday, tuesday = suggest(busy, SATURDAY_EVENING), suggest(busy, datetime(2030, 1, 8, 9))
+    assert saturday > 1000.0 > tuesday
+    assert suggest(busy, SATURDAY_EVENING, duration=8) < saturday  # half of those hours are quiet
+    # The suggestion is what a booking of the event is charged per hour
+    hall = db_session.get(Hall, busy.id)
+    assert suggest(busy, SATURDAY_EVENING, duration=4) == round(
+        quote_booking(db_session, hall, SATURDAY_EVENING, SATURDAY_EVENING + timedelta(hours=4)) / 4, 2)
+    # The quiet hall has no history of its own and follows the catalog curve
+    assert suggest(quiet, SATURDAY_EVENING) > 1000.0 > suggest(quiet, datetime(2030, 1, 8, 9))
+
+    # Served from the snapshot and the multiplier cache
+    with query_budget(1):
+        suggest(busy, SATURDAY_EVENING)
+
+    assert client.delete(f"/api/bookings/{booking_ids[0]}", headers=headers).status_code == 200
+    assert demand_curve(db_session, busy.id).sum() == 36.0
+    # A booking invalidates the hall's cached multipliers at once
+    start = datetime(2030, 1, 8, 9)
+    response = client.post("/api/bookings/", headers=headers, json={
+        "hall_id": busy.id, "start_time": start.isoformat(), "end_time": (start + timedelta(hours=4)).isoformat()})
+    assert response.status_code == 200
+    assert suggest(busy, datetime(2030, 1, 8, 9)) > tuesday
+
+    rebuilt = _curves(db_session)
+    rebuild_demand(db_session, window_days=36500)
+    assert _curves(db_session) == rebuilt
+    assert len(rebuilt) == 8 and sum(rebuilt.values()) == 40.0
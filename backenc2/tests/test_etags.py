@@ -0,0 +1,60 @@
+from .conftest import make_user, make_hall, auth_headers
+from models import Hall, RoleEnum
+
+
+def test_hall_detail_revalidates_until_updated(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    hall = make_hall(db_session, owner)
+
+    first = client.get(f"/api/halls/{hall.id}")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+
+    cached = client.get(f"/api/halls/{hall.id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    client.put(f"/api/halls/{hall.id}", headers=auth_headers(owner), json={"name": "Renamed"})
+    changed = client.get(f"/api/halls/{hall.id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["name"] == "Renamed"
+    assert changed.headers["etag"] != etag
+
+    assert client.get("/api/halls/999999").status_code == 404
+
+
+def test_catalog_etag_tracks_filters_and_writes(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    make_hall(db_session, owner)
+
+    listing = client.get("/api/halls/?min_capacity=50")
+    other_filter = client.get("/api/halls/?min_capacity=500")
+    assert listing.headers["etag"] != other_filter.headers["etag"]
+
+    etag = listing.headers["etag"]
+    assert client.get("/api/halls/?min_capacity=50", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+    available_etag = client.get("/api/halls/available").headers["etag"]
+    client.post("/api/halls/", headers=auth_headers(owner), json={"name": "New Hall", "capacity": 80})
+
+    assert client.get("/api/halls/?min_capacity=50", headers={"If-None-Match": etag}).status_code == 200
+    refreshed = client.get("/api/halls/available", headers={"If-None-Match": available_etag})
+    assert refreshed.status_code == 200
+    assert len(refreshed.json()) == 2
+
+
+def test_hall_detail_never_pairs_a_new_etag_with_a_stale_cached_body(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    hall = make_hall(db_session, owner)
+    hall_id, version = hall.id, hall.version
+    assert client.get(f"/api/halls/{hall_id}").json()["name"] == hall.name  # now cached
+
+    # Another worker's write whose invalidation has not reached this one
+    db_session.query(Hall).filter(Hall.id == hall_id).update(
+        {Hall.name: "Renamed", Hall.version: Hall.version + 1}, synchronize_session=False
+    )
+    db_session.commit()
+
+    response = client.get(f"/api/halls/{hall_id}")
+    assert response.json()["name"] == "Renamed"
+    assert response.headers["etag"] == f'"hall-{hall_id}-{version + 1}"'
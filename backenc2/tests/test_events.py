@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+from .conftest import make_user, make_hall, auth_headers
+import events
+from demand_forecast import demand_curve
+from events import BookingCreated, BookingStatusChanged, HallChanged, UserChanged
+from models import Booking, BookingDailyStat, BookingStatusEnum, HallDailyUtilization, RoleEnum
+
+
+def _booking(user, hall, day):
+    start = datetime(2030, 1, 1, 10) + timedelta(days=day)
+    return Booking(user_id=user.id, hall_id=hall.id, start_time=start, end_time=start + timedelta(hours=2))
+
+
+def test_flushes_become_typed_events_after_commit(db_session):
+    seen = []
+    handler = events.subscribe((HallChanged, BookingCreated, BookingStatusChanged, UserChanged), seen.append)
+    try:
+        owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+        hall = make_hall(db_session, owner)
+        assert [type(event) for event in seen] == [UserChanged, HallChanged]
+        assert seen[1].created and "price_per_hour" in seen[1].changed
+
+        del seen[:]
+        booking = _booking(owner, hall, 0)
+        db_session.add(booking)
+        db_session.flush()
+        assert not seen  # nothing before the commit
+        booking.status = "APPROVED"
+        hall.price_per_hour = 1500.0
+        db_session.commit()
+        assert seen[0] == BookingCreated(booking.id, hall.id, owner.id, BookingStatusEnum.PENDING)
+        assert set(seen[1:]) == {
+            HallChanged(hall.id, owner.id, frozenset({"price_per_hour"})),
+            BookingStatusChanged(booking.id, hall.id, owner.id, BookingStatusEnum.PENDING, BookingStatusEnum.APPROVED),
+        }
+        # Inserted and moved in one transaction: each event accounts for its own step only
+        stats = {BookingStatusEnum(row.status): row.bookings for row in db_session.query(BookingDailyStat)}
+        assert stats == {BookingStatusEnum.PENDING: 0, BookingStatusEnum.APPROVED: 1}
+        assert db_session.query(HallDailyUtilization).one().booked_hours == 2.0
+        assert demand_curve(db_session, hall.id).sum() == 2.0
+
+        del seen[:]
+        owner.email = "new-owner@example.com"
+        db_session.commit()
+        assert seen == [UserChanged(owner.id, frozenset({"owner@example.com", "new-owner@example.com"}),
+                                    frozenset({"email"}))]
+
+        del seen[:]
+        booking.status = BookingStatusEnum.CANCELLED
+        db_session.flush()
+        db_session.rollback()
+        db_session.commit()
+        assert not seen
+    finally:
+        events.unsubscribe(handler)
+
+
+def test_rollups_follow_status_writes_without_hooks(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "user@example.com")
+    hall = make_hall(db_session, owner)
+    start = datetime(2030, 1, 1, 10)
+    response = client.post("/api/bookings/", headers=auth_headers(user), json={
+        "hall_id": hall.id, "start_time": start.isoformat(), "end_time": (start + timedelta(hours=3)).isoformat()})
+    assert response.status_code == 200
+    assert demand_curve(db_session, hall.id).sum() == 3.0
+
+    client.put(f"/api/owner/bookings/{response.json()['id']}/approve", headers=auth_headers(owner))
+    assert db_session.query(HallDailyUtilization).one().booked_hours == 3.0
+
+    # A plain assignment anywhere is enough to keep every rollup in step
+    booking = db_session.get(Booking, response.json()["id"])
+    booking.status = BookingStatusEnum.CANCELLED
+    db_session.commit()
+    assert demand_curve(db_session, hall.id).sum() == 0.0
+    assert db_session.query(HallDailyUtilization).one().booked_hours == 0.0
+
+
+def test_batched_subscribers_get_every_event_in_bounded_batches(db_session):
+    batches = []
+    queue = events.subscribe_batched(BookingCreated, batches.append, maxsize=8, batch_size=10, max_delay=0.01)
+    try:
+        owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+        hall = make_hall(db_session, owner)
+        db_session.add_all([_booking(owner, hall, day) for day in range(25)])
+        db_session.commit()
+        queue.join()
+    finally:
+        queue.close()
+    assert sum(len(batch) for batch in batches) == 25 and max(len(batch) for batch in batches) <= 10
+    assert len({event.booking_id for batch in batches for event in batch}) == 25
+
+    db_session.add(_booking(owner, hall, 30))
+    db_session.commit()
+    assert sum(len(batch) for batch in batches) == 25
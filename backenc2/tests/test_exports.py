@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from .conftest import make_user, make_hall, auth_headers
+from models import Booking, BookingStatusEnum, RoleEnum
+
+
+def _seed(db, owner, other_owner, user):
+    mine = make_hall(db, owner, name="Mine")
+    theirs = make_hall(db, other_owner, name="Theirs")
+    start = datetime(2030, 5, 1, 10)
+    for day in range(5):
+        for hall in (mine, theirs):
+            db.add(Booking(
+                user_id=user.id, hall_id=hall.id,
+                start_time=start + timedelta(days=day), end_time=start + timedelta(days=day, hours=2),
+                total_amount=100.0, event_name="Meetup, with comma",
+                status=BookingStatusEnum.APPROVED if day % 2 else BookingStatusEnum.PENDING
+            ))
+    db.commit()
+    return mine
+
+
+def test_owner_csv_export_is_scoped_and_filtered(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    other = make_user(db_session, "other@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "user@example.com")
+    mine = _seed(db_session, owner, other, user)
+
+    res = client.get("/api/owner/bookings/export?format=csv", headers=auth_headers(owner))
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(res.text)))
+    assert len(rows) == 5
+    assert {row["hall_id"] for row in rows} == {str(mine.id)}
+    assert rows[0]["event_name"] == "Meetup, with comma"
+
+    res = client.get(
+        "/api/owner/bookings/export?format=ndjson&status=APPROVED&start=2030-05-02T00:00:00",
+        headers=auth_headers(owner),
+    )
+    records = [json.loads(line) for line in res.text.splitlines()]
+    assert [record["status"] for record in records] == ["APPROVED", "APPROVED"]
+
+
+def test_admin_export_requires_admin(client, db_session):
+    admin = make_user(db_session, "admin@example.com", RoleEnum.ADMIN)
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "user@example.com")
+    _seed(db_session, owner, admin, user)
+
+    assert client.get("/api/bookings/export", headers=auth_headers(user)).status_code == 403
+    res = client.get("/api/bookings/export?format=ndjson", headers=auth_headers(admin))
+    assert len(res.text.splitlines()) == 10
+    assert client.get("/api/bookings/export?format=xml", headers=auth_headers(admin)).status_code == 400
@@ -0,0 +1,67 @@
+from sqlalchemy import select
+
+from .conftest import make_user, auth_headers
+import facilities
+from models import HallFacility, RoleEnum
+from seed_data import generate
+
+
+def _create(client, owner, name, text):
+    response = client.post("/api/halls/", headers=auth_headers(owner), json={"name": name, "facilities": text})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_facility_filter_is_an_exact_and(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    _create(client, owner, "Both", "AC, Parking, Stage")
+    _create(client, owner, "Only AC", "ac")
+    _create(client, owner, "Acoustic", "Acoustic Panels, Parking")
+
+    def names(value):
+        return sorted(hall["name"] for hall in client.get("/api/halls/", params={"facilities": value}).json())
+
+    assert names("ac,parking") == ["Both"]
+    assert names("AC") == ["Both", "Only AC"]
+    assert names("parking, acoustic  panels") == ["Acoustic"]
+    assert names("ac,helipad") == []
+
+
+def test_join_rows_follow_updates_and_deletes(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    hall_id = _create(client, owner, "Hall", "AC, Parking")
+
+    client.put(f"/api/halls/{hall_id}", headers=auth_headers(owner), json={"name": "Hall", "facilities": "WiFi"})
+    assert [hall["name"] for hall in client.get("/api/halls/", params={"facilities": "wifi"}).json()] == ["Hall"]
+    assert client.get("/api/halls/", params={"facilities": "ac"}).json() == []
+
+    client.delete(f"/api/halls/{hall_id}", headers=auth_headers(owner))
+    assert db_session.query(HallFacility).count() == 0
+
+
+def test_facets_count_the_filtered_result_set(client, db_session, query_budget):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    _create(client, owner, "One", "AC, Parking, Stage")
+    _create(client, owner, "Two", "AC, Parking")
+    _create(client, owner, "Three", "Parking")
+
+    with query_budget(4):
+        facets = client.get("/api/halls/facets", params={"facilities": "parking", "min_capacity": 0}).json()
+    assert facets["total"] == 3
+    assert [(facet["slug"], facet["count"]) for facet in facets["facilities"]] == [
+        ("parking", 3), ("ac", 2), ("stage", 1)
+    ]
+
+    facets = client.get("/api/halls/facets", params={"facilities": "ac"}).json()
+    assert facets["total"] == 2
+    assert {facet["slug"]: facet["count"] for facet in facets["facilities"]} == {"ac": 2, "parking": 2, "stage": 1}
+
+
+def test_seeded_links_match_a_backfill(db_engine):
+    generate(db_engine, owners=3, halls=300, users=1, bookings=0, rollups=False, password_hash="x",
+             log=lambda message: None)
+    table = HallFacility.__table__
+    with db_engine.begin() as conn:
+        seeded = set(conn.execute(select(table.c.hall_id, table.c.facility_id)).all())
+        assert facilities.backfill(conn, batch_size=64) == 300
+        assert set(conn.execute(select(table.c.hall_id, table.c.facility_id)).all()) == seeded
@@ -0,0 +1,81 @@
+import random
+
+from sqlalchemy import event
+
+from .conftest import make_user, auth_headers
+import geo
+from models import Hall, RoleEnum
+from routers.ai_recommendations import SimpleRecommendationEngine
+from seed_data import generate
+
+
+def test_geohash_round_trip():
+    assert geo.encode(57.64911, 10.40744) == "u4pruydqq"
+    min_lat, min_lng, max_lat, max_lng = geo.bounds("u4pruydqq")
+    assert min_lat <= 57.64911 <= max_lat and min_lng <= 10.40744 <= max_lng
+
+
+def test_radius_and_nearest_match_a_full_scan(db_engine, db_session):
+    generate(db_engine, owners=5, halls=3000, users=1, bookings=0, rollups=False, password_hash="x",
+             log=lambda message: None)
+    query = db_session.query(Hall)
+    rows = query.with_entities(Hall.id, Hall.latitude, Hall.longitude).all()
+    rng = random.Random(7)
+
+    for lat, lng in [(13.08, 80.27), (19.1, 72.85), (28.5, 77.3), (11.0, 78.0)]:
+        distances = sorted((geo.haversine_km(lat, lng, row[1], row[2]), row[0]) for row in rows)
+        radius = rng.choice([0.5, 3.0, 15.0])
+        expected = [hall_id for distance, hall_id in distances if distance <= radius]
+        assert [hall.id for hall, _ in geo.within_radius(query, lat, lng, radius)] == expected
+        assert [hall.id for hall, _ in geo.nearest(query, lat, lng, 10)] == [hall_id for _, hall_id in distances[:10]]
+
+
+def test_list_halls_near_a_point(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    for name, lat, lng in [("Marina", 13.05, 80.28), ("T Nagar", 13.04, 80.23), ("Mumbai", 19.07, 72.88),
+                           ("Unmapped", None, None)]:
+        response = client.post("/api/halls/", headers=auth_headers(owner),
+                               json={"name": name, "latitude": lat, "longitude": lng})
+        assert response.status_code == 200
+
+    near = client.get("/api/halls/", params={"lat": 13.06, "lng": 80.27, "radius_km": 50}).json()
+    assert [hall["name"] for hall in near] == ["Marina", "T Nagar"]
+    assert near[0]["distance_km"] < near[1]["distance_km"] < 50
+
+    nearest = client.get("/api/halls/", params={"lat": 18.0, "lng": 73.0, "nearest": 1}).json()
+    assert [hall["name"] for hall in nearest] == ["Mumbai"]
+    assert client.get("/api/halls/", params={"lat": 13.0}).status_code == 400
+
+
+def test_radius_pages_build_rows_for_the_page_only(client, db_engine):
+    generate(db_engine, owners=5, halls=3000, users=1, bookings=0, rollups=False, password_hash="x",
+             log=lambda message: None)
+    params = {"lat": 13.08, "lng": 80.27, "radius_km": 25, "limit": 5}
+    everything = client.get("/api/halls/", params={**params, "limit": 1000}).json()
+    by_price = client.get("/api/halls/", params={**params, "sort": "-price", "limit": 1000}).json()
+    assert len(everything) > 20
+
+    built = []
+
+    def on_load(hall, context):
+        built.append(hall.id)
+
+    event.listen(Hall, "load", on_load)
+    try:
+        page = client.get("/api/halls/", params={**params, "skip": 10}).json()
+        priced = client.get("/api/halls/", params={**params, "skip": 10, "sort": "-price"}).json()
+    finally:
+        event.remove(Hall, "load", on_load)
+    assert [hall["id"] for hall in page] == [hall["id"] for hall in everything[10:15]]
+    assert [hall["id"] for hall in priced] == [hall["id"] for hall in by_price[10:15]]
+    assert sorted(built) == sorted(hall["id"] for hall in page + priced)
+
+
+def test_similarity_prefers_nearby_halls():
+    target = Hall(id=1, latitude=13.05, longitude=80.28, location="Downtown, Chennai")
+    nearby = Hall(id=2, latitude=13.06, longitude=80.27, location="Adyar, Chennai")
+    far = Hall(id=3, latitude=19.07, longitude=72.88, location="Downtown, Mumbai")
+
+    # Shared "Downtown" in the text no longer counts; distance does
+    similar = SimpleRecommendationEngine().get_similar_halls(1, [target, far, nearby], top_n=2)
+    assert similar == [nearby, far]
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from .conftest import make_user, make_hall, auth_headers
+import hall_embeddings
+from hall_embeddings import HallIndex, LSHIndex, build_from_db
+from models import RoleEnum
+from routers import ai_recommendations
+from routers.ai_engines import HallRecommendationEngine
+from seed_data import generate_halls, iter_halls
+
+
+def _halls(count=2000):
+    return list(iter_halls(generate_halls(np.random.default_rng(3), count, 20)))
+
+
+def test_lsh_recall_against_brute_force():
+    index = HallIndex.build(_halls()).index
+    hits = 0
+    for hall_id in range(1, 201):
+        vector = index.vector(hall_id)
+        kth_best = index.exact_search(vector, 10, exclude=hall_id)[-1][1]
+        found = index.search(vector, 10, exclude=hall_id)
+        assert hall_id not in [found_id for found_id, _ in found]
+        hits += sum(score >= kth_best - 1e-5 for _, score in found)
+    assert hits / 2000 >= 0.9
+
+
+def test_incremental_updates_and_persistence(tmp_path):
+    halls = _halls(500)
+    hall_index = HallIndex.build(halls[:400])
+    hall_index.add_halls(halls[400:])
+    assert len(hall_index.index) == 500
+
+    twin = dict(halls[10], id=10_000)
+    hall_index.add_halls([twin])
+    assert hall_index.similar(10_000, 1)[0][0] == halls[10]["id"]
+
+    # Re-embedding an edited hall moves it; removed halls are never returned
+    hall_index.add_halls([dict(twin, name="Rooftop garden", description="Open air terrace")])
+    hall_index.index.remove([halls[10]["id"]])
+    assert all(hall_id != halls[10]["id"] for hall_id, _ in hall_index.similar(11, 50))
+    assert len(hall_index.index) == 500
+
+    path = str(tmp_path / "index.pkl")
+    hall_index.save(path)
+    loaded = HallIndex.load(path)
+    for hall_id in (1, 250, 499, 10_000):
+        assert loaded.similar(hall_id, 5) == hall_index.similar(hall_id, 5)
+    assert loaded.index._buckets == hall_index.index._buckets
+
+
+def test_index_grows_and_reuses_rows():
+    index = LSHIndex(dim=4, tables=2, bits=3)
+    rng = np.random.default_rng(0)
+    index.add(range(1500), rng.standard_normal((1500, 4)))
+    index.remove(range(100))
+    index.add(range(2000, 2100), rng.standard_normal((100, 4)))
+    assert len(index) == 1500 and len(index.ids) == 1500
+    assert sorted(row for buckets in index._buckets[:1] for posting in buckets.values() for row in posting) == \
+        sorted(index.rows.values())
+
+
+def test_recommendation_engine_uses_the_index():
+    halls = pd.DataFrame(_halls(300))
+    halls.loc[5, "description"] = None
+    engine = HallRecommendationEngine()
+    similar = engine.get_similar_halls(1, halls, top_n=5)
+    assert len(similar) == 5 and 1 not in similar
+
+    engine.add_halls(pd.DataFrame([dict(halls.iloc[0], id=999)]))
+    assert engine.get_similar_halls(1, halls, top_n=1) == [999]
+
+
+def test_similar_endpoint_serves_from_the_index(client, db_session, db_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(hall_embeddings, "HALL_INDEX_PATH", str(tmp_path / "index.pkl"))
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    rooftop = dict(description="Open air rooftop terrace with a city skyline view", facilities="Bar, Lounge")
+    target = make_hall(db_session, owner, name="Skyline Rooftop", **rooftop)
+    closed = make_hall(db_session, owner, name="Skyline Deck", available=False, **rooftop)
+    for number in range(20):
+        make_hall(db_session, owner, name=f"Banquet Hall {number}", description="Indoor wedding banquet ballroom")
+    # Last, so the route's id-ordered error fallback cannot return it first
+    twin = make_hall(db_session, owner, name="Skyline Terrace", **rooftop)
+    headers = auth_headers(make_user(db_session, "user@example.com"))
+
+    # No index yet: the catalog scan still answers
+    assert len(client.get(f"/api/ai/similar/{target.id}?top_n=3", headers=headers).json()) == 3
+
+    build_from_db(db_engine, log=lambda message: None).save()
+    monkeypatch.setattr(ai_recommendations.recommendation_engine, "get_similar_halls",
+                        lambda *args: (_ for _ in ()).throw(AssertionError("scanned the catalog")))
+    similar = client.get(f"/api/ai/similar/{target.id}?top_n=2", headers=headers).json()
+    assert similar[0]["id"] == twin.id
+    assert closed.id not in [hall["id"] for hall in similar] and len(similar) == 2
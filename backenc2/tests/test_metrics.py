@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+from .conftest import make_user, make_hall
+from metrics import (
+    OPEN_STREAMS, REQUEST_DB_QUERIES, REQUEST_DURATION, REQUESTS_IN_FLIGHT, REQUESTS_TOTAL, RESPONSE_SIZE,
+    Histogram, MetricsMiddleware
+)
+from models import RoleEnum
+
+
+def test_requests_are_labelled_by_route_template(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    hall = make_hall(db_session, owner)
+    labels = ("GET", "/api/halls/{hall_id}")
+    before_ok = REQUESTS_TOTAL.value(labels + ("200",))
+    before_missing = REQUESTS_TOTAL.value(labels + ("404",))
+    before_queries = REQUEST_DB_QUERIES.total(labels)
+
+    assert client.get(f"/api/halls/{hall.id}").status_code == 200
+    assert client.get("/api/halls/999999").status_code == 404
+
+    assert REQUESTS_TOTAL.value(labels + ("200",)) == before_ok + 1
+    assert REQUESTS_TOTAL.value(labels + ("404",)) == before_missing + 1
+    # Queries run in the threadpool are still attributed to the request
+    assert REQUEST_DB_QUERIES.total(labels) > before_queries
+
+
+def test_metrics_endpoint_uses_prometheus_format(client):
+    client.get("/health")
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = res.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/health",le="+Inf"}' in body
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in body
+    assert "http_requests_in_flight 1" in body
+
+
+def test_middleware_overhead_stays_within_budget():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    async def timed(handler, rounds=2000):
+        scope = {"type": "http", "method": "GET", "path": "/bench", "headers": []}
+        started = time.perf_counter()
+        for _ in range(rounds):
+            await handler(dict(scope), receive, send)
+        return (time.perf_counter() - started) / rounds
+
+    wrapped = MetricsMiddleware(app)
+    # Best of several runs to keep scheduler noise out of the comparison
+    bare = min(asyncio.run(timed(app)) for _ in range(3))
+    instrumented = min(asyncio.run(timed(wrapped)) for _ in range(3))
+
+    assert REQUEST_DURATION.count(("GET", "<unmatched>")) >= 6000
+    assert instrumented - bare < 50e-6, f"metrics overhead {(instrumented - bare) * 1e6:.1f}us per request"
+
+
+def test_event_streams_leave_in_flight_once_their_headers_are_sent():
+    observed = {}
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8")]})
+        observed["in_flight"] = REQUESTS_IN_FLIGHT.value()
+        observed["open"] = OPEN_STREAMS.value(("<unmatched>",))
+        await asyncio.sleep(0.2)  # an idle dashboard
+        await send({"type": "http.response.body", "body": b": keepalive\n\n"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    labels = ("GET", "<unmatched>")
+    in_flight = REQUESTS_IN_FLIGHT.value()
+    durations, sizes = REQUEST_DURATION.count(labels), RESPONSE_SIZE.count(labels)
+    before_sum = REQUEST_DURATION.total(labels)
+    asyncio.run(MetricsMiddleware(app)({"type": "http", "method": "GET", "path": "/stream", "headers": []},
+                                       receive, send))
+
+    assert observed == {"in_flight": in_flight, "open": 1}
+    assert REQUESTS_IN_FLIGHT.value() == in_flight and OPEN_STREAMS.value(("<unmatched>",)) == 0
+    # Timed to the headers, not for as long as the connection stayed open
+    assert REQUEST_DURATION.count(labels) == durations + 1
+    assert REQUEST_DURATION.total(labels) - before_sum < 0.1
+    assert RESPONSE_SIZE.count(labels) == sizes
+
+
+def test_render_while_new_series_are_added():
+    histogram = Histogram("render_race_seconds", "test")
+    routes = 500
+    stop = threading.Event()
+
+    def observe():
+        for route in range(routes):
+            if stop.is_set():
+                return
+            histogram.observe(("GET", f"/r{route}"), 0.01)
+
+    writer = threading.Thread(target=observe)
+    writer.start()
+    try:
+        renders = 0
+        while writer.is_alive() or renders < 20:
+            histogram.render()  # would raise "dictionary changed size during iteration"
+            renders += 1
+    finally:
+        stop.set()
+        writer.join()
+    assert sum(line.startswith("render_race_seconds_count") for line in histogram.render()) == routes
@@ -0,0 +1,119 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from .conftest import make_user, make_hall, auth_headers
+from auth import create_access_token, get_stream_owner
+from cache import cache
+from models import RoleEnum
+from owner_feed import OwnerFeed, feed
+
+
+async def _next_event(stream):
+    """Next SSE chunk that is not a keepalive, as a list of (id, event, data) tuples"""
+    while True:
+        chunk = (await asyncio.wait_for(stream.__anext__(), 5)).decode()
+        if not chunk.startswith(":"):
+            break
+    events = []
+    for block in filter(None, chunk.split("\n\n")):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["id"], fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_deltas_resume_from_last_event_id_and_slow_clients_are_reset(db_engine):
+    owner_feed = OwnerFeed(cache.backend, channel="test-owner-feed", replay_size=4, keepalive=0.05)
+
+    async def scenario():
+        stream = owner_feed.stream(7)
+        assert (await stream.__anext__()).startswith(b"retry:")
+        assert owner_feed.connection_count() == 1
+
+        # Published from another thread (as a request handler would), through pub/sub
+        await asyncio.to_thread(owner_feed.publish, 8, "booking_created", {"booking_id": 99})
+        await asyncio.to_thread(owner_feed.publish, 7, "booking_created", {"booking_id": 1})
+        [(first_id, kind, data)] = await _next_event(stream)
+        assert kind == "booking_created" and data == {"booking_id": 1}
+        await stream.aclose()
+        assert owner_feed.connection_count() == 0
+
+        # Reconnecting with Last-Event-ID replays what was missed, in one write
+        owner_feed.apply('7|booking_status_changed|{"booking_id": 1, "new_status": "APPROVED"}')
+        owner_feed.apply('7|booking_created|{"booking_id": 2}')
+        stream = owner_feed.stream(7, first_id)
+        await stream.__anext__()
+        missed = await _next_event(stream)
+        assert [(kind, data["booking_id"]) for _, kind, data in missed] == [
+            ("booking_status_changed", 1), ("booking_created", 2)]
+
+        # A client that stops reading is not queued for: once it is further
+        # behind than the buffer, it is told to refetch
+        for booking_id in range(3, 9):
+            owner_feed.apply(f'7|booking_created|{{"booking_id": {booking_id}}}')
+        assert len(owner_feed._owners[7].deltas) == 4
+        [(_, kind, _)] = await _next_event(stream)
+        assert kind == "reset"
+        owner_feed.apply('7|booking_created|{"booking_id": 9}')
+        assert [data for _, _, data in await _next_event(stream)] == [{"booking_id": 9}]
+        await stream.aclose()
+
+        # Ids from another worker (or a restarted one) cannot be resumed either
+        for last_event_id in ("0123456789ab-3", f"{owner_feed.origin}-999", "garbage"):
+            stream = owner_feed.stream(7, last_event_id)
+            await stream.__anext__()
+            assert [kind for _, kind, _ in await _next_event(stream)] == ["reset"]
+            await stream.aclose()
+        # Owners nobody watches on this worker are not buffered
+        assert 8 not in owner_feed._owners
+
+    asyncio.run(scenario())
+
+
+def test_booking_writes_reach_the_owner_stream(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "user@example.com")
+    hall = make_hall(db_session, owner)
+    start = datetime(2030, 1, 1, 10)
+
+    assert client.get("/api/owner/stream").status_code == 401
+    assert client.get("/api/owner/stream", headers=auth_headers(user)).status_code == 403
+    assert client.post("/api/owner/stream-token", headers=auth_headers(user)).status_code == 403
+
+    async def scenario():
+        stream = feed.stream(owner.id)
+        await stream.__anext__()
+        response = await asyncio.to_thread(client.post, "/api/bookings/", headers=auth_headers(user), json={
+            "hall_id": hall.id, "start_time": start.isoformat(), "end_time": (start + timedelta(hours=2)).isoformat()})
+        booking = response.json()
+        [(_, kind, data)] = await _next_event(stream)
+        assert kind == "booking_created"
+        assert data["booking_id"] == booking["id"] and data["hall_id"] == hall.id and data["status"] == "PENDING"
+        assert data["total_amount"] == booking["total_amount"]
+
+        await asyncio.to_thread(client.put, f"/api/owner/bookings/{booking['id']}/approve",
+                                headers=auth_headers(owner))
+        [(_, kind, data)] = await _next_event(stream)
+        assert (kind, data["old_status"], data["new_status"]) == ("booking_status_changed", "PENDING", "APPROVED")
+        await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_query_string_only_takes_short_lived_stream_tokens(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    res = client.post("/api/owner/stream-token", headers=auth_headers(owner))
+    assert res.status_code == 200
+    stream_token = res.json()["stream_token"]
+
+    assert get_stream_owner(stream_token=stream_token, credentials=None, db=db_session).id == owner.id
+    # The long-lived API token would end up in access logs, so it is refused in the query string
+    with pytest.raises(HTTPException) as refused:
+        get_stream_owner(stream_token=create_access_token(data={"sub": owner.email}), credentials=None,
+                         db=db_session)
+    assert refused.value.status_code == 401
+    # and a stream token opens nothing but the stream
+    assert client.get("/api/owner/halls", headers={"Authorization": f"Bearer {stream_token}"}).status_code == 401
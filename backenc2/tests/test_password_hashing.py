@@ -0,0 +1,47 @@
+import threading
+import time
+
+from .conftest import make_user
+import password_hashing
+from models import User
+
+
+def test_login_rehashes_when_cost_changes(client, db_session):
+    user = make_user(db_session, "customer@example.com")
+    user.password = password_hashing._hash("secret123", 4)
+    db_session.commit()
+    assert password_hashing.needs_rehash(user.password)
+
+    res = client.post("/api/auth/login", json={"email": "customer@example.com", "password": "secret123"})
+    assert res.status_code == 200
+
+    db_session.expire_all()
+    stored = db_session.query(User).filter(User.email == "customer@example.com").one().password
+    assert stored.startswith(f"$2b${password_hashing.BCRYPT_ROUNDS:02d}$")
+    assert not password_hashing.needs_rehash(stored)
+    assert client.post("/api/auth/login", json={
+        "email": "customer@example.com", "password": "wrong-password"
+    }).status_code == 401
+
+
+def test_saturated_pool_rejects_fast_with_retry_after(client, db_session):
+    make_user(db_session, "customer@example.com")
+    password_hashing.configure(workers=0, max_pending=1)
+    release = threading.Event()
+    # Occupy the only slot with work that blocks until released
+    blocker = threading.Thread(target=password_hashing._pool.run, args=(release.wait,))
+    blocker.start()
+    try:
+        while password_hashing.pool_stats()["pending"] < 1:
+            time.sleep(0.001)
+        started = time.perf_counter()
+        res = client.post("/api/auth/login", json={"email": "customer@example.com", "password": "secret123"})
+        assert res.status_code == 503
+        assert res.headers["retry-after"] == "1"
+        assert time.perf_counter() - started < 0.5
+    finally:
+        release.set()
+        blocker.join()
+        password_hashing.configure(workers=password_hashing.PASSWORD_HASH_WORKERS,
+                                   max_pending=password_hashing.PASSWORD_HASH_MAX_PENDING)
+    assert password_hashing.pool_stats()["pending"] == 0
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from .conftest import make_user, make_hall, auth_headers
+from catalog import get_snapshot
+from models import Booking, RoleEnum, UserProfile, UserRecommendation
+from personalization import run_batch
+from routers.ai_recommendations import SimplePreferenceEngine
+from seed_data import generate
+
+
+def _seed(db_engine):
+    generate(db_engine, owners=20, halls=1500, users=40, bookings=600, rollups=False, password_hash="x",
+             log=lambda message: None)
+
+
+def _stored(db_session, user_id):
+    return [hall_id for (hall_id,) in db_session.query(UserRecommendation.hall_id)
+            .filter(UserRecommendation.user_id == user_id).order_by(UserRecommendation.rank)]
+
+
+def test_batch_matches_the_preference_engine(db_engine, db_session):
+    _seed(db_engine)
+    assert run_batch(db_engine, top_n=10, chunk_size=7, active_days=3650, log=lambda message: None) > 30
+
+    snapshot = get_snapshot(db_session)
+    every_hall = [snapshot.get(hall_id) for hall_id in sorted(snapshot.index)]
+    available = [hall for hall in every_hall if hall.available]
+    for user_id in range(22, 32):
+        booked = {booking.hall_id for booking in db_session.query(Booking).filter(Booking.user_id == user_id)}
+        engine = SimplePreferenceEngine()
+        # The profile covers every booked hall, including ones no longer available
+        engine.update_user_profile(user_id, booked, every_hall)
+        expected = engine.recommend_for_user(user_id, available, top_n=10)
+        assert _stored(db_session, user_id) == [hall.id for hall in expected]
+        assert db_session.get(UserProfile, user_id).stale is False
+
+
+def test_booking_updates_the_profile_incrementally(client, db_session, query_budget):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "customer@example.com")
+    chennai = make_hall(db_session, owner, name="Chennai Hall", facilities="AC, Stage")
+    make_hall(db_session, owner, name="Madurai Hall", location="Madurai", capacity=500, facilities="Stage")
+    mumbai = make_hall(db_session, owner, name="Mumbai Hall", location="Mumbai", capacity=500, facilities="Pool")
+
+    # No history yet: popular halls, and an empty profile is stored
+    assert client.get("/api/ai/personalized", headers=auth_headers(user)).status_code == 200
+    assert _stored(db_session, user.id) == []
+
+    start = datetime.utcnow() + timedelta(days=3)
+    response = client.post("/api/bookings/", headers=auth_headers(user), json={
+        "hall_id": mumbai.id, "start_time": start.isoformat(), "end_time": (start + timedelta(hours=2)).isoformat()})
+    assert response.status_code == 200
+    db_session.expire_all()
+    profile = db_session.get(UserProfile, user.id)
+    assert profile.stale and profile.location_counts == '{"Mumbai": 1}'
+
+    response = client.get("/api/ai/personalized", headers=auth_headers(user))
+    assert [hall["name"] for hall in response.json()][0] == "Mumbai Hall"
+    assert chennai.id not in _stored(db_session, user.id)
+
+    # Fresh profile: profile + stored rows, nothing recomputed
+    with query_budget(3):
+        again = client.get("/api/ai/personalized", headers=auth_headers(user))
+    assert again.json() == response.json()
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from .conftest import make_user, make_hall, auth_headers
+import timeseries
+from models import Hall, RoleEnum
+from pricing import PriceCurve, quote_booking, weekly_prices
+from versioning import bump_hall_version
+
+# 2030-01-04 is a Friday
+FRIDAY_NIGHT = datetime(2030, 1, 4, 22)
+
+
+def _by_the_hour(prices, start, end):
+    """Reference price: walk the booking hour by hour"""
+    total, moment = 0.0, start
+    while moment < end:
+        step = min(end, moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1))
+        total += prices[moment.weekday() * 24 + moment.hour] * (step - moment).total_seconds() / 3600
+        moment = step
+    return total
+
+
+def test_prefix_sums_match_an_hour_by_hour_walk():
+    rng = np.random.default_rng(5)
+    prices = rng.uniform(500, 1500, 168).tolist()
+    curve = PriceCurve.from_prices(prices)
+    assert abs(curve.price(100) - prices[100]) < 1e-9 and len(curve.prefix) == 169
+
+    for _ in range(300):
+        start = datetime(2030, 1, 1) + timedelta(minutes=int(rng.integers(0, 60 * 24 * 60)))
+        end = start + timedelta(minutes=int(rng.integers(1, 60 * 24 * 20)))
+        assert abs(curve.quote(start, end) - _by_the_hour(prices, start, end)) < 0.01
+
+
+def test_bookings_across_daylight_saving_changes_pay_for_real_hours(monkeypatch):
+    monkeypatch.setattr(timeseries, "ANALYTICS_TIMEZONE", "America/New_York")
+    flat = PriceCurve.from_prices([100.0] * 168)
+    # 00:00 to 04:00 on the wall clock is 5 real hours on 2030-11-03 (fall back), 3 on 2030-03-10
+    assert flat.quote(datetime(2030, 11, 3, 4), datetime(2030, 11, 3, 9)) == 500.0
+    assert flat.quote(datetime(2030, 3, 10, 5), datetime(2030, 3, 10, 8)) == 300.0
+    assert flat.quote(datetime(2030, 3, 1), datetime(2030, 12, 1)) == 100.0 * (datetime(2030, 12, 1) -
+                                                                              datetime(2030, 3, 1)).days * 24
+
+    # Each real quarter hour pays the price of the local slot it falls in
+    prices = np.random.default_rng(7).uniform(500, 1500, 168).tolist()
+    curve, zone = PriceCurve.from_prices(prices), ZoneInfo("America/New_York")
+    for start in (datetime(2030, 11, 2, 20), datetime(2030, 3, 9, 22)):
+        end, expected, moment = start + timedelta(hours=12), 0.0, start
+        while moment < end:
+            local = moment.replace(tzinfo=timezone.utc).astimezone(zone)
+            expected += prices[local.weekday() * 24 + local.hour] / 4
+            moment += timedelta(minutes=15)
+        assert abs(curve.quote(start, end) - expected) < 0.01
+
+
+def test_weekly_prices_scale_the_base_price_by_demand():
+    assert weekly_prices(1000.0) == [1000.0] * 168
+    multipliers = [1.0] * 168
+    multipliers[5 * 24 + 18] = 1.5
+    prices = weekly_prices(1000.0, multipliers)
+    assert prices[5 * 24 + 18] == 1500.0 and sum(prices) == 168 * 1000.0 + 500.0
+
+
+def test_quote_matches_the_booking_and_follows_price_changes(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "user@example.com")
+    hall = make_hall(db_session, owner, price_per_hour=1000.0, capacity=100)
+    headers = auth_headers(user)
+
+    def quote(start, hours):
+        response = client.post("/api/bookings/quote", headers=headers, json={
+            "hall_id": hall.id, "start_time": start.isoformat(), "end_time": (start + timedelta(hours=hours)).isoformat()})
+        assert response.status_code == 200, response.json()
+        return response.json()
+
+    # No history anywhere: the base price for every hour
+    friday = quote(FRIDAY_NIGHT, 4.5)
+    assert friday["total_amount"] == 4500.0 and friday["hours"] == 4.5 and friday["available"]
+
+    response = client.post("/api/bookings/", headers=headers, json={
+        "hall_id": hall.id, "start_time": FRIDAY_NIGHT.isoformat(),
+        "end_time": (FRIDAY_NIGHT + timedelta(hours=4.5)).isoformat()})
+    assert response.json()["total_amount"] == friday["total_amount"]
+    assert not quote(FRIDAY_NIGHT + timedelta(hours=1), 1)["available"]
+
+    # The hall now has history (Friday night into the weekend); a quote over the
+    # weekend boundary is the sum of the hourly suggestions
+    evening = datetime(2030, 1, 4, 23)
+    suggestions = [client.get(f"/api/ai/pricing/suggest/{hall.id}", headers=headers, params={
+        "event_datetime": (evening + timedelta(hours=hour)).isoformat()}).json()["suggested_price"] for hour in range(3)]
+    assert abs(quote(evening, 3)["total_amount"] - sum(suggestions)) < 0.02
+    assert quote(evening, 3)["total_amount"] > 3000.0 > quote(evening - timedelta(hours=10), 3)["total_amount"]
+
+    # A new base price is used straight away
+    before = quote(evening, 3)["total_amount"]
+    response = client.put(f"/api/halls/{hall.id}", headers=auth_headers(owner), json={
+        "name": hall.name, "capacity": 100, "price_per_hour": 2000.0, "location": hall.location})
+    assert response.status_code == 200
+    assert abs(quote(evening, 3)["total_amount"] - 2 * before) < 0.02
+
+    assert client.post("/api/bookings/quote", headers=headers, json={
+        "hall_id": hall.id, "start_time": evening.isoformat(), "end_time": evening.isoformat()}).status_code == 400
+    assert client.post("/api/bookings/quote", headers=headers, json={
+        "hall_id": 999, "start_time": evening.isoformat(),
+        "end_time": (evening + timedelta(hours=1)).isoformat()}).status_code == 404
+
+
+def test_a_curve_refilled_from_a_stale_hall_is_not_served_to_fresh_readers(db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    hall = make_hall(db_session, owner, price_per_hour=1000.0)
+    stale = SimpleNamespace(id=hall.id, price_per_hour=1000.0, version=hall.version)
+    end = FRIDAY_NIGHT + timedelta(hours=1)
+
+    hall.price_per_hour = 2000.0
+    bump_hall_version(db_session, hall)
+    db_session.commit()
+    # A reader still holding the old hall refills the cache after the invalidation
+    assert quote_booking(db_session, stale, FRIDAY_NIGHT, end) == 1000.0
+
+    assert quote_booking(db_session, hall, FRIDAY_NIGHT, end) == 2000.0
+    # The stale copy cannot push the older curve back
+    quote_booking(db_session, stale, FRIDAY_NIGHT, end)
+    assert quote_booking(db_session, hall, FRIDAY_NIGHT, end) == 2000.0
+
+
+def test_bookings_are_charged_the_current_price_despite_a_stale_cached_hall(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "user@example.com")
+    hall = make_hall(db_session, owner, price_per_hour=1000.0)
+    hall_id, headers = hall.id, auth_headers(user)
+    slot = {"hall_id": hall_id, "start_time": FRIDAY_NIGHT.isoformat(),
+            "end_time": (FRIDAY_NIGHT + timedelta(hours=2)).isoformat()}
+    assert client.post("/api/bookings/quote", headers=headers, json=slot).json()["total_amount"] == 2000.0
+
+    # Another worker's price change whose invalidation has not reached this one
+    db_session.query(Hall).filter(Hall.id == hall_id).update(
+        {Hall.price_per_hour: 1500.0, Hall.version: Hall.version + 1}, synchronize_session=False
+    )
+    db_session.commit()
+
+    assert client.post("/api/bookings/quote", headers=headers, json=slot).json()["total_amount"] == 3000.0
+    assert client.post("/api/bookings/", headers=headers, json=slot).json()["total_amount"] == 3000.0
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from .conftest import make_user, make_hall, auth_headers
+from models import Booking, BookingStatusEnum, RoleEnum
+from query_profiler import PROFILE_HEADER, QueryProfilerMiddleware, fingerprint, profile_queries
+
+
+def _book_every_hall(db, user, halls):
+    start = datetime(2030, 1, 1, 10)
+    for number, hall in enumerate(halls):
+        db.add(Booking(user_id=user.id, hall_id=hall.id, start_time=start + timedelta(days=number),
+                       end_time=start + timedelta(days=number, hours=2), event_name="Party",
+                       total_amount=100.0, status=BookingStatusEnum.PENDING))
+    db.commit()
+
+
+def test_fingerprint_collapses_literals_and_in_lists():
+    assert fingerprint("SELECT * FROM halls WHERE id = 7 AND name = 'x''y'") == \
+        "SELECT * FROM halls WHERE id = ? AND name = ?"
+    assert fingerprint("SELECT * FROM halls WHERE id IN (?, ?,\n ?)") == fingerprint(
+        "SELECT * FROM halls WHERE id IN (%s)")
+
+
+def test_lazy_loads_in_a_loop_are_flagged(db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    customer = make_user(db_session, "customer@example.com")
+    _book_every_hall(db_session, customer, [make_hall(db_session, owner, name=f"Hall {n}") for n in range(6)])
+    db_session.expire_all()
+
+    with profile_queries() as profile:
+        names = [booking.hall.name for booking in db_session.query(Booking).all()]
+
+    assert len(names) == 6
+    [(shape, count)] = profile.n_plus_one()
+    assert count == 6 and "FROM halls" in shape
+
+
+def test_my_bookings_stays_within_query_budget(client, db_session, query_budget):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    customer = make_user(db_session, "customer@example.com")
+    _book_every_hall(db_session, customer, [make_hall(db_session, owner, name=f"Hall {n}") for n in range(8)])
+
+    with query_budget(3):
+        res = client.get("/api/bookings/my-bookings", headers=auth_headers(customer))
+    assert res.status_code == 200
+    assert {booking["hall"]["owner"]["email"] for booking in res.json()} == {"owner@example.com"}
+
+
+def test_middleware_reports_profile_header(db_engine):
+    app = FastAPI()
+
+    @app.get("/probe")
+    def probe():
+        with db_engine.connect() as conn:
+            for number in range(5):
+                conn.execute(text("SELECT :n"), {"n": number})
+        return {"ok": True}
+
+    res = TestClient(QueryProfilerMiddleware(app)).get("/probe")
+    assert res.headers[PROFILE_HEADER].startswith("queries=5;")
+    assert "n_plus_one=1" in res.headers[PROFILE_HEADER]
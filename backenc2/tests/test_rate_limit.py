@@ -0,0 +1,76 @@
+from starlette.requests import Request
+
+from .conftest import make_user, auth_headers
+from rate_limit import InMemoryBackend, Limit, client_key, parse_limit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_and_evicts_idle_keys():
+    clock = FakeClock()
+    backend = InMemoryBackend(clock=clock)
+    limit = Limit(rate=1.0, burst=3)
+
+    assert [backend.take("a", limit) for _ in range(3)] == [0, 0, 0]
+    assert backend.take("a", limit) == 1.0
+    clock.now += 0.5
+    assert backend.take("a", limit) == 0.5
+    clock.now += 0.5
+    assert backend.take("a", limit) == 0
+
+    # Once a's bucket is full again it is indistinguishable from a new key
+    clock.now += 10
+    backend.take("b", limit)
+    assert len(backend) == 1
+
+
+def test_memory_is_capped_by_max_keys():
+    backend = InMemoryBackend(max_keys=100, clock=FakeClock())
+    for number in range(1000):
+        backend.take(f"client-{number}", Limit(rate=0.001, burst=5))
+    assert len(backend) <= 100
+
+
+def test_parse_limit():
+    assert parse_limit("30/minute") == Limit(rate=0.5, burst=30.0)
+
+
+def test_chatbot_returns_429_with_retry_after(client):
+    responses = [client.post("/api/chatbot/chat", json={"message": "hello"}) for _ in range(31)]
+    assert {res.status_code for res in responses[:30]} == {200}
+    assert responses[30].status_code == 429
+    assert responses[30].headers["retry-after"] == "2"
+
+
+def test_login_attempts_are_limited_per_account(client):
+    payload = {"email": "victim@example.com", "password": "guess"}
+    statuses = [client.post("/api/auth/login", json=payload).status_code for _ in range(6)]
+    assert statuses == [401] * 5 + [429]
+    # Another account from the same IP still has budget
+    assert client.post("/api/auth/login", json={"email": "other@example.com", "password": "x"}).status_code == 401
+
+
+def test_successful_logins_do_not_spend_the_account_budget(client, db_session):
+    make_user(db_session, "customer@example.com")
+    payload = {"email": "customer@example.com", "password": "secret123"}
+    assert [client.post("/api/auth/login", json=payload).status_code for _ in range(6)] == [200] * 6
+    # Failures still count, and a full bucket is not drained by checking it
+    wrong = {**payload, "password": "guess"}
+    assert [client.post("/api/auth/login", json=wrong).status_code for _ in range(4)] == [401] * 4
+
+
+def test_authenticated_clients_are_keyed_by_user(db_session):
+    user = make_user(db_session, "customer@example.com")
+
+    def request(headers):
+        return Request({"type": "http", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+                        "client": ("10.0.0.7", 1234)})
+
+    assert client_key(request(auth_headers(user))) == "user:customer@example.com"
+    assert client_key(request({"Authorization": "Bearer not-a-token"})) == "ip:10.0.0.7"
@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+
+from .conftest import BACKEND_DIR
+from lazy_imports import HEAVY_MODULES, lazy_module
+
+_IMPORT_MAIN = """
+import json, sys
+import ai_chatbot, ai_pirice_optimizer, routers.ai_engines
+import main
+print(json.dumps(sorted(name for name in %r if name in sys.modules)))
+"""
+
+
+def test_importing_main_skips_heavy_modules_and_ddl(tmp_path):
+    db_file = tmp_path / "cold.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_file}")
+    completed = subprocess.run([sys.executable, "-c", _IMPORT_MAIN % (HEAVY_MODULES,)], cwd=BACKEND_DIR,
+                               env=env, capture_output=True, text=True, check=True)
+
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
+    # No DDL (and so no connection) until the app starts up
+    assert not db_file.exists()
+
+
+def test_lazy_module_imports_on_first_attribute():
+    module = lazy_module("json")
+    assert "not loaded" in repr(module)
+    assert module.dumps([1]) == "[1]"
+    assert "not loaded" not in repr(module)
@@ -0,0 +1,94 @@
+from datetime import date, datetime, timedelta
+
+from .conftest import make_user, make_hall, auth_headers
+from database import upsert
+from models import Booking, BookingDailyStat, BookingStatusEnum, RoleEnum
+from timeseries import bucket_label, get_series, iter_buckets, rebuild_daily_stats
+
+
+def _book(client, user, hall, start):
+    res = client.post(
+        "/api/bookings/",
+        headers=auth_headers(user),
+        json={
+            "hall_id": hall.id,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=2)).isoformat(),
+            "event_name": "Party",
+        },
+    )
+    assert res.status_code == 200, res.text
+    return res.json()
+
+
+def test_bucket_helpers():
+    assert bucket_label(date(2026, 1, 1), "week") == "2026-W01"
+    assert bucket_label(date(2025, 12, 29), "week") == "2026-W01"
+    assert bucket_label(date(2026, 3, 1), "month") == "2026-03"
+    assert iter_buckets(date(2026, 1, 15), date(2026, 4, 2), "month") == [
+        date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1), date(2026, 4, 1)
+    ]
+    assert iter_buckets(date(2026, 10, 14), date(2026, 10, 20), "week") == [
+        date(2026, 10, 12), date(2026, 10, 19)
+    ]
+
+
+def test_rollup_follows_booking_writes(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "user@example.com")
+    hall = make_hall(db_session, owner, price_per_hour=500.0)
+
+    first = _book(client, user, hall, datetime(2030, 1, 1, 10))
+    _book(client, user, hall, datetime(2030, 1, 2, 10))
+
+    res = client.put(f"/api/owner/bookings/{first['id']}/approve", headers=auth_headers(owner))
+    assert res.status_code == 200
+
+    today = datetime.utcnow().date()
+    series = get_series(db_session, "daily", start=today - timedelta(days=2), end=today, owner_id=owner.id)
+    assert [point["bookings"] for point in series] == [0, 0, 2]
+    # Only the approved booking counts as revenue
+    assert series[-1]["revenue"] == 1000.0
+
+    res = client.get("/api/owner/charts/revenue?period=weekly", headers=auth_headers(owner))
+    assert res.status_code == 200
+    weekly = res.json()["series"]
+    assert len(weekly) == 12
+    assert weekly[-1]["bookings"] == 2
+
+    res = client.get("/api/owner/charts/revenue?period=yearly", headers=auth_headers(owner))
+    assert res.status_code == 400
+
+
+def test_rebuild_matches_incremental(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "user@example.com")
+    hall = make_hall(db_session, owner)
+    for day in range(3):
+        _book(client, user, hall, datetime(2030, 2, 1 + day, 9))
+
+    def snapshot():
+        return sorted(
+            (row.day, row.hall_id, row.status, row.bookings, row.revenue)
+            for row in db_session.query(BookingDailyStat).all()
+        )
+
+    incremental = snapshot()
+    rebuild_daily_stats(db_session)
+    assert snapshot() == incremental
+    assert db_session.query(Booking).count() == 3
+
+
+def test_rollup_rows_are_upserted_in_one_statement(db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    hall = make_hall(db_session, owner)
+    row = {"day": date(2030, 1, 1), "hall_id": hall.id, "owner_id": owner.id,
+           "status": BookingStatusEnum.PENDING, "bookings": 1, "revenue": 100.0}
+    # Two first writers of the same key in one statement: the second adds to the first's row
+    upsert(db_session, BookingDailyStat, [row, row], keys=("day", "hall_id", "status"),
+           increments={"bookings": 1, "revenue": 100.0})
+    upsert(db_session, BookingDailyStat, row, keys=("day", "hall_id", "status"),
+           increments={"bookings": 1, "revenue": 100.0})
+    db_session.commit()
+    stat = db_session.query(BookingDailyStat).one()
+    assert (stat.bookings, stat.revenue) == (3, 300.0)
@@ -0,0 +1,55 @@
+from datetime import date, datetime, timedelta
+
+from .conftest import make_user, make_hall, auth_headers
+from models import Booking, BookingStatusEnum, HallDailyUtilization, RoleEnum
+from utilization import BOOKABLE_HOURS_PER_DAY, rebuild_utilization, split_hours_by_day
+
+
+def test_split_hours_across_midnight():
+    hours = split_hours_by_day(datetime(2030, 1, 1, 20), datetime(2030, 1, 2, 3))
+    assert hours == {date(2030, 1, 1): 4.0, date(2030, 1, 2): 3.0}
+
+
+def test_hall_performance_uses_booked_hours(client, db_session):
+    owner = make_user(db_session, "owner@example.com", RoleEnum.HALL_OWNER)
+    user = make_user(db_session, "user@example.com")
+    busy = make_hall(db_session, owner, name="Busy Hall")
+    make_hall(db_session, owner, name="Quiet Hall")
+
+    start = datetime.utcnow().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    res = client.post(
+        "/api/bookings/",
+        headers=auth_headers(user),
+        json={
+            "hall_id": busy.id,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=6)).isoformat(),
+        },
+    )
+    booking_id = res.json()["id"]
+
+    # Pending bookings do not occupy the hall yet
+    assert db_session.query(HallDailyUtilization).count() == 0
+    client.put(f"/api/owner/bookings/{booking_id}/approve", headers=auth_headers(owner))
+
+    res = client.get("/api/owner/charts/hall-performance?days=10", headers=auth_headers(owner))
+    assert res.status_code == 200
+    by_name = {row["name"]: row for row in res.json()}
+    assert by_name["Busy Hall"]["booked_hours"] == 6.0
+    assert by_name["Busy Hall"]["bookings"] == 1
+    assert by_name["Busy Hall"]["occupancy"] == round(6.0 / (10 * BOOKABLE_HOURS_PER_DAY) * 100, 2)
+    assert by_name["Quiet Hall"]["occupancy"] == 0.0
+
+    # Cancelling removes the hours again
+    client.put(
+        f"/api/owner/bookings/{booking_id}/status",
+        headers=auth_headers(owner),
+        json={"status": "CANCELLED"},
+    )
+    res = client.get("/api/owner/charts/hall-performance?days=10", headers=auth_headers(owner))
+    assert {row["name"]: row["booked_hours"] for row in res.json()}["Busy Hall"] == 0.0
+
+    db_session.query(Booking).update({Booking.status: BookingStatusEnum.COMPLETED})
+    db_session.commit()
+    rebuild_utilization(db_session)
+    assert db_session.query(HallDailyUtilization).one().booked_hours == 6.0
@@ -1,7 +1,10 @@
 # ==================== ai_chatbot.py ====================
-import openai
 import os
 from typing import Dict, List
+from lazy_imports import lazy_module
+
+# Only imported when an OpenAI key is configured and a message needs it
+openai = lazy_module("openai")
 
 class BookingChatbot:
     def __init__(self):
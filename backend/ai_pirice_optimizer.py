@@ -1,13 +1,15 @@
 # ==================== ai_price_optimizer.py ====================
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-import numpy as np
 from datetime import datetime
+from lazy_imports import lazy_module
+
+# pandas / scikit-learn are only imported once the model is trained or used
+pd = lazy_module("pandas")
+sklearn_ensemble = lazy_module("sklearn.ensemble")
+sklearn_model_selection = lazy_module("sklearn.model_selection")
 
 class PriceOptimizationEngine:
     def __init__(self):
-        self.model = RandomForestRegressor(n_estimators=50, random_state=42)
+        self.model = None
         self.is_trained = False
         
     def prepare_training_data(self, bookings_data, halls_data):
@@ -37,8 +39,11 @@ class PriceOptimizationEngine:
             self.is_trained = False
             return
             
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        X_train, X_test, y_train, y_test = sklearn_model_selection.train_test_split(
+            X, y, test_size=0.2, random_state=42
+        )
         
+        self.model = sklearn_ensemble.RandomForestRegressor(n_estimators=50, random_state=42)
         self.model.fit(X_train, y_train)
         self.is_trained = True
         
@@ -2,26 +2,38 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from database import get_db
 from models import User, RoleEnum
+import password_hashing
+from cache import cache, row_dto, row_from_dto
+from events import UserChanged, subscribe
 import os
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 1440))
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", 60))
+STREAM_SCOPE = "owner-stream"
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+# Never written to the shared cache; loaded from the database when a handler needs them
+USER_CREDENTIAL_FIELDS = ("password",)
+# EventSource cannot send headers, so event streams also take a stream token as ?stream_token=.
+# Query strings end up in access logs: that token only opens streams, and only for a minute
+stream_security = HTTPBearer(auto_error=False)
 
+# bcrypt runs in the bounded worker pool from password_hashing, never inline
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hashing.verify_password(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    return password_hashing.verify_and_update(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hashing.hash_password(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -33,28 +45,47 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_stream_token(email: str) -> str:
+    return create_access_token(data={"sub": email, "scope": STREAM_SCOPE},
+                               expires_delta=timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS))
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
+    return user_from_token(credentials.credentials, db)
+
+def user_from_token(token: Optional[str], db: Session, scope: Optional[str] = None) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or payload.get("scope") != scope:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    def load():
+        user = db.query(User).filter(User.email == email).first()
+        return row_dto(user, exclude=USER_CREDENTIAL_FIELDS) if user else None
+
+    # Resolved users come from the shared cache; merge attaches them without a query
+    dto = cache.get_or_load("users", email, load)
+    if dto is None:
         raise credentials_exception
-    return user
+    return db.merge(row_from_dto(User, dto), load=False)
+
+@subscribe(UserChanged)
+def _drop_cached_user(event: UserChanged):
+    # Under every email the user had, since tokens carry the old one until they expire
+    for email in event.emails:
+        cache.invalidate("users", email)
 
 def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
     if current_user.role != RoleEnum.ADMIN:
@@ -71,4 +102,15 @@ def get_current_owner(current_user: User = Depends(get_current_user)) -> User:
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Hall owner access required"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+def get_stream_owner(
+    stream_token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(stream_security),
+    db: Session = Depends(get_db)
+) -> User:
+    if credentials:
+        user = user_from_token(credentials.credentials, db)
+    else:
+        user = user_from_token(stream_token, db, scope=STREAM_SCOPE)
+    return get_current_owner(user)
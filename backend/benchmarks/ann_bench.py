@@ -0,0 +1,101 @@
+# ==================== benchmarks/ann_bench.py ====================
+"""
+Recall vs latency of the LSH index over hall embeddings.
+
+Halls are generated with seed_data (no database needed), embedded with
+HallEmbedder and indexed with LSHIndex for each (tables, bits) setting.
+Random halls are then queried three ways:
+
+- tfidf:  the old path, cosine_similarity of one TF-IDF row against the
+          whole matrix followed by a full argsort
+- exact:  brute-force dot product over every embedding (ground truth)
+- lsh:    the index, with and without multi-probe
+
+Recall@k counts a returned hall as correct when it scores at least the
+exact k-th best score. Seeded halls share a lot of text, so many neighbours
+tie.
+
+Run from the backend directory:
+    python -m benchmarks.ann_bench --halls 100000 --queries 500 --settings 8x10,16x12,16x14
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from benchmarks.http_bench import percentile
+from hall_embeddings import EMBEDDING_DIM, HallEmbedder, LSHIndex, hall_text
+from seed_data import generate_halls, iter_halls
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def report(label, latencies, recall=None):
+    latencies = sorted(latencies)
+    line = (f"{label:<22} p50 {percentile(latencies, 0.5) * 1e3:8.3f} ms   "
+            f"p95 {percentile(latencies, 0.95) * 1e3:8.3f} ms")
+    if recall is not None:
+        line += f"   recall@k {recall:.3f}"
+    print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--halls", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    parser.add_argument("--settings", default="8x10,16x12,16x14", help="comma-separated TABLESxBITS")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    halls = list(iter_halls(generate_halls(np.random.default_rng(args.seed), args.halls, 100)))
+    texts = [hall_text(hall) for hall in halls]
+    ids = [hall["id"] for hall in halls]
+    embedder = HallEmbedder(args.dim)
+    vectors, seconds = timed(lambda: embedder.fit_transform(texts))
+    print(f"embed:  {args.halls:,} halls -> {args.dim} dims in {seconds:.1f}s")
+    tfidf = embedder.vectorizer.transform(texts)
+
+    rng = np.random.default_rng(args.seed + 1)
+    queries = rng.choice(args.halls, args.queries, replace=False)
+
+    latencies = []
+    for query in queries[:100]:
+        _, seconds = timed(lambda: cosine_similarity(tfidf[query], tfidf).flatten().argsort()[-args.k - 1:-1][::-1])
+        latencies.append(seconds)
+    report("tfidf full sort", latencies)
+
+    exact_index = LSHIndex(args.dim, tables=1, bits=1)
+    exact_index.add(ids, vectors)
+    truth, latencies = {}, []
+    for query in queries:
+        result, seconds = timed(lambda: exact_index.exact_search(vectors[query], args.k, exclude=ids[query]))
+        truth[query] = result[-1][1] - 1e-5
+        latencies.append(seconds)
+    report("exact embeddings", latencies)
+
+    for setting in args.settings.split(","):
+        tables, bits = map(int, setting.split("x"))
+        index = LSHIndex(args.dim, tables, bits)
+        _, seconds = timed(lambda: index.add(ids, vectors))
+        print(f"lsh {setting}: built in {seconds:.1f}s ({args.halls / seconds:,.0f} inserts/s)")
+        for probe in (False, True):
+            latencies, hits = [], 0
+            for query in queries:
+                result, seconds = timed(lambda: index.search(vectors[query], args.k, probe=probe,
+                                                             exclude=ids[query]))
+                latencies.append(seconds)
+                hits += sum(score >= truth[query] for _, score in result)
+            report(f"  {'multi-probe' if probe else 'single probe'}", latencies, hits / (args.k * len(queries)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# ==================== benchmarks/bench_serialization.py ====================
+"""
+Before/after benchmark of the response pipeline on a 10k-booking payload.
+
+before: pydantic validation + json.dumps (FastAPI's stock JSONResponse), identity
+after:  pydantic validation + orjson (FastJSONResponse), then gzip / br
+
+Run from the backend directory:
+    python -m benchmarks.bench_serialization --bookings 10000 --repeat 5
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from compression import _Compressor, brotli
+from models import BookingStatusEnum, RoleEnum
+from responses import FastJSONResponse
+from schemas import BookingResponse
+
+
+def build_bookings(count: int):
+    """ORM-shaped objects (attribute access) like get_all_bookings returns"""
+    owner = SimpleNamespace(
+        id=1, email="owner@example.com", full_name="Owner One", phone="9999999999",
+        role=RoleEnum.HALL_OWNER, created_at=datetime(2025, 1, 1)
+    )
+    halls = [
+        SimpleNamespace(
+            id=hall_id, name=f"Hall {hall_id}", description="Spacious AC hall ideal for weddings and events.",
+            capacity=100 + hall_id, price_per_hour=1500.0, facilities="AC, Parking, Stage, Catering",
+            location="Chennai, Tamil Nadu", image_url=None, available=True, owner_id=1, owner=owner
+        )
+        for hall_id in range(1, 51)
+    ]
+    start = datetime(2025, 6, 1, 9)
+    bookings = []
+    for booking_id in range(1, count + 1):
+        hall = halls[booking_id % len(halls)]
+        user = SimpleNamespace(
+            id=1000 + booking_id % 500, email=f"user{booking_id % 500}@example.com", full_name="Guest",
+            phone=None, role=RoleEnum.USER, created_at=datetime(2025, 2, 1)
+        )
+        begin = start + timedelta(hours=booking_id * 3)
+        bookings.append(SimpleNamespace(
+            id=booking_id, user_id=user.id, hall_id=hall.id, start_time=begin,
+            end_time=begin + timedelta(hours=2), event_name="Birthday party", event_type="party",
+            attendees=80, remarks=None, total_amount=3000.0, status=BookingStatusEnum.APPROVED,
+            created_at=begin - timedelta(days=10), hall=hall, user=user
+        ))
+    return bookings
+
+
+def measure(label, func, repeat):
+    wall, cpu = [], []
+    result = None
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = func()
+        wall.append(time.perf_counter() - wall_start)
+        cpu.append(time.process_time() - cpu_start)
+    size = len(result) if isinstance(result, (bytes, bytearray)) else 0
+    print(f"{label:<32} p50 {statistics.median(wall) * 1000:8.1f} ms   "
+          f"cpu {statistics.median(cpu) * 1000:8.1f} ms   bytes {size:>10,}")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    bookings = build_bookings(args.bookings)
+    adapter = TypeAdapter(List[BookingResponse])
+
+    def validate_and_dump():
+        # What FastAPI does for response_model before handing content to the response class
+        return adapter.dump_python(adapter.validate_python(bookings), mode="json")
+
+    content = validate_and_dump()
+    print(f"payload: {args.bookings:,} bookings, repeat={args.repeat}")
+    measure("validate + dump (shared)", lambda: json.dumps(validate_and_dump()).encode(), args.repeat)
+
+    before = measure("before: json.dumps", lambda: JSONResponse(content).body, args.repeat)
+    after = measure("after: orjson", lambda: FastJSONResponse(content).body, args.repeat)
+    assert json.loads(before) == json.loads(after)
+
+    def compress(encoding):
+        compressor = _Compressor(encoding, gzip_level=6, brotli_quality=4)
+        return compressor.compress(after) + compressor.finish()
+
+    measure("after: orjson + gzip", lambda: compress("gzip"), args.repeat)
+    if brotli is not None:
+        measure("after: orjson + br", lambda: compress("br"), args.repeat)
+    else:
+        print("brotli not installed, skipping br")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
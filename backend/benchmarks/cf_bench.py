@@ -0,0 +1,80 @@
+# ==================== benchmarks/cf_bench.py ====================
+"""
+Training cost, memory footprint and serving latency of the item-item model.
+
+Bookings are synthetic: every user books a few halls in one city, with a
+skewed (Zipf-like) popularity inside the city, so neighbourhoods look like
+the real catalog's. The model is trained with collaborative.fit. It is then
+queried with random users' histories, the way /api/ai/collaborative
+calls it.
+
+Run from the backend directory:
+    python -m benchmarks.cf_bench --users 1000000 --halls 100000 --bookings-per-user 5
+"""
+import argparse
+import resource
+import sys
+import time
+
+import numpy as np
+import scipy.sparse as sparse
+
+import collaborative
+from benchmarks.http_bench import percentile
+
+
+def synthetic_interactions(users: int, halls: int, per_user: int, cities: int, seed: int):
+    rng = np.random.default_rng(seed)
+    halls_per_city = halls // cities
+    weights = 1.0 / np.arange(1, halls_per_city + 1) ** 0.8
+    cumulative = np.cumsum(weights) / weights.sum()
+    city = rng.integers(0, cities, users)
+    picks = np.searchsorted(cumulative, rng.random((users, per_user)))
+    columns = (city[:, None] * halls_per_city + picks).ravel()
+    rows = np.repeat(np.arange(users), per_user)
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(users, halls))
+    matrix.data[:] = 1.0  # repeated picks collapse to one booking, as in interaction_matrix
+    return matrix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--halls", type=int, default=100_000)
+    parser.add_argument("--bookings-per-user", type=int, default=5)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=collaborative.TOP_K)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    interactions = synthetic_interactions(args.users, args.halls, args.bookings_per_user, args.cities, args.seed)
+    interactions_mb = (interactions.data.nbytes + interactions.indices.nbytes + interactions.indptr.nbytes) / 2 ** 20
+    print(f"matrix: {args.users:,} users x {args.halls:,} halls, {interactions.nnz:,} bookings, "
+          f"{interactions_mb:.1f} MiB ({time.perf_counter() - started:.1f}s)")
+
+    started = time.perf_counter()
+    model = collaborative.fit(interactions, np.arange(1, args.halls + 1), top_k=args.top_k,
+                              chunk_size=args.chunk_size, log=lambda message: None)
+    print(f"train:  {time.perf_counter() - started:.1f}s, {model.similarity.nnz:,} similarities "
+          f"(top {args.top_k} per hall)")
+    print(f"memory: model {model.nbytes / 2 ** 20:.1f} MiB, "
+          f"process peak {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+    rng = np.random.default_rng(args.seed + 1)
+    latencies = []
+    for user in rng.integers(0, args.users, args.queries):
+        booked = interactions.indices[interactions.indptr[user]:interactions.indptr[user + 1]] + 1
+        query_started = time.perf_counter()
+        model.recommend(booked, 10)
+        latencies.append(time.perf_counter() - query_started)
+    latencies.sort()
+    print(f"serve:  {args.queries:,} users, p50 {percentile(latencies, 0.5) * 1e3:.3f} ms   "
+          f"p95 {percentile(latencies, 0.95) * 1e3:.3f} ms   p99 {percentile(latencies, 0.99) * 1e3:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
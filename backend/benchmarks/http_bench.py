@@ -0,0 +1,271 @@
+# ==================== benchmarks/http_bench.py ====================
+"""
+HTTP-level benchmark for the hot endpoints.
+
+Boots the FastAPI app in-process (ASGI transport, no network) against a seeded
+local SQLite database and drives each scenario at a fixed concurrency.
+Reports p50/p95/p99 latency and requests per second, can save the results as
+a JSON baseline and flags regressions against a saved baseline.
+
+Run from the backend directory:
+    python -m benchmarks.http_bench --concurrency 16 --requests 400
+    python -m benchmarks.http_bench --save-baseline benchmarks/baselines/local.json
+    python -m benchmarks.http_bench --compare benchmarks/baselines/local.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from seed_data import DEFAULT_PASSWORD, generate
+
+
+def seed_database(engine, owners=20, halls_per_owner=10, users=200, bookings_per_hall=50, seed=42):
+    """Deterministic dataset from seed_data; bookings per hall never overlap"""
+    counts = generate(
+        engine, owners=owners, halls=owners * halls_per_owner, users=users,
+        bookings=owners * halls_per_owner * bookings_per_hall, seed=seed,
+        batch_size=5000, reset=True, log=lambda message: None
+    )
+    return {"owners": owners, "halls": counts["halls"], "users": users,
+            "bookings": counts["bookings"], "first_user_id": counts["first_user_id"]}
+
+
+def build_app(db_path):
+    # Point the app's own engine at the benchmark DB before anything imports database.py
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    # Measure the endpoints, not the per-client rate limits
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from database import get_db
+    from main import app
+
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def bench_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = bench_get_db
+    return app, engine
+
+
+# ---------- Scenarios ----------
+
+def _auth(email):
+    from auth import create_access_token
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': email})}"}
+
+
+def make_scenarios(stats, rng):
+    users = stats["users"]
+    halls = stats["halls"]
+    searches = ["Hall 1", "Chennai", "Parking", "Stage", "Mumbai"]
+
+    def user_headers():
+        return _auth(f"user{rng.randrange(users)}@example.com")
+
+    async def login(client):
+        return await client.post("/api/auth/login", json={
+            "email": f"user{rng.randrange(users)}@example.com", "password": DEFAULT_PASSWORD
+        })
+
+    async def list_halls(client):
+        return await client.get("/api/halls/", params={
+            "search": rng.choice(searches), "min_capacity": rng.choice([50, 100, 200]),
+            "max_price": rng.choice([2000, 3500, 5000]), "limit": 50
+        })
+
+    async def halls_near_me(client):
+        from seed_data import CITY_CENTERS
+        lat, lng = CITY_CENTERS[rng.randrange(len(CITY_CENTERS))]
+        return await client.get("/api/halls/", params={
+            "lat": lat + rng.uniform(-0.1, 0.1), "lng": lng + rng.uniform(-0.1, 0.1), "nearest": 20
+        })
+
+    async def create_booking(client):
+        # Few halls and few slots, so concurrent requests collide on the overlap check
+        start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(
+            days=400 + rng.randrange(5), hours=rng.randrange(8))
+        return await client.post("/api/bookings/", headers=user_headers(), json={
+            "hall_id": rng.randint(1, min(5, halls)),
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=2)).isoformat(),
+            "event_name": "Contention test"
+        })
+
+    async def my_bookings(client):
+        return await client.get("/api/bookings/my-bookings", headers=user_headers())
+
+    async def owner_stats(client):
+        return await client.get("/api/owner/stats", headers=_auth(f"owner{rng.randrange(stats['owners'])}@example.com"))
+
+    async def analytics_dashboard(client):
+        return await client.get("/api/analytics/dashboard", headers=_auth("admin@example.com"))
+
+    async def ai_similar(client):
+        return await client.get(f"/api/ai/similar/{rng.randint(1, halls)}", headers=user_headers())
+
+    async def ai_personalized(client):
+        return await client.get("/api/ai/personalized", headers=user_headers())
+
+    async def ai_pricing(client):
+        moment = (datetime.utcnow() + timedelta(days=rng.randrange(30), hours=rng.randrange(24))).isoformat()
+        return await client.get(f"/api/ai/pricing/suggest/{rng.randint(1, halls)}",
+                                params={"event_datetime": moment}, headers=user_headers())
+
+    return {
+        "login": login,
+        "list_halls": list_halls,
+        "halls_near_me": halls_near_me,
+        "create_booking": create_booking,
+        "my_bookings": my_bookings,
+        "owner_stats": owner_stats,
+        "analytics_dashboard": analytics_dashboard,
+        "ai_similar": ai_similar,
+        "ai_personalized": ai_personalized,
+        "ai_pricing": ai_pricing,
+    }
+
+
+# ---------- Runner ----------
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, scenario, total_requests, concurrency):
+    latencies = []
+    statuses = Counter()
+    remaining = iter(range(total_requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await scenario(client)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "errors": sum(count for status, count in statuses.items() if status >= 500),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions: p95 slower or throughput lower than baseline by more than tolerance"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if previous["rps"] and current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {previous['rps']} -> {current['rps']}")
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: 5xx {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+async def run(args):
+    import httpx
+
+    db_path = args.db or os.path.join(tempfile.gettempdir(), "hallbook_bench.db")
+    app, engine = build_app(db_path)
+    if args.reuse_db and os.path.exists(db_path):
+        with open(db_path + ".json") as handle:
+            stats = json.load(handle)
+    else:
+        stats = seed_database(engine, owners=args.owners, halls_per_owner=args.halls_per_owner,
+                              users=args.users, bookings_per_hall=args.bookings_per_hall, seed=args.seed)
+        with open(db_path + ".json", "w") as handle:
+            json.dump(stats, handle)
+    print(f"dataset: {stats}")
+
+    scenarios = make_scenarios(stats, random.Random(args.seed))
+    selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in selected:
+            # Warm caches and lazy imports before measuring
+            for _ in range(min(5, args.requests)):
+                await scenarios[name](client)
+            results[name] = await run_scenario(client, scenarios[name], args.requests, args.concurrency)
+            result = results[name]
+            print(f"{name:<22} rps {result['rps']:>9.1f}   p50 {result['p50_ms']:>8.2f}   "
+                  f"p95 {result['p95_ms']:>8.2f}   p99 {result['p99_ms']:>8.2f} ms   {result['statuses']}")
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "dataset": stats,
+        "concurrency": args.concurrency,
+        "scenarios": results,
+    }
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        if regressions:
+            print("REGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"no regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="SQLite file to seed and benchmark (default: temp dir)")
+    parser.add_argument("--reuse-db", action="store_true", help="skip seeding if the DB already exists")
+    parser.add_argument("--scenarios", help="comma separated subset, default all")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario")
+    parser.add_argument("--owners", type=int, default=20)
+    parser.add_argument("--halls-per-owner", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--bookings-per-hall", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save-baseline", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
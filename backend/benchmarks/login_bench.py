@@ -0,0 +1,103 @@
+# ==================== benchmarks/login_bench.py ====================
+"""
+Login throughput at different bcrypt costs.
+
+For each BCRYPT_ROUNDS setting it seeds a small database whose users carry a
+hash of that cost, restarts the password worker pool and drives concurrent
+logins through the app in-process. A client that gets the pool's fast 503
+waits Retry-After and tries again, as a browser would. It reports
+successful logins/s, the time to log in (retries included), how many
+attempts were rejected and the /health latency measured during the storm.
+The /health numbers show whether the event loop stays responsive.
+
+Run from the backend directory:
+    python -m benchmarks.login_bench --rounds 4,8,10,12 --concurrency 32 --requests 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+import password_hashing
+from benchmarks.http_bench import build_app, percentile, run_scenario
+from seed_data import DEFAULT_PASSWORD, generate
+
+
+async def _probe_health(client, stop, latencies):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await client.get("/health")
+        latencies.append(loop.time() - started)
+        await asyncio.sleep(0.01)
+
+
+async def bench_rounds(app, engine, rounds, args):
+    import httpx
+
+    password_hashing.configure(rounds=rounds, workers=args.workers, max_pending=args.max_pending)
+    password_hashing.start_pool()
+    generate(engine, owners=2, halls=5, users=args.users, bookings=0, seed=args.seed, reset=True,
+             rollups=False, password_hash=password_hashing.hash_password(DEFAULT_PASSWORD), log=lambda message: None)
+    rng = random.Random(args.seed)
+    rejected = 0
+
+    async def login(client):
+        nonlocal rejected
+        credentials = {"email": f"user{rng.randrange(args.users)}@example.com", "password": DEFAULT_PASSWORD}
+        while True:
+            response = await client.post("/api/auth/login", json=credentials)
+            if response.status_code != 503:
+                return response
+            rejected += 1
+            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await login(client)
+        health, stop = [], asyncio.Event()
+        probe = asyncio.create_task(_probe_health(client, stop, health))
+        result = await run_scenario(client, login, args.requests, args.concurrency)
+        stop.set()
+        await probe
+
+    result["max_pending"] = password_hashing.pool_stats()["max_pending"]
+    password_hashing.shutdown_pool()
+    # Each scenario is one user logging in, however many 503s it took
+    result["logins_per_s"] = round(result["rps"] * result["statuses"].get("200", 0) / result["requests"], 2)
+    result["rejected"] = rejected
+    health.sort()
+    result["health_p95_ms"] = round(percentile(health, 0.95) * 1000, 2)
+    return result
+
+
+async def run(args):
+    db_path = args.db or os.path.join(tempfile.gettempdir(), "hallbook_login_bench.db")
+    app, engine = build_app(db_path)
+    print(f"workers={args.workers} concurrency={args.concurrency}")
+    for rounds in [int(value) for value in args.rounds.split(",")]:
+        result = await bench_rounds(app, engine, rounds, args)
+        print(f"rounds {rounds:>2}   max_pending {result['max_pending']:>4}   "
+              f"logins/s {result['logins_per_s']:>7.1f}   p50 {result['p50_ms']:>8.2f}   "
+              f"p95 {result['p95_ms']:>8.2f} ms   503s {result['rejected']:>5}   "
+              f"health p95 {result['health_p95_ms']:>7.2f} ms   {result['statuses']}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="SQLite file to seed (default: temp dir)")
+    parser.add_argument("--rounds", default="4,8,10,12", help="comma separated bcrypt costs")
+    parser.add_argument("--workers", type=int, default=password_hashing.PASSWORD_HASH_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=None, help="default: sized from PASSWORD_HASH_MAX_WAIT_S")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="logins per setting")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
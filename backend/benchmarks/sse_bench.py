@@ -0,0 +1,218 @@
+# ==================== benchmarks/sse_bench.py ====================
+"""
+Load test for the owner dashboard stream (/api/owner/stream).
+
+Seeds a local SQLite database and starts one uvicorn worker. It then
+opens --connections idle SSE connections spread over the owners, and
+holds them. Reports:
+- how long connecting took
+- the worker's resident memory before and after, and per connection
+- how many connections were still open at the end
+
+While the connections are held, it books halls through the API and times
+each booking_created delta until it reaches every dashboard of that
+hall's owner.
+
+Run from the backend directory:
+    python -m benchmarks.sse_bench --connections 10000 --hold 30
+"""
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.http_bench import percentile
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _rss_mib(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def _raise_fd_limit(needed: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def _token(email: str) -> str:
+    from auth import create_access_token
+    return create_access_token(data={"sub": email})
+
+
+def _stream_token(email: str) -> str:
+    # What POST /api/owner/stream-token returns; minted locally to keep connecting cheap
+    from auth import create_stream_token
+    return create_stream_token(email)
+
+
+class Dashboard:
+    """One idle SSE connection, reading deltas as they arrive"""
+
+    def __init__(self, owner_email: str):
+        self.owner_email = owner_email
+        self.writer = None
+        self.received = asyncio.Queue()
+        self.closed = False
+
+    async def open(self, port: int):
+        reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+        self.writer.write((f"GET /api/owner/stream?stream_token={_stream_token(self.owner_email)} HTTP/1.1\r\n"
+                           f"Host: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n").encode())
+        await self.writer.drain()
+        status = await reader.readline()
+        if b" 200 " not in status:
+            raise RuntimeError(f"stream refused: {status!r}")
+        # Headers, then the retry line: the connection is registered on the server
+        while await reader.readline() not in (b"\r\n", b""):
+            pass
+        while b"retry:" not in await reader.readline():
+            pass
+        return reader
+
+    async def listen(self, reader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if b"event: booking_created" in line:
+                    self.received.put_nowait(time.perf_counter())
+        finally:
+            self.closed = True
+
+
+async def _book(port: int, user_email: str, hall_id: int, start: datetime):
+    body = (f'{{"hall_id": {hall_id}, "start_time": "{start.isoformat()}", '
+            f'"end_time": "{(start + timedelta(hours=1)).isoformat()}"}}').encode()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write((f"POST /api/bookings/ HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                  f"Authorization: Bearer {_token(user_email)}\r\nContent-Length: {len(body)}\r\n"
+                  f"Connection: close\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = await reader.readline()
+    await reader.read()
+    writer.close()
+    if b" 200 " not in status:
+        raise RuntimeError(f"booking failed: {status!r}")
+
+
+async def run(port: int, server_pid: int, owners: list, halls_by_owner: dict, connections: int,
+              bookings: int, hold: float, open_concurrency: int):
+    dashboards = [Dashboard(owners[index % len(owners)]) for index in range(connections)]
+    rss_before = _rss_mib(server_pid)
+    semaphore = asyncio.Semaphore(open_concurrency)
+    listeners = []
+
+    async def connect(dashboard):
+        async with semaphore:
+            reader = await dashboard.open(port)
+        listeners.append(asyncio.create_task(dashboard.listen(reader)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connect(dashboard) for dashboard in dashboards))
+    connect_seconds = time.perf_counter() - started
+    rss_connected = _rss_mib(server_pid)
+    print(f"{connections} connections open in {connect_seconds:.1f}s; worker RSS {rss_before:.0f} -> "
+          f"{rss_connected:.0f} MiB ({(rss_connected - rss_before) * 1024 / connections:.1f} KiB/connection)")
+
+    # Fan-out latency: book a hall and wait until every dashboard of its owner saw the delta
+    by_owner = {}
+    for dashboard in dashboards:
+        by_owner.setdefault(dashboard.owner_email, []).append(dashboard)
+    latencies = []
+    start_day = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=900)
+    for number in range(bookings):
+        owner = owners[number % len(owners)]
+        sent = time.perf_counter()
+        await _book(port, "user0@example.com", halls_by_owner[owner], start_day + timedelta(hours=number))
+        arrivals = await asyncio.gather(*(dashboard.received.get() for dashboard in by_owner[owner]))
+        latencies.append((max(arrivals) - sent) * 1000)
+    latencies.sort()
+    print(f"booking -> every dashboard of the owner (~{connections // len(by_owner)} each): "
+          f"p50 {percentile(latencies, 0.50):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms")
+
+    await asyncio.sleep(hold)
+    open_now = sum(not dashboard.closed for dashboard in dashboards)
+    print(f"after {hold:.0f}s idle: {open_now}/{connections} still open, worker RSS {_rss_mib(server_pid):.0f} MiB")
+
+    for dashboard in dashboards:
+        dashboard.writer.close()
+    for listener in listeners:
+        listener.cancel()
+    return open_now == connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10_000)
+    parser.add_argument("--owners", type=int, default=200)
+    parser.add_argument("--bookings", type=int, default=50)
+    parser.add_argument("--hold", type=float, default=30.0, help="seconds to hold the idle connections")
+    parser.add_argument("--open-concurrency", type=int, default=500)
+    parser.add_argument("--keepalive", type=float, default=10.0, help="OWNER_FEED_KEEPALIVE_S for the worker")
+    args = parser.parse_args()
+
+    limit = _raise_fd_limit(args.connections * 2 + 1000)
+    if limit < args.connections + 100:
+        sys.exit(f"open file limit {limit} is too low for {args.connections} connections")
+
+    from seed_data import generate
+    from sqlalchemy import create_engine
+
+    workdir = tempfile.mkdtemp(prefix="sse_bench_")
+    db_path = os.path.join(workdir, "bench.db")
+    generate(create_engine(f"sqlite:///{db_path}"), owners=args.owners, halls=args.owners, users=10, bookings=0,
+             password_hash="x", log=lambda message: None)
+    with sqlite3.connect(db_path) as connection:
+        rows = connection.execute(
+            "SELECT users.email, MIN(halls.id) FROM halls JOIN users ON users.id = halls.owner_id "
+            "GROUP BY users.email").fetchall()
+    halls_by_owner = dict(rows)
+    owners = sorted(halls_by_owner)
+
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", RATE_LIMIT_ENABLED="0",
+               OWNER_FEED_KEEPALIVE_S=str(args.keepalive), CREATE_TABLES_ON_STARTUP="1")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", "1",
+         "--log-level", "warning", "--backlog", "4096", "--timeout-keep-alive", "3600"],
+        env=env, stdout=subprocess.DEVNULL  # the engine echoes SQL to stdout
+    )
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    sys.exit("worker did not start")
+                time.sleep(0.2)
+        ok = asyncio.run(run(port, server.pid, owners, halls_by_owner, args.connections, args.bookings,
+                             args.hold, args.open_concurrency))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# ==================== benchmarks/startup_bench.py ====================
+"""
+Cold start benchmark and import-time profile for `main`.
+
+Every run is a fresh interpreter, so nothing is cached in sys.modules. It
+reports the time to import main, to finish startup (lifespan, including the
+create_all DDL) and to answer the first /health request. It also lists any
+heavy ML modules that got imported on the way, which should be none. With
+--profile it prints the slowest imports from `python -X importtime`.
+
+Run from the backend directory:
+    python -m benchmarks.startup_bench --runs 5 --profile
+    python -m benchmarks.startup_bench --save-baseline benchmarks/baselines/startup.json
+    python -m benchmarks.startup_bench --compare benchmarks/baselines/startup.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from lazy_imports import HEAVY_MODULES
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+_COLD_START = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    status = client.get("/health").status_code
+    answered = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "startup_s": ready - imported,
+    "first_request_s": answered - started,
+    "status": status,
+    "heavy_modules": sorted(name for name in %r if name in sys.modules),
+}))
+"""
+
+
+def _env(database_url):
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url
+    return env
+
+
+def measure_cold_start(database_url):
+    """One fresh-interpreter run; process_s includes interpreter startup"""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", _COLD_START % (HEAVY_MODULES,)],
+        cwd=BACKEND_DIR, env=_env(database_url), capture_output=True, text=True, check=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - started
+    return result
+
+
+def import_profile(database_url, top=15):
+    """(self_us, cumulative_us, module) rows from -X importtime, slowest cumulative first"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=_env(database_url), capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    by_cumulative = sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+    by_self = sorted(rows, key=lambda row: row[0], reverse=True)[:top]
+    return by_cumulative, by_self
+
+
+def summarize(runs):
+    keys = ("import_s", "startup_s", "first_request_s", "process_s")
+    summary = {f"{key[:-2]}_ms": round(statistics.median(run[key] for run in runs) * 1000, 1) for key in keys}
+    summary["heavy_modules"] = sorted({name for run in runs for name in run["heavy_modules"]})
+    return summary
+
+
+def compare(summary, baseline, tolerance):
+    regressions = []
+    for key in ("import_ms", "first_request_ms", "process_ms"):
+        previous = baseline.get("summary", {}).get(key)
+        if previous and summary[key] > previous * (1 + tolerance):
+            regressions.append(f"{key}: {previous} -> {summary[key]}")
+    if summary["heavy_modules"]:
+        regressions.append(f"heavy modules imported at startup: {', '.join(summary['heavy_modules'])}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--profile", action="store_true", help="print the slowest imports")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--save-baseline", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup_bench.db')}"
+
+    if args.profile:
+        by_cumulative, by_self = import_profile(database_url, args.top)
+        print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for self_us, cumulative_us, name in by_cumulative:
+            print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+        print(f"\n{'self ms':>14}  module (by self time)")
+        for self_us, _, name in by_self:
+            print(f"{self_us / 1000:>14.1f}  {name.strip()}")
+        print()
+
+    runs = [measure_cold_start(database_url) for _ in range(args.runs)]
+    summary = summarize(runs)
+    print(f"cold start over {args.runs} runs (median): import {summary['import_ms']} ms, "
+          f"startup {summary['startup_ms']} ms, first request {summary['first_request_ms']} ms, "
+          f"process {summary['process_ms']} ms")
+    print(f"heavy modules loaded: {summary['heavy_modules'] or 'none'}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as handle:
+            json.dump({"created_at": datetime.utcnow().isoformat(), "summary": summary}, handle, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(summary, json.load(handle), args.tolerance)
+        if regressions:
+            print("REGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"no regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
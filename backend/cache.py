@@ -0,0 +1,433 @@
+# ==================== cache.py ====================
+"""
+Two-level cache shared by all workers.
+
+L1 is a small in-process LRU with a short TTL. L2 is a network cache with a
+Redis-compatible interface (get/set/delete/incr/publish/pubsub). CACHE_REDIS_URL
+selects a real Redis server. Without it, FakeRedis stands in: same interface,
+in this process only, so the test suite and single-worker runs need no server.
+
+- Versioned keys: every key embeds its namespace version, so
+  invalidate_namespace() retires a whole namespace with a single INCR.
+- Pub/sub invalidation: invalidations are published on one channel and every
+  worker drops the matching L1 entries. If a message is lost, L1's TTL bounds
+  staleness: entries expire after it, and namespace versions are re-read
+  after it.
+- Stampede protection: concurrent misses for one key in a worker share a
+  single load, and across workers a short SET NX lock lets one load while
+  the others briefly wait for its result.
+- Load/invalidate races: invalidate() also stamps the key with a fresh
+  generation token. A load that sees the token (or the namespace version)
+  change while its loader ran returns its value without caching it, so a
+  row read just before a commit cannot be put back after the commit's
+  invalidation.
+
+Cached values are stored as JSON and must be treated as read-only. Nothing
+read from the shared tier is ever unpickled: anyone able to write to it
+could otherwise run code in every worker. ORM rows are cached as plain
+column dicts (row_dto) without credential fields, and rebuilt as detached
+instances (row_from_dto). Those are attached to a request's session with
+db.merge(obj, load=False), which costs no query.
+"""
+import enum
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Date, DateTime, Enum, event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "hallbook")
+CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", 300))
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", 30))
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", 10_000))
+# How long one worker may hold the load lock before others give up waiting
+CACHE_LOCK_MS = 2000
+
+_MISSING = object()
+
+
+# ---------- Local stand-in for Redis ----------
+
+class _FakePubSub:
+    def __init__(self, server: "FakeRedis", ignore_subscribe_messages: bool = False):
+        self.server = server
+        self.messages: "queue.Queue[dict]" = queue.Queue()
+        self.channels = set()
+
+    def subscribe(self, *channels):
+        for channel in channels:
+            self.channels.add(channel)
+            self.server._subscribers.setdefault(channel, []).append(self)
+
+    def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0) -> Optional[dict]:
+        try:
+            return self.messages.get(timeout=timeout) if timeout else self.messages.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        for channel in self.channels:
+            self.server._subscribers.get(channel, []).remove(self)
+        self.channels.clear()
+
+
+class FakeRedis:
+    """The subset of redis.Redis used by TwoLevelCache, kept in process memory"""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}  # key -> (value, expires_at or None)
+        self._subscribers: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry is not None else None
+
+    def set(self, key: str, value, ex: Optional[float] = None, px: Optional[int] = None, nx: bool = False):
+        expires_at = None
+        if ex is not None:
+            expires_at = time.monotonic() + ex
+        elif px is not None:
+            expires_at = time.monotonic() + px / 1000
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            self._data[key] = (value if isinstance(value, bytes) else str(value).encode(), expires_at)
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            entry = self._live(key)
+            value = int(entry[0]) + 1 if entry is not None else 1
+            self._data[key] = (str(value).encode(), entry[1] if entry is not None else None)
+            return value
+
+    def publish(self, channel: str, message) -> int:
+        data = message if isinstance(message, bytes) else str(message).encode()
+        subscribers = list(self._subscribers.get(channel, []))
+        for subscriber in subscribers:
+            subscriber.messages.put({"type": "message", "channel": channel.encode(), "data": data})
+        return len(subscribers)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> _FakePubSub:
+        return _FakePubSub(self, ignore_subscribe_messages)
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+
+
+def create_backend(url: str = CACHE_REDIS_URL):
+    if url:
+        import redis  # optional dependency, only needed with a real server
+        return redis.Redis.from_url(url)
+    return FakeRedis()
+
+
+# ---------- Two-level cache ----------
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TwoLevelCache:
+    def __init__(self, backend, prefix: str = CACHE_PREFIX, default_ttl: int = CACHE_DEFAULT_TTL,
+                 local_ttl: float = CACHE_LOCAL_TTL, local_max_entries: int = CACHE_LOCAL_MAX_ENTRIES,
+                 enabled: bool = CACHE_ENABLED):
+        self.backend = backend
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.local_ttl = local_ttl
+        self.local_max_entries = local_max_entries
+        self.enabled = enabled
+        self.channel = f"{prefix}:invalidate"
+        self.origin = uuid.uuid4().hex[:12]
+
+        self._local: "OrderedDict[tuple, tuple]" = OrderedDict()  # (ns, version, key) -> (expires, value)
+        self._versions: Dict[str, Tuple[int, float]] = {}  # namespace -> (version, re-read after)
+        self._flights: Dict[tuple, _Flight] = {}
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+
+    # ----- keys and versions -----
+
+    def _version(self, namespace: str) -> int:
+        # Re-read after local_ttl, so a lost "*" message cannot pin an old version
+        entry = self._versions.get(namespace)
+        if entry is None or entry[1] <= time.monotonic():
+            raw = self.backend.get(f"{self.prefix}:version:{namespace}")
+            entry = self._versions[namespace] = (int(raw) if raw else 0, time.monotonic() + self.local_ttl)
+        return entry[0]
+
+    def _shared_key(self, namespace: str, version: int, key) -> str:
+        return f"{self.prefix}:{namespace}:v{version}:{key}"
+
+    # ----- L1 -----
+
+    def _local_get(self, local_key: tuple):
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                del self._local[local_key]
+                return _MISSING
+            self._local.move_to_end(local_key)
+            return entry[1]
+
+    def _local_set(self, local_key: tuple, value):
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + self.local_ttl, value)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _drop_local(self, namespace: str, key=None):
+        with self._lock:
+            if key is None:
+                self._versions.pop(namespace, None)
+            for local_key in [k for k in self._local if k[0] == namespace and (key is None or k[2] == key)]:
+                del self._local[local_key]
+
+    # ----- public API -----
+
+    def namespace_version(self, namespace: str) -> int:
+        """Current version, for keys that must also expire with another namespace"""
+        return self._version(namespace)
+
+    def get(self, namespace: str, key, default=None):
+        if not self.enabled:
+            return default
+        self._ensure_listener()
+        version = self._version(namespace)
+        local_key = (namespace, version, str(key))
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            return value
+        blob = self.backend.get(self._shared_key(namespace, version, key))
+        if blob is None:
+            return default
+        try:
+            value = json.loads(blob)
+        except ValueError:
+            return default  # not written by this cache; treat as a miss
+
+        self._local_set(local_key, value)
+        return value
+
+    def set(self, namespace: str, key, value, ttl: Optional[int] = None):
+        """Store a value; returns the detached copy kept in the local tier"""
+        if not self.enabled or value is None:
+            return value
+        version = self._version(namespace)
+        blob = json.dumps(value, separators=(",", ":"))
+        self.backend.set(self._shared_key(namespace, version, key), blob, ex=ttl or self.default_ttl)
+        # Keep the decoded copy, so callers get the same shape as from a shared-tier hit
+        copy = json.loads(blob)
+        self._local_set((namespace, version, str(key)), copy)
+        return copy
+
+    def get_or_load(self, namespace: str, key, loader: Callable[[], Any], ttl: Optional[int] = None):
+        """Cached value, or loader() run once per key across concurrent callers; None is not cached"""
+        if not self.enabled:
+            return loader()
+        value = self.get(namespace, key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        flight_key = (namespace, str(key))
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._load_shared(namespace, key, loader, ttl)
+            return flight.value
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(flight_key, None)
+            flight.done.set()
+
+    def _load_shared(self, namespace: str, key, loader, ttl):
+        # Cross-worker single flight: whoever takes the lock loads, others poll briefly
+        version = self._version(namespace)
+        shared_key = self._shared_key(namespace, version, key)
+        lock_key = f"{shared_key}:lock"
+        locked = self.backend.set(lock_key, self.origin, px=CACHE_LOCK_MS, nx=True)
+        if not locked:
+            deadline = time.monotonic() + CACHE_LOCK_MS / 1000
+            while time.monotonic() < deadline:
+                time.sleep(0.02)
+                value = self.get(namespace, key, _MISSING)
+                if value is not _MISSING:
+                    return value
+        try:
+            generation = self.backend.get(f"{shared_key}:gen")
+            value = loader()
+            if value is None:
+                return None
+            if self._version(namespace) != version or self.backend.get(f"{shared_key}:gen") != generation:
+                # Invalidated while loading: the value may predate that change, so don't keep it
+                return json.loads(json.dumps(value, separators=(",", ":")))
+            return self.set(namespace, key, value, ttl)
+        finally:
+            if locked:
+                self._release(lock_key)
+
+    def _release(self, lock_key: str):
+        # Only delete our own lock: after a slow load it may have expired and been taken
+        # by another worker. (Single flight means one loader per key in this worker.)
+        if self.backend.get(lock_key) == self.origin.encode():
+            self.backend.delete(lock_key)
+
+    def invalidate(self, namespace: str, key):
+        shared_key = self._shared_key(namespace, self._version(namespace), key)
+        # New generation first: a load already running must not store what it read
+        self.backend.set(f"{shared_key}:gen", uuid.uuid4().hex, ex=self.default_ttl)
+        self.backend.delete(shared_key)
+        self._drop_local(namespace, str(key))
+        self.backend.publish(self.channel, f"{self.origin}|{namespace}|{key}")
+
+    def invalidate_namespace(self, namespace: str):
+        self._drop_local(namespace)
+        version = self.backend.incr(f"{self.prefix}:version:{namespace}")
+        self._versions[namespace] = (version, time.monotonic() + self.local_ttl)
+        self.backend.publish(self.channel, f"{self.origin}|{namespace}|*")
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+            self._versions.clear()
+
+    # ----- pub/sub -----
+
+    def _ensure_listener(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                pubsub = self.backend.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self._listener = threading.Thread(target=self._listen, args=(pubsub,),
+                                                  name="cache-invalidation", daemon=True)
+                self._listener.start()
+
+    def _listen(self, pubsub):
+        while True:
+            try:
+                message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception:
+                # Connection trouble: forget L1 (it may have missed messages) and retry
+                self.clear_local()
+                time.sleep(1.0)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            self.apply_invalidation(message["data"])
+
+    def apply_invalidation(self, data):
+        origin, namespace, key = (data.decode() if isinstance(data, bytes) else data).split("|", 2)
+        if origin == self.origin:
+            return
+        self._drop_local(namespace, None if key == "*" else key)
+
+
+cache = TwoLevelCache(create_backend())
+
+
+# ---------- ORM rows as plain data ----------
+
+def row_dto(obj, exclude: Iterable[str] = ()) -> dict:
+    """JSON-ready column values of an ORM row, leaving out `exclude` (credentials)"""
+    dto = {}
+    for column in inspect(obj).mapper.column_attrs:
+        if column.key in exclude:
+            continue
+        value = getattr(obj, column.key)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, enum.Enum):
+            value = value.value
+        dto[column.key] = value
+    return dto
+
+
+def row_from_dto(model, dto: dict):
+    """Detached instance of model from row_dto(); left-out columns load on first access"""
+    values = {}
+    for column in inspect(model).column_attrs:
+        if column.key not in dto:
+            continue
+        value, column_type = dto[column.key], column.columns[0].type
+        if value is not None:
+            if isinstance(column_type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column_type, Date):
+                value = date.fromisoformat(value)
+            elif isinstance(column_type, Enum) and column_type.enum_class is not None:
+                value = column_type.enum_class(value)
+        values[column.key] = value
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    return obj
+
+
+# ---------- Invalidate once the transaction commits ----------
+
+def invalidate_on_commit(db: Session, namespace: str, key=None):
+    """Queue an invalidation that runs only if (and after) the session commits.
+
+    Invalidating before commit would let a concurrent reader re-cache the old
+    row between the invalidation and the commit.
+    """
+    db.info.setdefault("cache_invalidations", set()).add((namespace, None if key is None else str(key)))
+
+
+@event.listens_for(Session, "after_commit")
+def _run_invalidations(session):
+    for namespace, key in session.info.pop("cache_invalidations", ()):
+        if key is None:
+            cache.invalidate_namespace(namespace)
+        else:
+            cache.invalidate(namespace, key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_invalidations(session):
+    session.info.pop("cache_invalidations", None)
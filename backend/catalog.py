@@ -0,0 +1,458 @@
+# ==================== catalog.py ====================
+"""
+Read-optimized in-process snapshot of the hall catalog.
+
+Each worker keeps the catalog in columns: NumPy arrays for id, capacity, price,
+availability and coordinates, and interned codes for location. Next to them sits a
+compact row store of HallRecord objects that carry every HallResponse field.
+Catalog filters (min_capacity, max_price, location, available) and sorting
+are vectorized mask/argsort operations, so they never touch the database or
+build ORM objects.
+
+Freshness:
+- Every hall insert/update/delete appends the hall id to `hall_changes`
+  (mapper events, plus bump_owner_halls for its bulk update).
+- A snapshot remembers the last change seq it applied. Once it is older than
+  CATALOG_MAX_STALENESS_MS, the next read replays newer changes (one indexed
+  range query) and reloads only those halls. A worker therefore never
+  serves data older than that bound.
+- Commits in this worker mark the snapshot dirty, so a worker reads its own
+  writes immediately.
+- Autoincrement seqs can commit out of order. Skipped seqs are re-checked
+  for CATALOG_GAP_WAIT_S before they are written off as rolled back.
+
+Snapshots are immutable. A refresh builds a new one (copy-on-write arrays)
+and swaps it in, so readers never need a lock. A snapshot reloads in full
+once per CATALOG_FULL_RELOAD_S, and whenever its catalog version moved
+without a visible change to replay. The app lifespan trims the log with
+start_pruning(), on a timer thread of its own, off the request path.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, func, insert, literal, or_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, object_session
+
+from facilities import facility_set
+from lazy_imports import lazy_module
+from models import CatalogVersion, Hall, HallChange, User
+
+np = lazy_module("numpy")
+logger = logging.getLogger("catalog")
+
+CATALOG_ENABLED = os.getenv("CATALOG_ENABLED", "1").lower() in ("1", "true", "yes")
+CATALOG_MAX_STALENESS_MS = float(os.getenv("CATALOG_MAX_STALENESS_MS", 1000))
+CATALOG_GAP_WAIT_S = 60.0
+# Must stay below the retention used by prune_changes()
+CATALOG_FULL_RELOAD_S = float(os.getenv("CATALOG_FULL_RELOAD_S", 3600))
+# Rebuild the arrays once this share of positions belongs to deleted halls
+COMPACT_RATIO = 0.25
+ID_BATCH = 500
+
+
+# ---------- Row store ----------
+
+class OwnerRecord:
+    __slots__ = ("id", "email", "full_name", "phone", "role", "created_at")
+
+    def __init__(self, id, email, full_name, phone, role, created_at):
+        self.id, self.email, self.full_name = id, email, full_name
+        self.phone, self.role, self.created_at = phone, role, created_at
+
+
+class HallRecord:
+    """Read-only hall row with the attributes HallResponse and the AI engines read"""
+    __slots__ = ("id", "name", "description", "capacity", "price_per_hour", "facilities", "location",
+                 "latitude", "longitude", "image_url", "available", "owner_id", "version", "owner")
+    distance_km = None
+
+    def __init__(self, row, owner: Optional[OwnerRecord]):
+        (self.id, self.name, self.description, self.capacity, self.price_per_hour, self.facilities,
+         self.location, self.latitude, self.longitude, self.image_url, self.available, self.owner_id,
+         self.version) = row
+        self.owner = owner
+
+
+_HALL_COLUMNS = ("id", "name", "description", "capacity", "price_per_hour", "facilities", "location",
+                 "latitude", "longitude", "image_url", "available", "owner_id", "version")
+_OWNER_COLUMNS = ("id", "email", "full_name", "phone", "role", "created_at")
+
+
+def _load_records(db: Session, hall_ids: Optional[Iterable[int]] = None) -> List[HallRecord]:
+    halls, users = Hall.__table__, User.__table__
+    stmt = select(*[halls.c[name] for name in _HALL_COLUMNS], *[users.c[name] for name in _OWNER_COLUMNS]) \
+        .select_from(halls.outerjoin(users, users.c.id == halls.c.owner_id))
+    if hall_ids is None:
+        batches = [stmt.order_by(halls.c.id)]
+    else:
+        hall_ids = sorted(hall_ids)
+        batches = [stmt.where(halls.c.id.in_(hall_ids[start:start + ID_BATCH]))
+                   for start in range(0, len(hall_ids), ID_BATCH)]
+
+    owners: Dict[int, OwnerRecord] = {}
+    records = []
+    split = len(_HALL_COLUMNS)
+    for batch in batches:
+        for row in db.execute(batch):
+            owner = None
+            if row[split] is not None:
+                owner = owners.get(row[split])
+                if owner is None:
+                    owner = owners[row[split]] = OwnerRecord(*row[split:])
+            records.append(HallRecord(row[:split], owner))
+    return records
+
+
+class _Locations:
+    """Interned location strings shared by every snapshot of one catalog (append-only)"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.lowered: List[str] = []
+        self._lock = threading.Lock()
+
+    def code(self, location: Optional[str]) -> int:
+        if location is None:
+            return -1
+        code = self.codes.get(location)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(location)
+                if code is None:
+                    self.lowered.append(location.lower())
+                    code = self.codes[location] = len(self.lowered) - 1
+        return code
+
+    def matching(self, needle: str) -> List[int]:
+        needle = needle.lower()
+        return [code for code, text in enumerate(list(self.lowered)) if needle in text]
+
+    def equal(self, location: str) -> List[int]:
+        """Codes of the locations equal to this one, ignoring case"""
+        location = location.lower()
+        return [code for code, text in enumerate(list(self.lowered)) if text == location]
+
+
+# ---------- Snapshot ----------
+
+SORT_KEYS = ("id", "name", "price", "capacity")
+
+
+class CatalogSnapshot:
+    def __init__(self, records: List[HallRecord], locations: _Locations,
+                 catalog_version: int, last_seq: int):
+        self.records = records
+        self.locations = locations
+        self.catalog_version = catalog_version
+        self.last_seq = last_seq
+        self.loaded_at = time.monotonic()
+        self.index = {record.id: position for position, record in enumerate(records)}
+        self.live = np.ones(len(records), dtype=bool)
+        self.ids = np.array([record.id for record in records], dtype=np.int64)
+        # NaN never satisfies a comparison, like NULL in SQL
+        self.capacity = np.array([np.nan if record.capacity is None else record.capacity for record in records],
+                                 dtype=float)
+        self.price = np.array([np.nan if record.price_per_hour is None else record.price_per_hour
+                               for record in records], dtype=float)
+        self.available = np.array([bool(record.available) for record in records], dtype=bool)
+        self.location_codes = np.array([locations.code(record.location) for record in records], dtype=np.int32)
+        self.latitude = np.array([np.nan if record.latitude is None else record.latitude for record in records],
+                                 dtype=float)
+        self.longitude = np.array([np.nan if record.longitude is None else record.longitude for record in records],
+                                  dtype=float)
+        self._orders: Dict[str, "np.ndarray"] = {}
+        self._facility_masks: Dict[str, "np.ndarray"] = {}
+
+    def _fill(self, position: int, record: HallRecord):
+        self.ids[position] = record.id
+        self.capacity[position] = np.nan if record.capacity is None else record.capacity
+        self.price[position] = np.nan if record.price_per_hour is None else record.price_per_hour
+        self.available[position] = bool(record.available)
+        self.location_codes[position] = self.locations.code(record.location)
+        self.latitude[position] = np.nan if record.latitude is None else record.latitude
+        self.longitude[position] = np.nan if record.longitude is None else record.longitude
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, hall_id: int) -> Optional[HallRecord]:
+        position = self.index.get(hall_id)
+        return self.records[position] if position is not None else None
+
+    # ----- incremental refresh -----
+
+    def apply(self, changed: Dict[int, Optional[HallRecord]], catalog_version: int, last_seq: int) -> "CatalogSnapshot":
+        """New snapshot with changed halls replaced, added or (None) removed"""
+        records, index, live = list(self.records), dict(self.index), self.live.copy()
+        appended = []
+        for hall_id, record in changed.items():
+            position = index.get(hall_id)
+            if position is None:
+                if record is not None:
+                    appended.append(record)
+            elif record is None:
+                records[position] = None
+                live[position] = False
+                del index[hall_id]
+            else:
+                records[position] = record
+
+        if len(records) - len(index) > COMPACT_RATIO * len(records):
+            return CatalogSnapshot([record for record in records if record is not None] + appended,
+                                   self.locations, catalog_version, last_seq)
+
+        grow = len(appended)
+        snapshot = object.__new__(CatalogSnapshot)
+        snapshot.records, snapshot.index, snapshot.locations = records + appended, index, self.locations
+        snapshot.catalog_version, snapshot.last_seq = catalog_version, last_seq
+        snapshot.loaded_at, snapshot._orders, snapshot._facility_masks = self.loaded_at, {}, {}
+        snapshot.live = np.concatenate([live, np.ones(grow, dtype=bool)])
+        snapshot.ids = np.concatenate([self.ids, np.zeros(grow, dtype=np.int64)])
+        snapshot.capacity = np.concatenate([self.capacity, np.full(grow, np.nan)])
+        snapshot.price = np.concatenate([self.price, np.full(grow, np.nan)])
+        snapshot.available = np.concatenate([self.available, np.zeros(grow, dtype=bool)])
+        snapshot.location_codes = np.concatenate([self.location_codes, np.full(grow, -1, dtype=np.int32)])
+        snapshot.latitude = np.concatenate([self.latitude, np.full(grow, np.nan)])
+        snapshot.longitude = np.concatenate([self.longitude, np.full(grow, np.nan)])
+        for offset, record in enumerate(appended):
+            index[record.id] = len(records) + offset
+        for hall_id, record in changed.items():
+            if record is not None:
+                snapshot._fill(index[hall_id], record)
+        return snapshot
+
+    # ----- queries -----
+
+    def _order(self, sort: str) -> "np.ndarray":
+        """Positions of live halls sorted by the key, ties broken by id (cached per snapshot)"""
+        order = self._orders.get(sort)
+        if order is None:
+            key = sort.lstrip("-")
+            if key not in SORT_KEYS:
+                raise ValueError(f"Unknown sort key {sort!r}")
+            if sort.startswith("-"):
+                # Same as SQL "key DESC, id DESC": the ascending order walked backwards
+                order = self._order(key)[::-1]
+            else:
+                positions = np.flatnonzero(self.live)
+                ids = self.ids[positions]
+                if key == "id":
+                    values = ids
+                elif key == "name":
+                    # Case-insensitive like the default MySQL collation; equal names share a rank
+                    names = np.array([(self.records[position].name or "").lower() for position in positions],
+                                     dtype=object)
+                    values = np.unique(names, return_inverse=True)[1] if len(names) else ids
+                else:
+                    values = (self.price if key == "price" else self.capacity)[positions]
+                    # Missing values sort first, as NULLs do in ascending SQL order
+                    values = np.where(np.isnan(values), -np.inf, values)
+                order = positions[np.lexsort((ids, values))]
+            self._orders[sort] = order
+        return order
+
+    def facility_mask(self, slug: str) -> "np.ndarray":
+        """Positions whose hall has the facility (computed once per snapshot and facility)"""
+        mask = self._facility_masks.get(slug)
+        if mask is None:
+            mask = self._facility_masks[slug] = np.array(
+                [record is not None and slug in facility_set(record.facilities) for record in self.records],
+                dtype=bool)
+        return mask
+
+    def mask(self, min_capacity=None, max_price=None, location=None, available=None) -> "np.ndarray":
+        mask = self.live.copy()
+        if min_capacity:
+            mask &= self.capacity >= min_capacity
+        if max_price:
+            mask &= self.price <= max_price
+        if location:
+            mask &= np.isin(self.location_codes, self.locations.matching(location))
+        if available is not None:
+            mask &= self.available == available
+        return mask
+
+    def select(self, min_capacity=None, max_price=None, location=None, available=None,
+               sort: str = "id", skip: int = 0, limit: Optional[int] = None) -> List[HallRecord]:
+        order = self._order(sort)
+        order = order[self.mask(min_capacity, max_price, location, available)[order]]
+        end = None if limit is None else skip + limit
+        return [self.records[position] for position in order[skip:end]]
+
+
+# ---------- Per-engine catalog with bounded staleness ----------
+
+class Catalog:
+    def __init__(self, max_staleness_ms: float = CATALOG_MAX_STALENESS_MS):
+        self.max_staleness = max_staleness_ms / 1000
+        self.locations = _Locations()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._dirty = False
+        self._gaps: Dict[int, float] = {}  # skipped seq -> first seen
+        self._lock = threading.Lock()
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def _fresh(self) -> bool:
+        return (self._snapshot is not None and not self._dirty
+                and time.monotonic() - self._checked_at <= self.max_staleness)
+
+    def snapshot(self, db: Session) -> CatalogSnapshot:
+        if not self._fresh():
+            with self._lock:
+                if not self._fresh():
+                    self._refresh(db)
+        return self._snapshot
+
+    def _refresh(self, db: Session):
+        started = time.monotonic()
+        self._dirty = False  # a commit racing with this refresh marks it dirty again
+        snapshot = self._snapshot
+        version = db.query(CatalogVersion.version).filter(CatalogVersion.name == "halls").scalar() or 1
+        if snapshot is not None and started - snapshot.loaded_at <= CATALOG_FULL_RELOAD_S:
+            snapshot = self._replay(db, snapshot, version, started)
+        else:
+            snapshot = None
+        if snapshot is None:
+            last_seq = db.query(func.max(HallChange.seq)).scalar() or 0
+            self._gaps.clear()
+            snapshot = CatalogSnapshot(_load_records(db), self.locations, version, last_seq)
+        self._snapshot = snapshot
+        self._checked_at = started
+
+    def _replay(self, db: Session, snapshot: CatalogSnapshot, version: int, now: float) -> Optional[CatalogSnapshot]:
+        """The snapshot with newer changes applied, or None when the log cannot explain the new version"""
+        condition = HallChange.seq > snapshot.last_seq
+        if self._gaps:
+            condition = or_(condition, HallChange.seq.in_(list(self._gaps)))
+        rows = db.query(HallChange.seq, HallChange.hall_id).filter(condition).all()
+
+        seen = {seq for seq, _ in rows}
+        last_seq = max([snapshot.last_seq, *seen])
+        for seq in seen:
+            self._gaps.pop(seq, None)
+        for seq in range(snapshot.last_seq + 1, last_seq):
+            if seq not in seen:
+                self._gaps.setdefault(seq, now)
+        for seq, first_seen in list(self._gaps.items()):
+            if now - first_seen > CATALOG_GAP_WAIT_S:
+                del self._gaps[seq]
+
+        if not rows:
+            # The version moved but no change is visible (log pruned past us, seqs reused):
+            # relabelling the old rows would hand out a new ETag with stale data
+            return snapshot if version == snapshot.catalog_version else None
+        hall_ids = {hall_id for _, hall_id in rows}
+        records = {record.id: record for record in _load_records(db, hall_ids)}
+        return snapshot.apply({hall_id: records.get(hall_id) for hall_id in hall_ids}, version, last_seq)
+
+
+_catalogs: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(db: Session) -> Catalog:
+    """The catalog of the database the session is bound to"""
+    engine = db.get_bind()
+    catalog = _catalogs.get(engine)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(engine)
+            if catalog is None:
+                catalog = _catalogs[engine] = Catalog()
+    return catalog
+
+
+def get_snapshot(db: Session) -> CatalogSnapshot:
+    return get_catalog(db).snapshot(db)
+
+
+# ---------- Change log ----------
+
+def log_owner_halls(db: Session, owner_id: int):
+    """Log every hall of an owner (their details are part of each hall row); call before commit"""
+    db.execute(insert(HallChange.__table__).from_select(
+        ["hall_id", "changed_at"], select(Hall.id, literal(datetime.utcnow())).where(Hall.owner_id == owner_id)
+    ))
+    db.info["catalog_changed"] = True
+
+
+def prune_changes(engine: Engine, keep: timedelta = timedelta(seconds=2 * CATALOG_FULL_RELOAD_S)) -> int:
+    """Delete log entries no snapshot can still need, in a transaction of its own"""
+    table = HallChange.__table__
+    with engine.begin() as connection:
+        # Keep the newest entry: tables created without AUTOINCREMENT (and MySQL < 8 after a
+        # restart) hand out max(seq) + 1 again, so an emptied log would reuse old seqs
+        newest = connection.execute(select(func.max(table.c.seq))).scalar()
+        return connection.execute(delete(table).where(
+            table.c.changed_at < datetime.utcnow() - keep, table.c.seq != newest
+        )).rowcount
+
+
+def _prune_quietly(engine: Engine):
+    try:
+        prune_changes(engine)
+    except Exception:
+        # The log just grows until the next round tries again
+        logger.exception("Pruning hall_changes failed")
+
+
+_pruner: Optional[threading.Thread] = None
+_pruner_stop = threading.Event()
+
+
+def start_pruning(engine: Engine, interval_s: float = CATALOG_FULL_RELOAD_S):
+    """Prune the change log now and every interval_s on a daemon thread; call from the app lifespan"""
+    global _pruner
+    if _pruner is not None and _pruner.is_alive():
+        return
+    _pruner_stop.clear()
+
+    def run():
+        while True:
+            _prune_quietly(engine)
+            if _pruner_stop.wait(interval_s):
+                return
+
+    _pruner = threading.Thread(target=run, name="catalog-prune", daemon=True)
+    _pruner.start()
+
+
+def stop_pruning():
+    global _pruner
+    _pruner_stop.set()
+    if _pruner is not None:
+        _pruner.join()
+        _pruner = None
+
+
+def _log_hall(connection, hall: Hall):
+    connection.execute(insert(HallChange.__table__).values(hall_id=hall.id, changed_at=datetime.utcnow()))
+    session = object_session(hall)
+    if session is not None:
+        session.info["catalog_changed"] = True
+
+
+event.listen(Hall, "after_insert", lambda mapper, connection, hall: _log_hall(connection, hall))
+event.listen(Hall, "after_update", lambda mapper, connection, hall: _log_hall(connection, hall))
+event.listen(Hall, "after_delete", lambda mapper, connection, hall: _log_hall(connection, hall))
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_catalogs_dirty(session):
+    if session.info.pop("catalog_changed", False):
+        for catalog in list(_catalogs.values()):
+            catalog.mark_dirty()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_catalog_changes(session):
+    session.info.pop("catalog_changed", None)
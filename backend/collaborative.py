@@ -0,0 +1,231 @@
+# ==================== collaborative.py ====================
+"""
+Item-item collaborative filtering over the user x hall booking matrix.
+
+Training (offline, `python collaborative.py`):
+- Bookings are streamed in id batches into a binary user x hall CSR matrix.
+  A hall booked twice by one user counts once; rejected and cancelled
+  bookings are ignored.
+- Columns are L2-normalised, so X^T X holds the cosine similarity of every
+  pair of halls that share a customer. It is computed one block of halls at
+  a time, and each row is pruned to its TOP_K neighbours before the next
+  block. Memory stays bounded by the block, not by halls x halls.
+- The pruned halls x halls CSR matrix, the column -> hall id map and per-hall
+  popularity (distinct customers) are saved together in one .npz file,
+  under MODEL_DATA_DIR (backend/data/ by default).
+
+Serving is a sparse matrix-vector product: the user's booked halls select
+their rows of the similarity matrix, and the rows are summed. The cost grows
+with bookings x TOP_K, not with the number of users or halls. Workers load
+the file once and pick up a retrained model when it is replaced.
+"""
+import argparse
+import os
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from lazy_imports import lazy_module
+from models import Booking, BookingStatusEnum
+
+np = lazy_module("numpy")
+sparse = lazy_module("scipy.sparse")
+
+MODEL_DATA_DIR = os.getenv("MODEL_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+COLLABORATIVE_MODEL_PATH = os.getenv("COLLABORATIVE_MODEL_PATH", os.path.join(MODEL_DATA_DIR, "collaborative_model.npz"))
+# Neighbours kept per hall; the model holds at most halls * TOP_K similarities
+TOP_K = int(os.getenv("COLLABORATIVE_TOP_K", 50))
+IGNORED_STATUSES = (BookingStatusEnum.REJECTED, BookingStatusEnum.CANCELLED)
+
+
+class ItemItemModel:
+    def __init__(self, hall_ids, similarity, popularity):
+        self.hall_ids = hall_ids  # sorted, so a hall's column is a binary search away
+        self.similarity = similarity  # CSR, halls x halls, float32
+        self.popularity = popularity  # distinct customers per hall
+
+    @property
+    def nbytes(self) -> int:
+        matrix = self.similarity
+        return (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+                + self.hall_ids.nbytes + self.popularity.nbytes)
+
+    def _lookup(self, hall_ids: Iterable[int]):
+        """(known, columns): which of the halls the model has, and their columns"""
+        hall_ids = np.asarray(list(hall_ids), dtype=np.int64)
+        columns = np.searchsorted(self.hall_ids, hall_ids)
+        known = columns < len(self.hall_ids)
+        known[known] = self.hall_ids[columns[known]] == hall_ids[known]
+        return known, columns
+
+    def recommend(self, booked_hall_ids: Iterable[int], n: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(hall id, score) for halls similar to the booked ones, best first; booked halls excluded"""
+        known, columns = self._lookup(booked_hall_ids)
+        booked = np.unique(columns[known])
+        if not len(booked):
+            return []
+        rows = self.similarity[booked]
+        candidates, inverse = np.unique(rows.indices, return_inverse=True)
+        scores = np.bincount(inverse, weights=rows.data, minlength=len(candidates))
+        keep = ~np.isin(candidates, booked)
+        candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((self.hall_ids[candidates], -scores))[:n]
+        return [(int(self.hall_ids[candidates[position]]), float(scores[position])) for position in order]
+
+    def popularity_of(self, hall_ids: Iterable[int]):
+        """Distinct customers per hall (0 for halls never booked)"""
+        known, columns = self._lookup(hall_ids)
+        counts = np.zeros(len(columns), dtype=np.int64)
+        counts[known] = self.popularity[columns[known]]
+        return counts
+
+    def most_popular(self, hall_ids: Iterable[int], n: int) -> List[int]:
+        """Positions (within hall_ids) of the n most booked halls; ties keep the given order"""
+        return np.argsort(-self.popularity_of(hall_ids), kind="stable")[:n].tolist()
+
+    def save(self, path: Optional[str] = None):
+        # Write then rename, so serving workers never read a half-written file
+        path = path or COLLABORATIVE_MODEL_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary = f"{path}.tmp.npz"
+        matrix = self.similarity
+        np.savez(temporary, hall_ids=self.hall_ids, popularity=self.popularity, data=matrix.data,
+                 indices=matrix.indices, indptr=matrix.indptr)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "ItemItemModel":
+        with np.load(path or COLLABORATIVE_MODEL_PATH) as arrays:
+            size = len(arrays["hall_ids"])
+            similarity = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=(size, size))
+            return cls(arrays["hall_ids"], similarity, arrays["popularity"])
+
+
+# ---------- Training ----------
+
+def interaction_matrix(engine, batch_size: int = 200_000):
+    """(binary user x hall CSR matrix, hall id per column), read in booking id batches"""
+    table = Booking.__table__
+    pairs, last_id = [], 0
+    with engine.connect() as conn:
+        while True:
+            rows = conn.execute(
+                select(table.c.id, table.c.user_id, table.c.hall_id)
+                .where(table.c.id > last_id, table.c.status.notin_(IGNORED_STATUSES))
+                .order_by(table.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            batch = np.array(rows, dtype=np.int64)
+            # One key per (user, hall), deduplicated per batch to keep memory near the distinct pairs
+            pairs.append(np.unique(batch[:, 1] << 32 | batch[:, 2]))
+            last_id = int(batch[-1, 0])
+    keys = np.unique(np.concatenate(pairs)) if pairs else np.zeros(0, dtype=np.int64)
+    user_ids, rows = np.unique(keys >> 32, return_inverse=True)
+    hall_ids, columns = np.unique(keys & 0xFFFFFFFF, return_inverse=True)
+    matrix = sparse.csr_matrix((np.ones(len(keys), dtype=np.float32), (rows, columns)),
+                               shape=(len(user_ids), len(hall_ids)))
+    return matrix, hall_ids
+
+
+def _prune_rows(block, first_row: int, top_k: int):
+    """Drop each row's self-similarity and keep its top_k largest entries"""
+    block = block.tocsr()
+    block.sort_indices()
+    data, indices, indptr = [], [], [0]
+    for row in range(block.shape[0]):
+        start, end = block.indptr[row], block.indptr[row + 1]
+        row_indices, row_data = block.indices[start:end], block.data[start:end]
+        keep = row_indices != first_row + row
+        row_indices, row_data = row_indices[keep], row_data[keep]
+        if len(row_data) > top_k:
+            best = np.argpartition(-row_data, top_k - 1)[:top_k]
+            best.sort()
+            row_indices, row_data = row_indices[best], row_data[best]
+        data.append(row_data)
+        indices.append(row_indices)
+        indptr.append(indptr[-1] + len(row_data))
+    return (np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+            np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32), indptr)
+
+
+def fit(interactions, hall_ids, top_k: int = TOP_K, chunk_size: int = 2000, log=print) -> ItemItemModel:
+    """Cosine item-item model from a binary user x hall matrix, top_k neighbours per hall"""
+    started = time.perf_counter()
+    interactions = sparse.csr_matrix(interactions, dtype=np.float32)
+    popularity = np.asarray(interactions.getnnz(axis=0), dtype=np.int32)
+    norms = np.sqrt(np.asarray(interactions.multiply(interactions).sum(axis=0)).ravel())
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0).astype(np.float32)
+    normalized = (interactions @ sparse.diags(scale)).tocsr()
+    by_hall = normalized.T.tocsr()
+
+    halls = interactions.shape[1]
+    data, indices, indptr = [], [], [np.zeros(1, dtype=np.int64)]
+    for first in range(0, halls, chunk_size):
+        block = by_hall[first:first + chunk_size] @ normalized
+        block_data, block_indices, block_indptr = _prune_rows(block, first, top_k)
+        data.append(block_data.astype(np.float32))
+        indices.append(block_indices.astype(np.int32))
+        indptr.append(np.asarray(block_indptr[1:], dtype=np.int64) + indptr[-1][-1])
+        log(f"  {min(first + chunk_size, halls):,}/{halls:,} halls ({time.perf_counter() - started:.1f}s)")
+
+    similarity = sparse.csr_matrix((np.concatenate(data), np.concatenate(indices), np.concatenate(indptr)),
+                                   shape=(halls, halls))
+    return ItemItemModel(np.asarray(hall_ids, dtype=np.int64), similarity, popularity)
+
+
+def train(engine, top_k: int = TOP_K, chunk_size: int = 2000, log=print) -> ItemItemModel:
+    started = time.perf_counter()
+    interactions, hall_ids = interaction_matrix(engine)
+    log(f"Booking matrix: {interactions.shape[0]:,} users x {interactions.shape[1]:,} halls, "
+        f"{interactions.nnz:,} pairs ({time.perf_counter() - started:.1f}s)")
+    model = fit(interactions, hall_ids, top_k=top_k, chunk_size=chunk_size, log=log)
+    log(f"Model: {model.similarity.nnz:,} similarities, {model.nbytes / 2 ** 20:.1f} MiB "
+        f"({time.perf_counter() - started:.1f}s)")
+    return model
+
+
+# ---------- Serving ----------
+
+_loaded: Optional[Tuple[str, float, ItemItemModel]] = None
+_load_lock = threading.Lock()
+
+
+def get_model(path: Optional[str] = None) -> Optional[ItemItemModel]:
+    """The trained model, reloaded when the file is replaced; None until one is trained"""
+    global _loaded
+    path = path or COLLABORATIVE_MODEL_PATH
+    try:
+        modified = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+    loaded = _loaded
+    if loaded is not None and loaded[:2] == (path, modified):
+        return loaded[2]
+    with _load_lock:
+        if _loaded is None or _loaded[:2] != (path, modified):
+            _loaded = (path, modified, ItemItemModel.load(path))
+        return _loaded[2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL from the environment / .env")
+    parser.add_argument("--output", default=COLLABORATIVE_MODEL_PATH)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--chunk-size", type=int, default=2000, help="halls per similarity block")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        from sqlalchemy import create_engine
+        engine = create_engine(args.database_url)
+    else:
+        from database import engine
+    train(engine, top_k=args.top_k, chunk_size=args.chunk_size).save(args.output)
+    print(f"✅ Model written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
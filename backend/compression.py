@@ -0,0 +1,185 @@
+# ==================== compression.py ====================
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # br is only offered when the brotli package is installed
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "text/",
+)
+# Each event must reach the client as it is written; a compressor would hold it back
+STREAMED_TYPES = ("text/event-stream",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name] = q
+
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for name in candidates:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=brotli_quality)
+            self._compress = self._impl.process
+            self._finish = self._impl.finish
+        else:
+            # wbits=31 produces a gzip container
+            self._impl = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._compress = self._impl.compress
+            self._finish = self._impl.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+class CompressionMiddleware:
+    """Negotiated br/gzip compression for responses above a size threshold.
+
+    Buffered responses are compressed in one go; streaming responses are
+    compressed chunk by chunk. Strong ETags get an encoding suffix so each
+    representation keeps its own validator, and the suffix is stripped from
+    If-None-Match before the endpoint compares it.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = choose_encoding(headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        if "if-none-match" in headers:
+            # Rewritten in place so outer middleware still sees the routed scope
+            scope["headers"] = [
+                (key, _strip_etag_suffix(value.decode("latin-1"), encoding).encode("latin-1"))
+                if key == b"if-none-match" else (key, value)
+                for key, value in scope["headers"]
+            ]
+
+        responder = _CompressionResponder(self, encoding)
+        await self.app(scope, receive, responder.wrap(send))
+
+
+def _strip_etag_suffix(header: str, encoding: str) -> str:
+    suffix = f'-{encoding}"'
+    return ", ".join(
+        tag[:-len(suffix)] + '"' if tag.endswith(suffix) else tag
+        for tag in (part.strip() for part in header.split(","))
+    )
+
+
+def _suffix_etag(headers: MutableHeaders, encoding: str):
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/") and etag.endswith('"'):
+        headers["etag"] = f'{etag[:-1]}-{encoding}"'
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    def wrap(self, send: Send) -> Send:
+        async def wrapped(message: Message):
+            await self.handle(message, send)
+        return wrapped
+
+    async def handle(self, message: Message, send: Send):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = MutableHeaders(raw=message["headers"])
+            if message["status"] == 304:
+                _suffix_etag(headers, self.encoding)
+                headers.add_vary_header("Accept-Encoding")
+                self.passthrough = True
+                await send(message)
+                return
+            content_type = headers.get("content-type", "")
+            if ("content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith(STREAMED_TYPES)):
+                self.passthrough = True
+                await send(message)
+            else:
+                headers.add_vary_header("Accept-Encoding")
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start_message["headers"])
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                # Too small to be worth it; send as-is
+                self.passthrough = True
+                await send(self.start_message)
+                await send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            headers["Content-Encoding"] = self.encoding
+            _suffix_etag(headers, self.encoding)
+
+            if not more_body:
+                compressed = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(compressed))
+                await send(self.start_message)
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Streaming: the final size is unknown up front
+            del headers["Content-Length"]
+            await send(self.start_message)
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
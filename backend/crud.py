@@ -1,8 +1,19 @@
 # ==================== crud.py ====================
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from models import User, Hall, Booking, BookingStatusEnum, RoleEnum
-from schemas import UserCreate, HallCreate, BookingCreate
+from schemas import UserCreate, HallCreate, BookingCreate, BookingQuote
 from auth import get_password_hash
+from pricing import quote_booking
+from versioning import bump_catalog_version, bump_hall_version, get_hall_version
+from cache import cache, row_dto, row_from_dto
+from events import HallChanged, subscribe
+# Rollups and caches derived from halls and bookings follow domain events; importing registers them
+import timeseries  # noqa: F401
+import utilization  # noqa: F401
+import demand_forecast  # noqa: F401
+import personalization  # noqa: F401
+import geo  # noqa: F401  keeps Hall.geohash in sync with latitude/longitude
+import facilities  # noqa: F401  keeps hall_facilities in sync with Hall.facilities
 from datetime import datetime
 from fastapi import HTTPException
 
@@ -37,6 +48,7 @@ def get_user_by_id(db: Session, user_id: int):
 def create_hall(db: Session, hall: HallCreate, owner_id: int):
     db_hall = Hall(**hall.dict(), owner_id=owner_id)
     db.add(db_hall)
+    bump_catalog_version(db)
     db.commit()
     db.refresh(db_hall)
     return db_hall
@@ -44,14 +56,30 @@ def create_hall(db: Session, hall: HallCreate, owner_id: int):
 def get_halls(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Hall).offset(skip).limit(limit).all()
 
-def get_hall(db: Session, hall_id: int):
-    return db.query(Hall).filter(Hall.id == hall_id).first()
+def get_hall(db: Session, hall_id: int, cached: bool = True, version: int = None):
+    # Read paths use the shared cache; writes pass cached=False to lock in fresh state
+    if not cached:
+        return db.query(Hall).filter(Hall.id == hall_id).first()
+    def load():
+        hall = db.query(Hall).filter(Hall.id == hall_id).first()
+        return row_dto(hall) if hall else None
+
+    dto = cache.get_or_load("halls", hall_id, load)
+    if dto is not None and version is not None and dto.get("version") != version:
+        # Cached copy predates the caller's version (its invalidation has not arrived yet)
+        cache.invalidate("halls", hall_id)
+        return db.query(Hall).populate_existing().filter(Hall.id == hall_id).first()
+    return db.merge(row_from_dto(Hall, dto), load=False) if dto is not None else None
+
+@subscribe(HallChanged)
+def _drop_cached_hall(event: HallChanged):
+    cache.invalidate("halls", event.hall_id)
 
 def get_owner_halls(db: Session, owner_id: int):
     return db.query(Hall).filter(Hall.owner_id == owner_id).all()
 
 def update_hall(db: Session, hall_id: int, hall_data: dict, owner_id: int = None):
-    db_hall = get_hall(db, hall_id)
+    db_hall = get_hall(db, hall_id, cached=False)
     if not db_hall:
         raise HTTPException(status_code=404, detail="Hall not found")
     
@@ -62,12 +90,13 @@ def update_hall(db: Session, hall_id: int, hall_data: dict, owner_id: int = None
     for key, value in hall_data.items():
         setattr(db_hall, key, value)
     
+    bump_hall_version(db, db_hall)
     db.commit()
     db.refresh(db_hall)
     return db_hall
 
 def delete_hall(db: Session, hall_id: int, owner_id: int = None):
-    db_hall = get_hall(db, hall_id)
+    db_hall = get_hall(db, hall_id, cached=False)
     if not db_hall:
         raise HTTPException(status_code=404, detail="Hall not found")
     
@@ -76,30 +105,53 @@ def delete_hall(db: Session, hall_id: int, owner_id: int = None):
         raise HTTPException(status_code=403, detail="Not authorized to delete this hall")
     
     db.delete(db_hall)
+    bump_catalog_version(db)
     db.commit()
     return {"message": "Hall deleted successfully"}
 
 # Booking CRUD
-def create_booking(db: Session, booking: BookingCreate, user_id: int):
-    # Check if hall exists
-    hall = get_hall(db, booking.hall_id)
-    if not hall:
-        raise HTTPException(status_code=404, detail="Hall not found")
-    
-    # Check for overlapping bookings
-    overlapping = db.query(Booking).filter(
+def _is_overlapping(db: Session, booking: BookingCreate) -> bool:
+    return db.query(Booking.id).filter(
         Booking.hall_id == booking.hall_id,
         Booking.status.in_([BookingStatusEnum.PENDING, BookingStatusEnum.APPROVED]),
         Booking.start_time < booking.end_time,
         Booking.end_time > booking.start_time
-    ).first()
+    ).first() is not None
+
+def _hall_for_pricing(db: Session, hall_id: int):
+    # The charged price must be the current one: a cached copy from before another
+    # worker's price change is replaced by the row (one primary key lookup on a hit)
+    version = get_hall_version(db, hall_id)
+    hall = get_hall(db, hall_id, version=version) if version is not None else None
+    if not hall:
+        raise HTTPException(status_code=404, detail="Hall not found")
+    return hall
+
+def get_booking_quote(db: Session, booking: BookingCreate):
+    # Dry run of create_booking: the same price, nothing is written
+    hall = _hall_for_pricing(db, booking.hall_id)
+    if booking.end_time <= booking.start_time:
+        raise HTTPException(status_code=400, detail="End time must be after start time")
+    
+    return BookingQuote(
+        hall_id=hall.id,
+        start_time=booking.start_time,
+        end_time=booking.end_time,
+        hours=(booking.end_time - booking.start_time).total_seconds() / 3600,
+        total_amount=quote_booking(db, hall, booking.start_time, booking.end_time),
+        available=not _is_overlapping(db, booking)
+    )
+
+def create_booking(db: Session, booking: BookingCreate, user_id: int):
+    # Check if hall exists
+    hall = _hall_for_pricing(db, booking.hall_id)
     
-    if overlapping:
+    # Check for overlapping bookings
+    if _is_overlapping(db, booking):
         raise HTTPException(status_code=400, detail="Hall is already booked for this time slot")
     
-    # Calculate total amount
-    duration_hours = (booking.end_time - booking.start_time).total_seconds() / 3600
-    total_amount = duration_hours * (hall.price_per_hour or 0)
+    # Calculate total amount from the hall's hourly price curve
+    total_amount = quote_booking(db, hall, booking.start_time, booking.end_time)
     
     db_booking = Booking(
         **booking.dict(),
@@ -111,14 +163,18 @@ def create_booking(db: Session, booking: BookingCreate, user_id: int):
     db.refresh(db_booking)
     return db_booking
 
+# BookingResponse nests hall (with its owner) and user; load them up front
+# instead of one lazy load per booking
+_BOOKING_DETAILS = (joinedload(Booking.hall).joinedload(Hall.owner), joinedload(Booking.user))
+
 def get_user_bookings(db: Session, user_id: int):
-    return db.query(Booking).filter(Booking.user_id == user_id).all()
+    return db.query(Booking).options(*_BOOKING_DETAILS).filter(Booking.user_id == user_id).all()
 
 def get_owner_bookings(db: Session, owner_id: int):
-    return db.query(Booking).join(Hall).filter(Hall.owner_id == owner_id).all()
+    return db.query(Booking).join(Hall).options(*_BOOKING_DETAILS).filter(Hall.owner_id == owner_id).all()
 
 def get_all_bookings(db: Session):
-    return db.query(Booking).all()
+    return db.query(Booking).options(*_BOOKING_DETAILS).all()
 
 def update_booking_status(db: Session, booking_id: int, status: BookingStatusEnum, owner_id: int = None):
     booking = db.query(Booking).filter(Booking.id == booking_id).first()
@@ -1,7 +1,9 @@
 # ==================== database.py ====================
+from typing import Dict, List, Optional, Sequence, Union
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from dotenv import load_dotenv
 import os
 
@@ -18,4 +20,37 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def upsert(executor: Union[Session, Connection], model, values: Union[Dict, List[Dict]], keys: Sequence[str],
+           increments: Optional[Dict[str, float]] = None):
+    """INSERT values; where a row with the same unique `keys` exists, add `increments`
+    to its columns instead (or leave it alone when there are none).
+
+    One statement, so two transactions writing the first row of a key at the
+    same time cannot both insert it (an update-then-insert would fail one of
+    them on the unique constraint).
+    """
+    table = model.__table__
+    dialect = (executor.get_bind() if isinstance(executor, Session) else executor).dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table).values(values)
+        changes = {column: table.c[column] + amount for column, amount in (increments or {}).items()}
+        # A no-op assignment makes MySQL skip the duplicate without IGNORE's wider error swallowing
+        statement = statement.on_duplicate_key_update(changes or {keys[0]: table.c[keys[0]]})
+    elif dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(values)
+        if increments:
+            statement = statement.on_conflict_do_update(index_elements=list(keys), set_={
+                column: table.c[column] + amount for column, amount in increments.items()})
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=list(keys))
+    else:
+        raise ValueError(f"upsert() does not support the {dialect} dialect")
+    executor.execute(statement)
@@ -0,0 +1,214 @@
+# ==================== demand_forecast.py ====================
+"""
+Hour-of-week demand curves and the price multipliers derived from them.
+
+hall_demand holds, per hall and local hour of the week (168 slots, Monday
+00:00 first), the hours booked by live bookings, meaning every status except
+rejected and cancelled. The catalog-wide curve is their sum per slot, taken
+at read time, so concurrent bookings of different halls never write the
+same rows.
+
+- rebuild_demand() recomputes the table from the last DEMAND_WINDOW_DAYS of
+  bookings. It works in hall chunks, and each chunk's bookings are spread
+  over slots in one vectorized pass. Run it nightly (`python
+  demand_forecast.py`), so that old demand ages out.
+- record_demand_change() adds or removes one booking's hours as its status
+  changes, the same way the utilization rollup is kept.
+
+Pricing: a slot's relative demand is its booked hours divided by the hall's
+average slot. Halls with little history are shrunk toward the catalog
+curve, weighted by DEMAND_PRIOR_HOURS. The multiplier moves
+DEMAND_ELASTICITY of the way from 1 toward that relative demand. The 168
+multipliers of a hall are cached in the shared cache and invalidated when
+the hall's demand changes, so a suggestion is a lookup. The catalog curve
+moves slowly and is cached for DEMAND_CACHE_TTL.
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Sequence, Tuple
+import os
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from cache import cache, invalidate_on_commit
+from database import upsert
+from events import BookingCreated, BookingStatusChanged, status_move, subscribe
+from lazy_imports import lazy_module
+from models import Booking, BookingStatusEnum, HallDemand
+from timeseries import get_timezone, local_time
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+HOURS_PER_WEEK = 168
+DEMAND_WINDOW_DAYS = int(os.getenv("DEMAND_WINDOW_DAYS", 365))
+# Booked hours of history that count as much as the catalog curve
+DEMAND_PRIOR_HOURS = float(os.getenv("DEMAND_PRIOR_HOURS", 200))
+DEMAND_ELASTICITY = float(os.getenv("DEMAND_ELASTICITY", 0.25))
+MIN_MULTIPLIER, MAX_MULTIPLIER = 0.7, 1.5
+DEMAND_CACHE_TTL = 3600
+
+IGNORED_STATUSES = (BookingStatusEnum.REJECTED, BookingStatusEnum.CANCELLED)
+# A Monday: local hours since this instant, modulo 168, give the hour of week
+WEEK_EPOCH = datetime(1970, 1, 5)
+
+
+def _counts(status) -> bool:
+    return status is not None and BookingStatusEnum(status) not in IGNORED_STATUSES
+
+
+def hour_of_week(moment: datetime) -> int:
+    """Local slot of a moment; naive moments are UTC, as bookings are stored"""
+    local = local_time(moment)
+    return local.weekday() * 24 + local.hour
+
+
+def slot_hours(starts: Sequence[datetime], ends: Sequence[datetime]):
+    """(booking index, slot, hours) for every local hour the bookings overlap.
+
+    Timestamps are naive UTC, as stored. Each booking is cut at hour
+    boundaries, so partial hours count partially.
+    """
+    if not len(starts):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+    local = [pd.DatetimeIndex(times).tz_localize("UTC").tz_convert(get_timezone()).tz_localize(None)
+             for times in (starts, ends)]
+    begin, end = [np.asarray((times - pd.Timestamp(WEEK_EPOCH)) / pd.Timedelta(hours=1)) for times in local]
+    first = np.floor(begin).astype(np.int64)
+    count = np.maximum(np.ceil(end).astype(np.int64) - first, 0)
+    booking = np.repeat(np.arange(len(begin)), count)
+    hour = first[booking] + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    hours = np.minimum(end[booking], hour + 1) - np.maximum(begin[booking], hour)
+    return booking, hour % HOURS_PER_WEEK, hours
+
+
+# ---------- Keeping the curves ----------
+
+def _bump(db: Session, hall_id: int, slot: int, hours: float):
+    upsert(db, HallDemand, {"hall_id": hall_id, "hour_of_week": slot, "booked_hours": hours},
+           keys=("hall_id", "hour_of_week"), increments={"booked_hours": hours})
+
+
+def record_demand_change(db: Session, booking: Booking, old_status=None, new_status=None):
+    """Add or remove a booking's hours when it starts or stops counting; call before db.commit()"""
+    was_counted, is_counted = _counts(old_status), _counts(new_status or booking.status)
+    if was_counted == is_counted:
+        return
+
+    sign = 1 if is_counted else -1
+    _, slots, hours = slot_hours([booking.start_time], [booking.end_time])
+    per_slot = np.bincount(slots, weights=hours, minlength=HOURS_PER_WEEK)
+    for slot in np.flatnonzero(per_slot).tolist():
+        _bump(db, booking.hall_id, slot, sign * float(per_slot[slot]))
+    invalidate_on_commit(db, "demand", booking.hall_id)
+    invalidate_on_commit(db, "prices", booking.hall_id)
+
+
+@subscribe((BookingCreated, BookingStatusChanged), phase="transaction")
+def _on_booking_event(db: Session, event):
+    record_demand_change(db, db.get(Booking, event.booking_id), *status_move(event))
+
+
+def rebuild_demand(db: Session, window_days: int = DEMAND_WINDOW_DAYS, halls_per_chunk: int = 2000,
+                   now: Optional[datetime] = None) -> int:
+    """Recompute hall_demand from the bookings of the last window_days; returns rows written"""
+    since = (now or datetime.utcnow()) - timedelta(days=window_days)
+    db.query(HallDemand).delete(synchronize_session=False)
+    max_hall_id = db.query(func.max(Booking.hall_id)).scalar() or 0
+    written = 0
+
+    for first_hall_id in range(1, max_hall_id + 1, halls_per_chunk):
+        rows = db.query(Booking.hall_id, Booking.start_time, Booking.end_time).filter(
+            Booking.hall_id >= first_hall_id,
+            Booking.hall_id < first_hall_id + halls_per_chunk,
+            Booking.start_time >= since,
+            Booking.status.notin_(IGNORED_STATUSES)
+        ).all()
+        if not rows:
+            continue
+        hall_ids, starts, ends = zip(*rows)
+        booking, slots, hours = slot_hours(starts, ends)
+        # One cell per (hall in chunk, slot)
+        cells = (np.asarray(hall_ids)[booking] - first_hall_id) * HOURS_PER_WEEK + slots
+        curves = np.bincount(cells, weights=hours, minlength=halls_per_chunk * HOURS_PER_WEEK)
+        filled = np.flatnonzero(curves)
+        db.bulk_insert_mappings(HallDemand, [
+            {"hall_id": first_hall_id + cell // HOURS_PER_WEEK, "hour_of_week": cell % HOURS_PER_WEEK,
+             "booked_hours": hours}
+            for cell, hours in zip(filled.tolist(), curves[filled].tolist())
+        ])
+        written += len(filled)
+
+    db.commit()
+    cache.invalidate_namespace("demand")
+    cache.invalidate_namespace("prices")
+    return written
+
+
+# ---------- Multipliers ----------
+
+def demand_curve(db: Session, hall_id: int):
+    curve = np.zeros(HOURS_PER_WEEK)
+    rows = db.query(HallDemand.hour_of_week, HallDemand.booked_hours).filter(HallDemand.hall_id == hall_id).all()
+    for slot, hours in rows:
+        curve[slot] = hours
+    return curve
+
+
+def _relative(curve):
+    """Demand per slot relative to the curve's average slot (all ones without data)"""
+    mean = curve.mean()
+    return curve / mean if mean > 0 else np.ones(HOURS_PER_WEEK)
+
+
+def compute_multipliers(hall_curve, catalog_curve) -> Tuple[float, ...]:
+    weight = hall_curve.sum() / (hall_curve.sum() + DEMAND_PRIOR_HOURS)
+    relative = weight * _relative(hall_curve) + (1 - weight) * _relative(catalog_curve)
+    multipliers = np.clip(1 + DEMAND_ELASTICITY * (relative - 1), MIN_MULTIPLIER, MAX_MULTIPLIER)
+    return tuple(round(value, 4) for value in multipliers.tolist())
+
+
+def catalog_demand_curve(db: Session):
+    """Booked hours per slot summed over every hall"""
+    curve = np.zeros(HOURS_PER_WEEK)
+    rows = db.query(HallDemand.hour_of_week, func.sum(HallDemand.booked_hours)).filter(
+        HallDemand.hall_id > 0  # tables built before the sum was taken on read kept it at hall_id 0
+    ).group_by(HallDemand.hour_of_week).all()
+    for slot, hours in rows:
+        curve[slot] = hours
+    return curve
+
+
+def _catalog_curve(db: Session):
+    """The catalog curve, or None while it is empty (not cached, so the first bookings show up at once)"""
+    def load():
+        curve = catalog_demand_curve(db)
+        return tuple(curve) if curve.any() else None
+
+    # The catalog curve moves slowly; it is refreshed by TTL rather than on every booking
+    curve = cache.get_or_load("demand", "catalog", load, ttl=DEMAND_CACHE_TTL)
+    return None if curve is None else np.asarray(curve)
+
+
+def hall_multipliers(db: Session, hall_id: int) -> Optional[Tuple[float, ...]]:
+    """168 price multipliers for the hall, or None while there is no booking history at all"""
+    def load():
+        catalog_curve = _catalog_curve(db)
+        if catalog_curve is None:
+            return None
+        return compute_multipliers(demand_curve(db, hall_id), catalog_curve)
+
+    multipliers = cache.get_or_load("demand", hall_id, load, ttl=DEMAND_CACHE_TTL)
+    return None if multipliers is None else tuple(multipliers)
+
+
+if __name__ == "__main__":
+    from database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine, tables=[HallDemand.__table__])
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild_demand(session)} demand rows")
+    finally:
+        session.close()
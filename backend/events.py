@@ -0,0 +1,278 @@
+# ==================== events.py ====================
+"""
+In-process domain events for hall, booking and user writes.
+
+Writers do not notify derived data (rollups, caches, indexes) themselves.
+A Session listener inspects every flush for Hall, Booking and User rows
+and records typed events:
+
+- HallChanged: a hall was inserted, updated or deleted
+- BookingCreated: a booking was inserted
+- BookingStatusChanged: a booking's status moved
+- UserChanged: a user was inserted, updated or deleted
+
+Subscribers choose how they are delivered:
+
+- phase="transaction": called with (db, event) as the session commits,
+  inside the same transaction. For rollups that must never drift from the
+  rows they summarize. They may write; rollup rows are not watched.
+- phase="commit" (default): called with the event after the commit, on the
+  committing thread. For cache invalidation, which must not run before the
+  commit or a concurrent reader could re-cache the old row.
+- subscribe_batched(): events go on a bounded queue after the commit, and
+  a worker thread hands them over in batches. For slower derived
+  structures. A full queue makes the committing thread wait, so nothing is
+  dropped.
+
+A rolled back transaction emits nothing. Bulk and Core statements bypass
+the ORM, so they emit nothing either; their callers rebuild or invalidate
+what they touch, as seed_data and bump_owner_halls do.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+import logging
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import Booking, BookingStatusEnum, Hall, User
+
+logger = logging.getLogger("events")
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 10000))
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", 500))
+EVENT_BATCH_DELAY_S = float(os.getenv("EVENT_BATCH_DELAY_S", 0.05))
+
+
+# ---------- Events ----------
+
+@dataclass(frozen=True)
+class HallChanged:
+    hall_id: int
+    owner_id: Optional[int]
+    changed: FrozenSet[str]  # attributes written; every column for inserts and deletes
+    created: bool = False
+    deleted: bool = False
+
+
+@dataclass(frozen=True)
+class BookingCreated:
+    booking_id: int
+    hall_id: int
+    user_id: int
+    status: BookingStatusEnum
+
+
+@dataclass(frozen=True)
+class BookingStatusChanged:
+    booking_id: int
+    hall_id: int
+    user_id: int
+    old_status: Optional[BookingStatusEnum]
+    new_status: BookingStatusEnum
+
+
+@dataclass(frozen=True)
+class UserChanged:
+    user_id: int
+    emails: FrozenSet[str]  # current and previous, so caches keyed by email can drop both
+    changed: FrozenSet[str]
+    created: bool = False
+    deleted: bool = False
+
+
+EventTypes = Union[type, Tuple[type, ...]]
+
+
+def status_move(booking_event) -> Tuple[Optional[BookingStatusEnum], BookingStatusEnum]:
+    """(old, new) status of a BookingCreated or BookingStatusChanged.
+
+    Subscribers must use these rather than the row's current status: a row
+    inserted and then moved in one transaction emits both events, and each
+    must only account for its own step.
+    """
+    if isinstance(booking_event, BookingCreated):
+        return None, booking_event.status
+    return booking_event.old_status, booking_event.new_status
+
+
+# ---------- Subscriptions ----------
+
+_subscribers: Dict[str, Dict[type, List[Callable]]] = {
+    "transaction": defaultdict(list),
+    "commit": defaultdict(list),
+}
+
+
+def subscribe(event_types: EventTypes, handler: Optional[Callable] = None, phase: str = "commit"):
+    """Register handler for the event types; usable as a decorator"""
+    if handler is None:
+        return lambda function: subscribe(event_types, function, phase)
+    for event_type in event_types if isinstance(event_types, tuple) else (event_types,):
+        _subscribers[phase][event_type].append(handler)
+    return handler
+
+
+def unsubscribe(handler: Callable):
+    for handlers in _subscribers.values():
+        for registered in handlers.values():
+            while handler in registered:
+                registered.remove(handler)
+
+
+class BatchQueue:
+    """Bounded queue drained by a worker thread that delivers events in batches"""
+
+    def __init__(self, handler: Callable[[List], None], maxsize: int = EVENT_QUEUE_SIZE,
+                 batch_size: int = EVENT_BATCH_SIZE, max_delay: float = EVENT_BATCH_DELAY_S):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self._worker = threading.Thread(target=self._run, name="event-batches", daemon=True)
+        self._worker.start()
+
+    def put(self, event):
+        self._queue.put(event)
+
+    def join(self):
+        """Wait until every queued event has been delivered"""
+        self._queue.join()
+
+    def close(self):
+        """Unsubscribe, deliver what is queued and stop the worker"""
+        unsubscribe(self.put)
+        self._queue.put(None)
+        self._worker.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            events = batch[:-1] if stop else batch
+            try:
+                if events:
+                    self.handler(events)
+            except Exception:
+                logger.exception("Event batch handler %r failed", self.handler)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+
+def subscribe_batched(event_types: EventTypes, handler: Callable[[List], None], **options) -> BatchQueue:
+    """Deliver the event types to handler in batches from a worker thread; close() the queue to stop"""
+    batches = BatchQueue(handler, **options)
+    subscribe(event_types, batches.put)
+    return batches
+
+
+# ---------- Detecting changes ----------
+
+def _status(value) -> Optional[BookingStatusEnum]:
+    # Handlers assign plain strings as well as enum members
+    return None if value is None else BookingStatusEnum(value)
+
+
+def _changed(obj) -> FrozenSet[str]:
+    state = inspect(obj)
+    return frozenset(column.key for column in state.mapper.column_attrs
+                     if state.attrs[column.key].history.has_changes())
+
+
+def _columns(obj) -> FrozenSet[str]:
+    return frozenset(column.key for column in inspect(obj).mapper.column_attrs)
+
+
+def _hall_events(hall: Hall, created: bool, deleted: bool):
+    changed = _columns(hall) if created or deleted else _changed(hall)
+    if changed:
+        yield HallChanged(hall.id, hall.owner_id, changed, created, deleted)
+
+
+def _booking_events(booking: Booking, created: bool, deleted: bool):
+    if created:
+        yield BookingCreated(booking.id, booking.hall_id, booking.user_id, _status(booking.status))
+        return
+    history = inspect(booking).attrs.status.history
+    if deleted or not history.has_changes():
+        return
+    old_status = _status(history.deleted[0]) if history.deleted else None
+    new_status = _status(booking.status)
+    if old_status != new_status:
+        yield BookingStatusChanged(booking.id, booking.hall_id, booking.user_id, old_status, new_status)
+
+
+def _user_events(user: User, created: bool, deleted: bool):
+    changed = _columns(user) if created or deleted else _changed(user)
+    if changed:
+        previous = inspect(user).attrs.email.history.deleted
+        emails = frozenset(email for email in (user.email, *previous) if email)
+        yield UserChanged(user.id, emails, changed, created, deleted)
+
+
+_DETECTORS = {Hall: _hall_events, Booking: _booking_events, User: _user_events}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    # new/dirty/deleted and attribute history still describe what this flush wrote
+    pending = session.info.setdefault("events_pending", [])
+    for objects, created, deleted in ((session.new, True, False), (session.dirty, False, False),
+                                      (session.deleted, False, True)):
+        for obj in objects:
+            detect = _DETECTORS.get(type(obj))
+            if detect is not None:
+                pending.extend(detect(obj, created, deleted))
+
+
+# ---------- Dispatch ----------
+
+def publish(events: Sequence, phase: str = "commit", db: Optional[Session] = None):
+    handlers = _subscribers[phase]
+    for domain_event in events:
+        for handler in list(handlers.get(type(domain_event), ())):
+            if phase == "transaction":
+                handler(db, domain_event)
+                continue
+            # The transaction is already committed; one failing subscriber must not starve the rest
+            try:
+                handler(domain_event)
+            except Exception:
+                logger.exception("Event handler %r failed on %r", handler, domain_event)
+
+
+@event.listens_for(Session, "before_commit")
+def _run_transaction_subscribers(session):
+    session.flush()
+    committed = session.info.setdefault("events_committed", [])
+    # Subscribers may write more watched rows; keep going until nothing new was flushed
+    while session.info.get("events_pending"):
+        events = session.info.pop("events_pending")
+        committed.extend(events)
+        publish(events, "transaction", session)
+        session.flush()
+
+
+@event.listens_for(Session, "after_commit")
+def _run_commit_subscribers(session):
+    session.info.pop("events_pending", None)
+    publish(session.info.pop("events_committed", ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_events(session):
+    session.info.pop("events_pending", None)
+    session.info.pop("events_committed", None)
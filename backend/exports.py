@@ -0,0 +1,118 @@
+# ==================== exports.py ====================
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Booking, BookingStatusEnum, Hall, User
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    ("id", Booking.id),
+    ("hall_id", Booking.hall_id),
+    ("hall_name", Hall.name),
+    ("owner_id", Hall.owner_id),
+    ("user_id", Booking.user_id),
+    ("user_email", User.email),
+    ("start_time", Booking.start_time),
+    ("end_time", Booking.end_time),
+    ("event_name", Booking.event_name),
+    ("event_type", Booking.event_type),
+    ("attendees", Booking.attendees),
+    ("total_amount", Booking.total_amount),
+    ("status", Booking.status),
+    ("created_at", Booking.created_at),
+    ("remarks", Booking.remarks),
+]
+FIELD_NAMES = [name for name, _ in EXPORT_COLUMNS]
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def build_export_query(
+    owner_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    hall_id: Optional[int] = None,
+    status: Optional[BookingStatusEnum] = None
+):
+    """Plain column select (no ORM entities or relationships) over bookings, filtered"""
+    query = select(*[column.label(name) for name, column in EXPORT_COLUMNS]).select_from(Booking).join(
+        Hall, Hall.id == Booking.hall_id
+    ).join(User, User.id == Booking.user_id)
+
+    if owner_id is not None:
+        query = query.where(Hall.owner_id == owner_id)
+    if start is not None:
+        query = query.where(Booking.start_time >= start)
+    if end is not None:
+        query = query.where(Booking.start_time < end)
+    if hall_id is not None:
+        query = query.where(Booking.hall_id == hall_id)
+    if status is not None:
+        query = query.where(Booking.status == status)
+
+    # yield_per turns on a server-side cursor, so memory does not grow with the export
+    return query.order_by(Booking.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, BookingStatusEnum):
+        return value.value
+    return value
+
+
+def stream_csv(db: Session, query) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELD_NAMES)
+
+    for partition in db.execute(query).partitions():
+        for row in partition:
+            writer.writerow([_plain(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(db: Session, query) -> Iterator[bytes]:
+    for partition in db.execute(query).partitions():
+        lines = []
+        for row in partition:
+            record = {name: _plain(value) for name, value in zip(FIELD_NAMES, row)}
+            lines.append(orjson.dumps(record) if orjson is not None else json.dumps(record).encode())
+        yield b"\n".join(lines) + b"\n"
+
+
+def export_response(db: Session, query, fmt: str, filename: str) -> StreamingResponse:
+    fmt = (fmt or "csv").lower()
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format, expected csv or ndjson")
+
+    stream = stream_csv(db, query) if fmt == "csv" else stream_ndjson(db, query)
+    return StreamingResponse(
+        stream,
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
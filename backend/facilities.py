@@ -0,0 +1,153 @@
+# ==================== facilities.py ====================
+"""
+Normalized hall facilities.
+
+Hall.facilities stays the comma-separated display text of the API. Each
+distinct facility also gets a row in `facilities`, and every hall a row per
+facility in `hall_facilities`. Mapper events rewrite a hall's join rows
+whenever the text changes. Filtering ("has AC and Parking") and facet counts
+are then indexed joins instead of ILIKE scans over the text.
+
+Facility names are matched by slug: lower-cased with whitespace collapsed,
+so "Sound  System" and "sound system" are the same facility.
+
+Run `python facilities.py` once to backfill the join table for existing halls.
+"""
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from sqlalchemy import delete, event, func, insert, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Query, Session
+
+from database import upsert
+from models import Facility, Hall, HallFacility
+
+
+def slugify(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def parse(text: Optional[str]) -> Dict[str, str]:
+    """slug -> display name for a comma-separated facilities string"""
+    names = {}
+    for part in (text or "").split(","):
+        slug = slugify(part)
+        if slug and slug not in names:
+            names[slug] = " ".join(part.split())
+    return names
+
+
+@lru_cache(maxsize=4096)
+def facility_set(text: Optional[str]) -> FrozenSet[str]:
+    """Slugs in a facilities string, parsed once per distinct string"""
+    return frozenset(parse(text))
+
+
+# ---------- Keeping the join table in sync ----------
+
+def ensure_facilities(connection: Connection, names: Dict[str, str]) -> Dict[str, int]:
+    """slug -> facility id, inserting facilities seen for the first time"""
+    table = Facility.__table__
+    ids = dict(connection.execute(select(table.c.slug, table.c.id).where(table.c.slug.in_(list(names)))).all())
+    missing = [{"slug": slug, "name": name} for slug, name in names.items() if slug not in ids]
+    if missing:
+        # Another transaction may add the same new facility concurrently; keep whichever row lands
+        upsert(connection, Facility, missing, keys=("slug",))
+        ids.update(connection.execute(
+            select(table.c.slug, table.c.id).where(table.c.slug.in_([row["slug"] for row in missing]))
+        ).all())
+    return ids
+
+
+def sync_hall(connection: Connection, hall_id: int, text: Optional[str]):
+    table = HallFacility.__table__
+    connection.execute(delete(table).where(table.c.hall_id == hall_id))
+    names = parse(text)
+    if names:
+        ids = ensure_facilities(connection, names)
+        connection.execute(insert(table), [{"hall_id": hall_id, "facility_id": ids[slug]} for slug in names])
+
+
+@event.listens_for(Hall, "after_insert")
+def _after_insert(mapper, connection, hall: Hall):
+    sync_hall(connection, hall.id, hall.facilities)
+
+
+@event.listens_for(Hall, "after_update")
+def _after_update(mapper, connection, hall: Hall):
+    if inspect(hall).attrs.facilities.history.has_changes():
+        sync_hall(connection, hall.id, hall.facilities)
+
+
+@event.listens_for(Hall, "after_delete")
+def _after_delete(mapper, connection, hall: Hall):
+    connection.execute(delete(HallFacility.__table__).where(HallFacility.__table__.c.hall_id == hall.id))
+
+
+def backfill(connection: Connection, batch_size: int = 5000) -> int:
+    """Rebuild hall_facilities from Hall.facilities for every hall; returns halls processed"""
+    connection.execute(delete(HallFacility.__table__))
+    halls = Hall.__table__
+    last_id, processed = 0, 0
+    while True:
+        rows = connection.execute(
+            select(halls.c.id, halls.c.facilities).where(halls.c.id > last_id).order_by(halls.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return processed
+        parsed = [(hall_id, parse(text)) for hall_id, text in rows]
+        names = {}
+        for _, hall_names in parsed:
+            for slug, name in hall_names.items():
+                names.setdefault(slug, name)
+        ids = ensure_facilities(connection, names) if names else {}
+        links = [{"hall_id": hall_id, "facility_id": ids[slug]} for hall_id, hall_names in parsed for slug in hall_names]
+        if links:
+            connection.execute(insert(HallFacility.__table__), links)
+        last_id, processed = rows[-1][0], processed + len(rows)
+
+
+# ---------- Queries ----------
+
+def facility_ids(db: Session, slugs: Iterable[str]) -> Optional[List[int]]:
+    """Ids for the slugs, or None if any of them is unknown (no hall can match)"""
+    slugs = {slugify(slug) for slug in slugs if slugify(slug)}
+    ids = [row[0] for row in db.query(Facility.id).filter(Facility.slug.in_(slugs)).all()] if slugs else []
+    return ids if len(ids) == len(slugs) else None
+
+
+def filter_all(query: Query, ids: List[int]) -> Query:
+    """Halls having every one of the facilities"""
+    if not ids:
+        return query
+    having_all = (
+        select(HallFacility.hall_id)
+        .where(HallFacility.facility_id.in_(ids))
+        .group_by(HallFacility.hall_id)
+        .having(func.count() == len(ids))
+    )
+    return query.filter(Hall.id.in_(having_all))
+
+
+def facet_counts(db: Session, query: Query) -> List[dict]:
+    """Halls per facility within the query's result set, most common first"""
+    hall_ids = query.with_entities(Hall.id).order_by(None).subquery()
+    count = func.count(HallFacility.hall_id)
+    rows = (
+        db.query(Facility.slug, Facility.name, count)
+        .join(HallFacility, HallFacility.facility_id == Facility.id)
+        .filter(HallFacility.hall_id.in_(select(hall_ids.c.id)))
+        .group_by(Facility.id, Facility.slug, Facility.name)
+        .order_by(count.desc(), Facility.slug)
+        .all()
+    )
+    return [{"slug": slug, "name": name, "count": total} for slug, name, total in rows]
+
+
+if __name__ == "__main__":
+    from database import Base, engine
+
+    Base.metadata.create_all(bind=engine, tables=[Facility.__table__, HallFacility.__table__])
+    with engine.begin() as conn:
+        print(f"✅ Facilities backfilled for {backfill(conn)} halls")
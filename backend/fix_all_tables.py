@@ -175,7 +175,61 @@ def fix_all_tables():
                 FOREIGN KEY (hall_id) REFERENCES halls(id)
             """))
             print("   ✅ Bookings hall foreign key constraint added!")
-        
+
+        # 5. Check halls.version (used for ETags on the hall catalog)
+        print("\n5. Checking halls version column...")
+        result = conn.execute(text("""
+            SELECT COUNT(*)
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = 'halls'
+            AND COLUMN_NAME = 'version'
+        """))
+        version_exists = result.scalar()
+
+        if not version_exists:
+            print("   Adding version to halls table...")
+            conn.execute(text("""
+                ALTER TABLE halls
+                ADD COLUMN version INT NOT NULL DEFAULT 1 AFTER owner_id
+            """))
+            print("   ✅ version column added to halls table!")
+
+        # 6. Check halls location columns (geo search)
+        print("\n6. Checking halls location columns...")
+        for column, definition in (("latitude", "DOUBLE NULL"), ("longitude", "DOUBLE NULL"),
+                                   ("geohash", "VARCHAR(12) NULL")):
+            result = conn.execute(text(f"""
+                SELECT COUNT(*)
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME = 'halls'
+                AND COLUMN_NAME = '{column}'
+            """))
+            if not result.scalar():
+                print(f"   Adding {column} to halls table...")
+                conn.execute(text(f"ALTER TABLE halls ADD COLUMN {column} {definition}"))
+                if column == "geohash":
+                    conn.execute(text("CREATE INDEX ix_halls_geohash ON halls (geohash)"))
+                print(f"   ✅ {column} column added to halls table!")
+
+        # 7. Check the list_halls sort indexes
+        print("\n7. Checking halls sort indexes...")
+        for index_name, columns in (("ix_halls_sort_price", "price_per_hour, id, available"),
+                                    ("ix_halls_sort_capacity", "capacity, id, available"),
+                                    ("ix_halls_sort_name", "name, id, available")):
+            result = conn.execute(text(f"""
+                SELECT COUNT(*)
+                FROM INFORMATION_SCHEMA.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME = 'halls'
+                AND INDEX_NAME = '{index_name}'
+            """))
+            if not result.scalar():
+                print(f"   Creating {index_name}...")
+                conn.execute(text(f"CREATE INDEX {index_name} ON halls ({columns})"))
+                print(f"   ✅ {index_name} created!")
+
         print("\n✅ All table structures verified and fixed!")
 
 if __name__ == "__main__":
@@ -0,0 +1,280 @@
+# ==================== geo.py ====================
+"""
+Geospatial helpers for "halls near me".
+
+Halls store latitude/longitude plus a geohash of the point in an indexed
+column. A geohash prefix is a rectangular cell, and every point inside a cell
+shares that prefix, so a cell is one range scan on the B-tree index
+(geohash >= prefix AND geohash < prefix + '~') on every database.
+
+- Radius search: cover the circle's bounding box with the finest cells that
+  keep the number of ranges under MAX_COVER_CELLS. Scan those ranges
+  (coordinates only), then drop candidates outside the exact haversine
+  distance.
+- Nearest-N: scan the 3x3 block around the point, starting fine and getting
+  coarser until it holds N candidates. Points nearer than the block's
+  guaranteed radius can only be inside the block, so if the Nth candidate is
+  within it we are done. Otherwise the N nearest lie within the Nth
+  candidate's distance, and one radius search finds them.
+
+Full rows are loaded only for the halls that are returned. Callers that
+page or re-sort work on the (hall id, distance) candidates: order_candidates()
+sorts them by a hall column (read for those ids alone), and load() builds
+rows for just the page.
+"""
+import math
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Query
+
+from models import Hall
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# ~1 m cells; shorter prefixes of the stored hash are the coarser cells
+GEOHASH_PRECISION = 9
+# Upper bound on index ranges scanned by one radius search
+MAX_COVER_CELLS = 32
+# Distance at which the recommendation proximity bonus halves
+PROXIMITY_HALF_KM = 5.0
+# Ids per IN list when reading sort keys for candidates
+ID_BATCH = 500
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {char: index for index, char in enumerate(_BASE32)}
+
+
+# ---------- Geohash ----------
+
+def encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) of a geohash cell"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            interval = lng_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) of a cell in degrees"""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def neighbourhood(lat: float, lng: float, precision: int) -> List[str]:
+    """The cell containing the point and its (up to) 8 neighbours"""
+    height, width = cell_size(precision)
+    min_lat, min_lng, _, _ = bounds(encode(lat, lng, precision))
+    center_lat, center_lng = min_lat + height / 2, min_lng + width / 2
+    cells = []
+    for d_lat in (-1, 0, 1):
+        cell_lat = center_lat + d_lat * height
+        if not -90 < cell_lat < 90:
+            continue
+        for d_lng in (-1, 0, 1):
+            cell_lng = (center_lng + d_lng * width + 180) % 360 - 180
+            cell = encode(cell_lat, cell_lng, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def covered_radius_km(lat: float, precision: int) -> float:
+    """Every point within this distance of (lat, ...) lies inside its 3x3 cell block"""
+    height, width = cell_size(precision)
+    # Meridians converge: measure the width at the block edge nearest the pole
+    edge_lat = min(89.9, abs(lat) + 1.5 * height)
+    return min(height * KM_PER_DEGREE, width * KM_PER_DEGREE * math.cos(math.radians(edge_lat)))
+
+
+# ---------- Distance ----------
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def hall_distance_km(hall1, hall2) -> Optional[float]:
+    if None in (hall1.latitude, hall1.longitude, hall2.latitude, hall2.longitude):
+        return None
+    return haversine_km(hall1.latitude, hall1.longitude, hall2.latitude, hall2.longitude)
+
+
+def proximity_score(distance_km: Optional[float], weight: float = 3.0) -> float:
+    """weight at 0 km, halving every PROXIMITY_HALF_KM; 0 when a location is unknown"""
+    if distance_km is None:
+        return 0.0
+    return weight * 0.5 ** (distance_km / PROXIMITY_HALF_KM)
+
+
+# ---------- Queries ----------
+
+def covering_cells(lat: float, lng: float, radius_km: float) -> List[str]:
+    """Geohash prefixes covering the circle's bounding box, as few ranges as MAX_COVER_CELLS allows"""
+    d_lat = radius_km / KM_PER_DEGREE
+    if abs(lat) + d_lat >= 90:
+        return []  # reaches a pole: no useful prefix filter
+    d_lng = radius_km / (KM_PER_DEGREE * math.cos(math.radians(abs(lat) + d_lat)))
+    if d_lng >= 180:
+        return []
+    south, north, west, east = lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng
+
+    best: List[str] = []
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = cell_size(precision)
+        rows = int((north - south) / height) + 2
+        columns = int((east - west) / width) + 2
+        if rows * columns > MAX_COVER_CELLS:
+            break
+        cells = []
+        min_lat = bounds(encode(south, (lng + 180) % 360 - 180, precision))[0]
+        cell_lat = min_lat + height / 2
+        while cell_lat - height / 2 <= north:
+            cell_lng = west
+            while True:
+                cell = encode(cell_lat, (cell_lng + 180) % 360 - 180, precision)
+                if cell not in cells:
+                    cells.append(cell)
+                if cell_lng >= east:
+                    break
+                cell_lng = min(east, cell_lng + width)
+            cell_lat += height
+        best = cells
+    return best
+
+
+def _cells_filter(cells: Iterable[str]):
+    return or_(*[and_(Hall.geohash >= cell, Hall.geohash < cell + "~") for cell in cells])
+
+
+def _candidates(query: Query, lat: float, lng: float, cells: Optional[List[str]]) -> List[Tuple[int, float]]:
+    """(hall id, distance) for the query's halls inside the cells (all located halls for None)"""
+    query = query.filter(Hall.geohash.isnot(None))
+    if cells is not None:
+        query = query.filter(_cells_filter(cells))
+    # Only the coordinates: full rows are loaded for the winners alone
+    rows = query.with_entities(Hall.id, Hall.latitude, Hall.longitude).all()
+    pairs = [(hall_id, haversine_km(lat, lng, hall_lat, hall_lng)) for hall_id, hall_lat, hall_lng in rows]
+    pairs.sort(key=lambda pair: pair[1])
+    return pairs
+
+
+def load(query: Query, pairs: List[Tuple[int, float]]) -> List[Tuple[Hall, float]]:
+    """(hall, distance) for (hall id, distance) candidates, in the same order"""
+    if not pairs:
+        return []
+    halls = {hall.id: hall for hall in query.filter(Hall.id.in_([hall_id for hall_id, _ in pairs])).all()}
+    return [(halls[hall_id], distance) for hall_id, distance in pairs if hall_id in halls]
+
+
+def _within(query: Query, lat: float, lng: float, radius_km: float) -> List[Tuple[int, float]]:
+    cells = covering_cells(lat, lng, radius_km)
+    return [pair for pair in _candidates(query, lat, lng, cells or None) if pair[1] <= radius_km]
+
+
+def radius_candidates(query: Query, lat: float, lng: float, radius_km: float) -> List[Tuple[int, float]]:
+    """(hall id, distance) of the query's halls within radius_km, nearest first"""
+    return _within(query, lat, lng, radius_km)
+
+
+def within_radius(query: Query, lat: float, lng: float, radius_km: float,
+                  limit: Optional[int] = None) -> List[Tuple[Hall, float]]:
+    """(hall, distance) pairs of the query's halls within radius_km, nearest first"""
+    return load(query, _within(query, lat, lng, radius_km)[:limit])
+
+
+def nearest_candidates(query: Query, lat: float, lng: float, n: int,
+                       max_radius_km: Optional[float] = None) -> List[Tuple[int, float]]:
+    """(hall id, distance) of the n nearest of the query's halls"""
+    # Precision 1 blocks span continents; below precision 2 one full scan is cheaper
+    for precision in range(GEOHASH_PRECISION - 2, 1, -1):
+        guaranteed = covered_radius_km(lat, precision)
+        pairs = _candidates(query, lat, lng, neighbourhood(lat, lng, precision))
+        if max_radius_km is not None and guaranteed >= max_radius_km:
+            return [pair for pair in pairs if pair[1] <= max_radius_km][:n]
+        if len(pairs) >= n:
+            if pairs[n - 1][1] > guaranteed:
+                # n halls lie within that distance, so one exact radius pass finds the true n nearest
+                radius = pairs[n - 1][1] if max_radius_km is None else min(pairs[n - 1][1], max_radius_km)
+                pairs = _within(query, lat, lng, radius)
+            return pairs[:n]
+    pairs = _candidates(query, lat, lng, None)
+    if max_radius_km is not None:
+        pairs = [pair for pair in pairs if pair[1] <= max_radius_km]
+    return pairs[:n]
+
+
+def nearest(query: Query, lat: float, lng: float, n: int,
+            max_radius_km: Optional[float] = None) -> List[Tuple[Hall, float]]:
+    """The n nearest (hall, distance) pairs of the query's halls"""
+    return load(query, nearest_candidates(query, lat, lng, n, max_radius_km))
+
+
+def order_candidates(query: Query, pairs: List[Tuple[int, float]], column,
+                     descending: bool = False) -> List[Tuple[int, float]]:
+    """Candidates sorted by a hall column expression (nulls first, ties by id), as ORDER BY column, id would.
+
+    Text compares case-insensitively, like the default MySQL collation and the catalog snapshot.
+    """
+    keys = {}
+    ids = [hall_id for hall_id, _ in pairs]
+    for first in range(0, len(ids), ID_BATCH):
+        keys.update(query.filter(Hall.id.in_(ids[first:first + ID_BATCH])).with_entities(Hall.id, column).all())
+
+    def sort_key(pair):
+        value = keys[pair[0]]
+        return value is not None, value.lower() if isinstance(value, str) else value, pair[0]
+    return sorted(pairs, key=sort_key, reverse=descending)
+
+
+# ---------- Keep Hall.geohash in sync ----------
+
+def hall_geohash(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return encode(latitude, longitude)
+
+
+@event.listens_for(Hall, "before_insert")
+@event.listens_for(Hall, "before_update")
+def _set_geohash(mapper, connection, hall: Hall):
+    hall.geohash = hall_geohash(hall.latitude, hall.longitude)
+
+
+def centroid(points: Sequence[Tuple[float, float]]) -> Optional[Tuple[float, float]]:
+    """Mean position of nearby points (good enough for a user's booked halls)"""
+    if not points:
+        return None
+    return sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)
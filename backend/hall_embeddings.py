@@ -0,0 +1,293 @@
+# ==================== hall_embeddings.py ====================
+"""
+Dense hall embeddings and an approximate nearest-neighbour index over them.
+
+Embedding: TF-IDF over each hall's name, description, facilities and
+location, reduced with TruncatedSVD to EMBEDDING_DIM dimensions and
+L2-normalised. Cosine similarity is then a dot product. New halls are
+projected through the fitted vocabulary and SVD, so they can be inserted
+without refitting.
+
+Index: random-projection LSH for cosine similarity. Each of LSH_TABLES
+tables hashes a vector to LSH_BITS sign bits, one per random hyperplane.
+Similar vectors agree on most bits. A query reads its own bucket in every
+table, and re-ranks the candidates exactly. When that yields fewer than
+the requested halls it also reads the buckets one bit away (multi-probe),
+then falls back to brute force. Cost depends on
+the bucket size, not on the number of halls. Inserts, updates and
+removals only touch the affected buckets.
+
+HallIndex pickles to one file. Buckets are not stored: load() rebuilds them
+from the vectors in a single vectorized pass. Build it offline (`python
+hall_embeddings.py`). /api/ai/similar serves from it through get_index(),
+which picks up a rebuilt file when it is replaced.
+"""
+import argparse
+import math
+import os
+import pickle
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from lazy_imports import lazy_module
+from models import Hall
+
+np = lazy_module("numpy")
+sklearn_text = lazy_module("sklearn.feature_extraction.text")
+sklearn_decomposition = lazy_module("sklearn.decomposition")
+
+EMBEDDING_DIM = int(os.getenv("HALL_EMBEDDING_DIM", 64))
+LSH_TABLES = int(os.getenv("HALL_LSH_TABLES", 16))
+# 0 sizes the hash to the catalog at build time (see bits_for)
+LSH_BITS = int(os.getenv("HALL_LSH_BITS", 0))
+# Build output goes to the gitignored backend/data/ unless MODEL_DATA_DIR points elsewhere
+MODEL_DATA_DIR = os.getenv("MODEL_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+HALL_INDEX_PATH = os.getenv("HALL_INDEX_PATH", os.path.join(MODEL_DATA_DIR, "hall_index.pkl"))
+
+
+def hall_text(hall) -> str:
+    """The text a hall is embedded from (hall may be a mapping or an object)"""
+    fields = ("name", "description", "facilities", "location")
+    get = hall.get if isinstance(hall, dict) else (lambda field: getattr(hall, field, None))
+    # Missing fields may be None, or NaN when the halls come from a DataFrame
+    return " ".join(value for value in map(get, fields) if isinstance(value, str) and value)
+
+
+def bits_for(count: int, bucket_size: int = 32) -> int:
+    """Hash length giving buckets of roughly bucket_size halls"""
+    return min(16, max(4, round(math.log2(max(count, 1) / bucket_size))))
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+
+class HallEmbedder:
+    def __init__(self, dim: int = EMBEDDING_DIM, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+        self.vectorizer = None
+        self.svd = None
+
+    def fit_transform(self, texts: Sequence[str]):
+        self.vectorizer = sklearn_text.TfidfVectorizer(stop_words="english")
+        tfidf = self.vectorizer.fit_transform(texts)
+        # SVD needs fewer components than features; tiny catalogs get a smaller embedding
+        components = max(1, min(self.dim, tfidf.shape[1] - 1, len(texts) - 1))
+        self.svd = sklearn_decomposition.TruncatedSVD(n_components=components, random_state=self.seed)
+        return self._pad(_normalize(self.svd.fit_transform(tfidf)))
+
+    def transform(self, texts: Sequence[str]):
+        return self._pad(_normalize(self.svd.transform(self.vectorizer.transform(texts))))
+
+    def _pad(self, vectors):
+        if vectors.shape[1] == self.dim:
+            return vectors
+        return np.hstack([vectors, np.zeros((len(vectors), self.dim - vectors.shape[1]), dtype=np.float32)])
+
+
+class LSHIndex:
+    def __init__(self, dim: int = EMBEDDING_DIM, tables: int = LSH_TABLES, bits: int = 12, seed: int = 0):
+        self.dim, self.tables, self.bits = dim, tables, bits
+        self.planes = np.random.default_rng(seed).standard_normal((tables * bits, dim)).astype(np.float32)
+        self._weights = 1 << np.arange(bits, dtype=np.int64)
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)  # -1 marks a free row
+        self.rows: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(tables)]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _keys(self, vectors):
+        """Bucket key per table, shape (n, tables)"""
+        signs = (vectors @ self.planes.T > 0).reshape(len(vectors), self.tables, self.bits)
+        return signs @ self._weights
+
+    def _grow(self, needed: int):
+        old, capacity = len(self.ids), max(needed, 2 * len(self.ids), 1024)
+        self.vectors = np.vstack([self.vectors, np.zeros((capacity - old, self.dim), dtype=np.float32)])
+        self.ids = np.concatenate([self.ids, np.full(capacity - old, -1, dtype=np.int64)])
+        # Popped from the end, so the lowest new row is used first
+        self._free[:0] = range(capacity - 1, old - 1, -1)
+
+    def add(self, ids: Iterable[int], vectors):
+        """Insert halls, replacing the vectors of ids already indexed"""
+        ids = [int(hall_id) for hall_id in ids]
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        self.remove([hall_id for hall_id in ids if hall_id in self.rows])
+        if len(self._free) < len(ids):
+            self._grow(len(self.rows) + len(ids))
+        rows = np.array([self._free.pop() for _ in ids], dtype=np.int64)
+        self.vectors[rows], self.ids[rows] = vectors, ids
+        self.rows.update(zip(ids, rows.tolist()))
+        for row, keys in zip(rows.tolist(), self._keys(vectors).tolist()):
+            for buckets, key in zip(self._buckets, keys):
+                buckets.setdefault(key, []).append(row)
+
+    def remove(self, ids: Iterable[int]):
+        for hall_id in ids:
+            row = self.rows.pop(int(hall_id), None)
+            if row is None:
+                continue
+            for buckets, key in zip(self._buckets, self._keys(self.vectors[row:row + 1])[0].tolist()):
+                bucket = buckets[key]
+                bucket.remove(row)
+                if not bucket:
+                    del buckets[key]
+            self.ids[row] = -1
+            self._free.append(row)
+
+    def candidates(self, vector, probe: bool = False):
+        """Rows sharing a bucket with the vector (or one bit away, with probe) in any table"""
+        keys = self._keys(vector.reshape(1, self.dim))[0].tolist()
+        flips = [0] + ([1 << bit for bit in range(self.bits)] if probe else [])
+        postings = [buckets.get(key ^ flip, ()) for buckets, key in zip(self._buckets, keys) for flip in flips]
+        rows = [row for posting in postings for row in posting]
+        return np.unique(np.array(rows, dtype=np.int64))
+
+    def search(self, vector, n: int, probe: bool = False, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Approximate n most similar (id, cosine) pairs, best first"""
+        vector = np.asarray(vector, dtype=np.float32)
+        excluded = self.rows.get(exclude, -1) if exclude is not None else -1
+        rows = self.candidates(vector, probe)
+        if len(rows) - (excluded in rows) < n and not probe:
+            # Sparse neighbourhood (or a small index): widen to the buckets one bit away
+            rows = self.candidates(vector, probe=True)
+        if len(rows) - (excluded in rows) < n:
+            return self.exact_search(vector, n, exclude)
+        return self._top(rows[rows != excluded], vector, n)
+
+    def exact_search(self, vector, n: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Brute force over every indexed vector (ground truth for recall)"""
+        rows = np.flatnonzero(self.ids >= 0)
+        if exclude is not None and exclude in self.rows:
+            rows = rows[rows != self.rows[exclude]]
+        return self._top(rows, np.asarray(vector, dtype=np.float32), n)
+
+    def _top(self, rows, vector, n: int) -> List[Tuple[int, float]]:
+        scores = self.vectors[rows] @ vector
+        if len(rows) > n:
+            best = np.argpartition(-scores, n - 1)[:n]
+            rows, scores = rows[best], scores[best]
+        order = np.lexsort((self.ids[rows], -scores))
+        return [(int(self.ids[rows[position]]), float(scores[position])) for position in order]
+
+    def vector(self, hall_id: int):
+        row = self.rows.get(int(hall_id))
+        return None if row is None else self.vectors[row]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_buckets"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._buckets = [{} for _ in range(self.tables)]
+        rows = np.flatnonzero(self.ids >= 0)
+        for table, keys in enumerate(self._keys(self.vectors[rows]).T):
+            # Group rows by key in one sort instead of a dict update per row
+            order = np.argsort(keys, kind="stable")
+            unique, starts = np.unique(keys[order], return_index=True)
+            for key, posting in zip(unique.tolist(), np.split(rows[order], starts[1:])):
+                self._buckets[table][key] = posting.tolist()
+
+
+class HallIndex:
+    """Embedder and LSH index kept and persisted together"""
+
+    def __init__(self, embedder: HallEmbedder, index: LSHIndex):
+        self.embedder = embedder
+        self.index = index
+
+    @classmethod
+    def build(cls, halls: Sequence, dim: int = EMBEDDING_DIM, tables: int = LSH_TABLES,
+              bits: Optional[int] = None) -> "HallIndex":
+        embedder = HallEmbedder(dim)
+        vectors = embedder.fit_transform([hall_text(hall) for hall in halls])
+        index = LSHIndex(dim, tables, bits or LSH_BITS or bits_for(len(halls)))
+        index.add([hall["id"] if isinstance(hall, dict) else hall.id for hall in halls], vectors)
+        return cls(embedder, index)
+
+    def add_halls(self, halls: Sequence):
+        """Insert new halls (or re-embed changed ones) without refitting"""
+        if halls:
+            self.index.add([hall["id"] if isinstance(hall, dict) else hall.id for hall in halls],
+                           self.embedder.transform([hall_text(hall) for hall in halls]))
+
+    def similar(self, hall_id: int, n: int = 5) -> List[Tuple[int, float]]:
+        vector = self.index.vector(hall_id)
+        return [] if vector is None else self.index.search(vector, n, exclude=hall_id)
+
+    def save(self, path: Optional[str] = None):
+        path = path or HALL_INDEX_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def load(path: Optional[str] = None) -> "HallIndex":
+        with open(path or HALL_INDEX_PATH, "rb") as file:
+            return pickle.load(file)
+
+
+def build_from_db(engine, log=print) -> HallIndex:
+    started = time.perf_counter()
+    table = Hall.__table__
+    with engine.connect() as conn:
+        halls = [dict(row) for row in conn.execute(
+            select(table.c.id, table.c.name, table.c.description, table.c.facilities, table.c.location)
+        ).mappings()]
+    hall_index = HallIndex.build(halls)
+    log(f"Indexed {len(halls):,} halls ({time.perf_counter() - started:.1f}s)")
+    return hall_index
+
+
+# ---------- Serving ----------
+
+_loaded: Optional[Tuple[str, float, HallIndex]] = None
+_load_lock = threading.Lock()
+
+
+def get_index(path: Optional[str] = None) -> Optional[HallIndex]:
+    """The built index, reloaded when the file is replaced; None until one is built"""
+    global _loaded
+    path = path or HALL_INDEX_PATH
+    try:
+        modified = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+    loaded = _loaded
+    if loaded is not None and loaded[:2] == (path, modified):
+        return loaded[2]
+    with _load_lock:
+        if _loaded is None or _loaded[:2] != (path, modified):
+            _loaded = (path, modified, HallIndex.load(path))
+        return _loaded[2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL from the environment / .env")
+    parser.add_argument("--output", default=HALL_INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        from sqlalchemy import create_engine
+        engine = create_engine(args.database_url)
+    else:
+        from database import engine
+    build_from_db(engine).save(args.output)
+    print(f"✅ Index written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# ==================== lazy_imports.py ====================
+"""
+Deferred imports for heavy optional dependencies (pandas, scikit-learn, openai).
+
+lazy_module("pandas") returns a stand-in that imports the real module on first
+attribute access, so importing an AI module (and therefore `main`) does not
+pay the multi-second import cost until a request actually needs it.
+"""
+import importlib
+import threading
+
+# Modules that must never be imported while `main` is being imported
+HEAVY_MODULES = ("numpy", "pandas", "sklearn", "scipy", "openai")
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
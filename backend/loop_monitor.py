@@ -0,0 +1,196 @@
+# ==================== loop_monitor.py ====================
+"""
+Event-loop lag watchdog.
+
+A watchdog thread posts a probe callback to every event loop that served a
+request and times how long the loop takes to run it (scheduler delay, the
+event_loop_lag_seconds histogram). When a probe has been waiting longer than
+LOOP_STALL_THRESHOLD_MS, the loop is stuck in synchronous code. The watchdog
+then samples the loop thread's stack and finds the request being executed
+from the LoopMonitorMiddleware frame on that stack. When the stall ends it is
+counted per route (event_loop_stalls_total / event_loop_stall_seconds) and
+logged together with the stack sample.
+
+Test mode: with LOOP_BLOCK_FAIL_MS set (or fail_ms passed to the middleware),
+any request that blocks the loop for longer than that raises LoopBlockedError,
+which the test client re-raises in the test.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from metrics import REGISTRY, Counter, Histogram, UNMATCHED_ROUTE
+
+logger = logging.getLogger("loop_monitor")
+
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", 100))
+LOOP_PROBE_INTERVAL_MS = float(os.getenv("LOOP_PROBE_INTERVAL_MS", 50))
+LOOP_BLOCK_FAIL_MS = float(os.getenv("LOOP_BLOCK_FAIL_MS", 0))
+STACK_SAMPLE_DEPTH = 15
+
+LOOP_LAG = REGISTRY.register(Histogram(
+    "event_loop_lag_seconds", "Delay between scheduling a callback and the loop running it",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)))
+LOOP_STALLS = REGISTRY.register(Counter(
+    "event_loop_stalls_total", "Times a route blocked the event loop past the threshold", ("route",)))
+LOOP_STALL_SECONDS = REGISTRY.register(Histogram(
+    "event_loop_stall_seconds", "How long each stall blocked the event loop", ("route",)))
+
+
+class LoopBlockedError(RuntimeError):
+    pass
+
+
+class _RequestState:
+    """Per-request marker found on the loop thread's stack by the watchdog"""
+    __slots__ = ("scope", "stalls")
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.stalls: List[float] = []
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class _Stall:
+    __slots__ = ("request", "route", "stack")
+
+    def __init__(self, request: Optional[_RequestState], stack: str):
+        self.request = request
+        self.route = request.route if request is not None else "<outside request>"
+        self.stack = stack
+
+
+class _LoopState:
+    def __init__(self, loop: asyncio.AbstractEventLoop, thread_id: int):
+        self.loop = loop
+        self.thread_id = thread_id
+        self.probe_sent: Optional[float] = None
+        self.stall: Optional[_Stall] = None
+
+
+class LoopMonitor:
+    def __init__(self, threshold_ms: float = LOOP_STALL_THRESHOLD_MS, interval_ms: float = LOOP_PROBE_INTERVAL_MS):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self._loops: Dict[int, _LoopState] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def lower_threshold(self, threshold_ms: float):
+        # Probe often enough to notice a stall well within the threshold
+        self.threshold = min(self.threshold, threshold_ms / 1000)
+        self.interval = min(self.interval, self.threshold / 4)
+
+    def watch(self, loop: asyncio.AbstractEventLoop):
+        """Start probing the running loop (called from the loop thread)"""
+        state = self._loops.get(id(loop))
+        if state is not None and state.loop is loop:
+            return
+        with self._lock:
+            self._loops[id(loop)] = _LoopState(loop, threading.get_ident())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="loop-monitor", daemon=True)
+                self._thread.start()
+
+    # ---------- Watchdog thread ----------
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            for key, state in list(self._loops.items()):
+                if state.loop.is_closed():
+                    self._loops.pop(key, None)
+                    continue
+                try:
+                    self._check(state)
+                except RuntimeError:
+                    # Loop closed between the check and the call
+                    self._loops.pop(key, None)
+
+    def _check(self, state: _LoopState):
+        now = time.monotonic()
+        if state.probe_sent is None:
+            state.probe_sent = now
+            state.loop.call_soon_threadsafe(self._answer, state)
+        elif state.stall is None and now - state.probe_sent > self.threshold:
+            state.stall = self._sample(state.thread_id)
+
+    def _sample(self, thread_id: int) -> _Stall:
+        frame = sys._current_frames().get(thread_id)
+        request = None
+        cursor = frame
+        while cursor is not None:
+            if cursor.f_code is _MIDDLEWARE_CODE:
+                request = cursor.f_locals.get("request_state")
+                break
+            cursor = cursor.f_back
+        stack = "".join(traceback.format_stack(frame, limit=STACK_SAMPLE_DEPTH)) if frame is not None else ""
+        return _Stall(request, stack)
+
+    # ---------- Runs on the loop once it is free again ----------
+
+    def _answer(self, state: _LoopState):
+        lag = time.monotonic() - state.probe_sent
+        LOOP_LAG.observe((), lag)
+        stall, state.stall, state.probe_sent = state.stall, None, None
+        if stall is None:
+            return
+
+        LOOP_STALLS.inc((stall.route,))
+        LOOP_STALL_SECONDS.observe((stall.route,), lag)
+        if stall.request is not None:
+            stall.request.stalls.append(lag)
+        logger.warning("Event loop blocked for %.0f ms in %s; stack sample:\n%s",
+                       lag * 1000, stall.route, stall.stack)
+
+
+loop_monitor = LoopMonitor()
+
+
+class LoopMonitorMiddleware:
+    """Registers the serving loop with the watchdog and marks each request.
+
+    With fail_ms > 0 (test mode), a request that blocked the loop for longer
+    than fail_ms raises LoopBlockedError once it has finished.
+    """
+
+    def __init__(self, app: ASGIApp, fail_ms: float = LOOP_BLOCK_FAIL_MS, monitor: LoopMonitor = loop_monitor):
+        self.app = app
+        self.fail_after = fail_ms / 1000
+        self.monitor = monitor
+        if fail_ms:
+            monitor.lower_threshold(fail_ms)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.monitor.watch(asyncio.get_running_loop())
+        # Looked up by name from the watchdog thread; keep it a local of this frame
+        request_state = _RequestState(scope)
+        await self.app(scope, receive, send)
+
+        if self.fail_after:
+            # A probe queued during the last blocking step is ahead of us; let it report
+            await asyncio.sleep(0)
+            blocked = max(request_state.stalls, default=0.0)
+            if blocked > self.fail_after:
+                raise LoopBlockedError(
+                    f"{scope['method']} {request_state.route} blocked the event loop for "
+                    f"{blocked * 1000:.0f} ms (limit {self.fail_after * 1000:.0f} ms)"
+                )
+
+
+_MIDDLEWARE_CODE = LoopMonitorMiddleware.__call__.__code__
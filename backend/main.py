@@ -1,7 +1,16 @@
 # ==================== main.py ====================
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from database import engine, Base
+from responses import FastJSONResponse
+from compression import CompressionMiddleware
+from metrics import CONTENT_TYPE, MetricsMiddleware, instrument_engine, render_metrics
+from loop_monitor import LoopMonitorMiddleware
+from password_hashing import start_pool, shutdown_pool
+from catalog import start_pruning, stop_pruning
+from query_profiler import PROFILING_ENABLED, QueryProfilerMiddleware, install_profiler
+import os
 
 # Import routers
 from routers.auth import router as auth_router
@@ -11,18 +20,43 @@ from routers.owner import router as owner_router
 from routers.ai_recommendations import router as ai_recommendations_router
 from routers.ai_chatbot import router as ai_chatbot_router
 from routers.ai_pricing import router as ai_pricing_router
+from routers.analytics import router as analytics_router
+
+# DDL runs at startup instead of import, so importing main (tests, tooling,
+# worker preload) never touches the database. CREATE_TABLES_ON_STARTUP=0 skips it
+# when migrations manage the schema.
+CREATE_TABLES_ON_STARTUP = os.getenv("CREATE_TABLES_ON_STARTUP", "1").lower() in ("1", "true", "yes")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if CREATE_TABLES_ON_STARTUP:
+        try:
+            Base.metadata.create_all(bind=engine)
+            print("Database tables created/verified successfully")
+        except Exception as e:
+            print(f"Error creating database tables: {e}")
+    # Spawn the bcrypt workers before the first login arrives
+    start_pool()
+    # Trim the hall change log on a timer, never from a request
+    start_pruning(engine)
+    yield
+    stop_pruning()
+    shutdown_pool()
 
-# Create database tables
-try:
-    Base.metadata.create_all(bind=engine)
-    print("Database tables created/verified successfully")
-except Exception as e:
-    print(f"Error creating database tables: {e}")
 
 app = FastAPI(
     title="Hall Booking Management System",
     description="Smart Bookings, Seamless Events with AI",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
+)
+
+# Compress responses (br/gzip, negotiated per request) above the size threshold
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
 )
 
 # CORS configuration
@@ -39,6 +73,19 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
 )
+
+# Opt-in SQL profiling (QUERY_PROFILING=1): X-Query-Profile header and N+1 warnings
+if PROFILING_ENABLED:
+    install_profiler(engine)
+    app.add_middleware(QueryProfilerMiddleware)
+
+# Event-loop stall watchdog (LOOP_BLOCK_FAIL_MS turns stalls into errors in tests)
+app.add_middleware(LoopMonitorMiddleware)
+
+# Per-route latency / status / size / DB metrics; added last so it wraps everything
+instrument_engine(engine)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(halls_router)
@@ -47,6 +94,7 @@ app.include_router(owner_router)
 app.include_router(ai_recommendations_router)
 app.include_router(ai_chatbot_router)
 app.include_router(ai_pricing_router)
+app.include_router(analytics_router)
 
 @app.get("/")
 def root():
@@ -59,4 +107,8 @@ def root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
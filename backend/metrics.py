@@ -0,0 +1,289 @@
+# ==================== metrics.py ====================
+"""
+Request and database metrics in the Prometheus text format.
+
+MetricsMiddleware times every HTTP request and labels it with the matched
+route template (not the raw path), so label cardinality stays bounded.
+SQLAlchemy cursor events add each query's time to the current request's
+stats, found through a context variable that also follows sync endpoints into
+the threadpool. Values are kept per process; scrape every worker.
+
+Event streams (text/event-stream) stay open for as long as a dashboard is.
+They count as handled once their headers are sent: the duration histogram
+gets the time to the headers, and the open connections are tracked in
+http_open_streams instead of http_requests_in_flight.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Label for requests that matched no route (404s, probes), keeps cardinality bounded
+UNMATCHED_ROUTE = "<unmatched>"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+INF_LABEL = 'le="+Inf"'
+STREAMED_TYPES = (b"text/event-stream",)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Tuple = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self):
+        # Copy under the lock, format outside it: observers keep writing meanwhile
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = self.header()
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, labels: Tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, labels: Tuple) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def total(self, labels: Tuple) -> float:
+        entry = self._values.get(labels)
+        return entry[1] if entry else 0.0
+
+    def render(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        lines = self.header()
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, INF_LABEL)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")))
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time from request start to last body byte (to the headers for event streams)",
+    ("method", "route")))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled, event streams excepted"))
+OPEN_STREAMS = REGISTRY.register(Gauge(
+    "http_open_streams", "Event streams currently open", ("route",)))
+RESPONSE_SIZE = REGISTRY.register(Histogram(
+    "http_response_size_bytes", "Response body size as sent", ("method", "route"), SIZE_BUCKETS))
+REQUEST_DB_TIME = REGISTRY.register(Histogram(
+    "http_request_db_seconds", "Database time spent per request", ("method", "route")))
+REQUEST_DB_QUERIES = REGISTRY.register(Histogram(
+    "http_request_db_queries", "Database queries issued per request", ("method", "route"), QUERY_COUNT_BUCKETS))
+DB_QUERIES_TOTAL = REGISTRY.register(Counter(
+    "db_queries_total", "Database queries executed, inside or outside requests"))
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# ---------- Per-request stats ----------
+
+class RequestStats:
+    __slots__ = ("db_time", "queries")
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    DB_QUERIES_TOTAL.inc()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def instrument_engine(engine):
+    """Attach the query timing listeners to an engine (idempotent)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+# ---------- Middleware ----------
+
+class MetricsMiddleware:
+    """Records latency, status, size and DB usage per route template.
+
+    Add it last so it wraps every other middleware and measures the bytes that
+    actually leave the server (after compression).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        size = 0
+        stream_route = None
+        started = time.perf_counter()
+
+        def route_labels():
+            # APIRoute.matches stores the matched route in the scope
+            route = scope.get("route")
+            return scope["method"], getattr(route, "path", None) or UNMATCHED_ROUTE
+
+        async def send_wrapper(message: Message):
+            nonlocal status, size, stream_route
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = dict(message.get("headers", ())).get(b"content-type", b"")
+                if content_type.startswith(STREAMED_TYPES):
+                    labels = route_labels()
+                    REQUEST_DURATION.observe(labels, time.perf_counter() - started)
+                    stream_route = labels[1]
+                    REQUESTS_IN_FLIGHT.dec()
+                    OPEN_STREAMS.inc((stream_route,))
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            labels = route_labels()
+            REQUESTS_TOTAL.inc(labels + (str(status),))
+            if stream_route is None:
+                REQUESTS_IN_FLIGHT.dec()
+                REQUEST_DURATION.observe(labels, elapsed)
+                RESPONSE_SIZE.observe(labels, size)
+            else:
+                OPEN_STREAMS.dec((stream_route,))
+            REQUEST_DB_TIME.observe(labels, stats.db_time)
+            REQUEST_DB_QUERIES.observe(labels, stats.queries)
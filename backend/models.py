@@ -1,5 +1,5 @@
 # ==================== models.py ====================
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Enum, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -41,13 +41,25 @@ class Hall(Base):
     price_per_hour = Column(Float)
     facilities = Column(String(500))
     location = Column(String(255))
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geohash = Column(String(12), index=True)  # Kept in sync by geo.py; prefix ranges are map cells
     image_url = Column(String(500))
     available = Column(Boolean, default=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Add owner reference
+    version = Column(Integer, nullable=False, default=1)  # Bumped on every change, used for ETags
     
     bookings = relationship("Booking", back_populates="hall")
     owner = relationship("User", back_populates="owned_halls")  # Add relationship to owner
 
+    __table_args__ = (
+        # One per list_halls sort: ORDER BY key, id walks the index (backwards for descending)
+        # and the trailing column answers the available filter without touching the row
+        Index("ix_halls_sort_price", "price_per_hour", "id", "available"),
+        Index("ix_halls_sort_capacity", "capacity", "id", "available"),
+        Index("ix_halls_sort_name", "name", "id", "available"),
+    )
+
 class Booking(Base):
     __tablename__ = "bookings"
     
@@ -65,4 +77,111 @@ class Booking(Base):
     remarks = Column(Text)
     
     user = relationship("User", back_populates="bookings")
-    hall = relationship("Hall", back_populates="bookings")
\ No newline at end of file
+    hall = relationship("Hall", back_populates="bookings")
+
+    __table_args__ = (
+        # Serves the overlap check in create_booking and per-hall scans/backfills
+        Index("ix_bookings_hall_start", "hall_id", "start_time"),
+    )
+
+class Facility(Base):
+    """Normalized facility names; Hall.facilities stays the display text"""
+    __tablename__ = "facilities"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String(100), unique=True, nullable=False)  # lower-case, single-spaced
+    name = Column(String(100), nullable=False)
+
+class HallFacility(Base):
+    """Hall <-> facility join rows, kept in sync with Hall.facilities by facilities.py"""
+    __tablename__ = "hall_facilities"
+
+    hall_id = Column(Integer, ForeignKey("halls.id", ondelete="CASCADE"), primary_key=True)
+    facility_id = Column(Integer, ForeignKey("facilities.id"), primary_key=True)
+
+    __table_args__ = (
+        # Serves "halls having facility X" for the AND filter; the primary key serves facet counts
+        Index("ix_hall_facilities_facility_hall", "facility_id", "hall_id"),
+    )
+
+class HallChange(Base):
+    """Append-only log of changed hall ids; catalog snapshots replay it to refresh incrementally"""
+    __tablename__ = "hall_changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    hall_id = Column(Integer, nullable=False)  # no FK: deleted halls are logged too
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    # Never reuse a pruned seq: snapshots only replay seqs above the last one they applied
+    __table_args__ = {"sqlite_autoincrement": True}
+
+class UserProfile(Base):
+    """Running aggregates over the distinct halls a user booked; updated per booking"""
+    __tablename__ = "user_profiles"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    hall_ids = Column(Text, nullable=False, default="[]")  # JSON list, so each hall counts once
+    location_counts = Column(Text, nullable=False, default="{}")  # JSON {location: halls}
+    facility_counts = Column(Text, nullable=False, default="{}")  # JSON {facility slug: halls}
+    capacity_sum = Column(Float, nullable=False, default=0.0)
+    latitude_sum = Column(Float, nullable=False, default=0.0)
+    longitude_sum = Column(Float, nullable=False, default=0.0)
+    located = Column(Integer, nullable=False, default=0)  # halls with coordinates
+    stale = Column(Boolean, nullable=False, default=True)  # recommendations need recomputing
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class UserRecommendation(Base):
+    """Precomputed top-N personalized recommendations, one row per rank"""
+    __tablename__ = "user_recommendations"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    hall_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class CatalogVersion(Base):
+    """Monotonic version counters for read-mostly collections (e.g. the hall catalog)"""
+    __tablename__ = "catalog_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+
+class BookingDailyStat(Base):
+    """Per-hall, per-status daily rollup of bookings, keyed on the local creation day"""
+    __tablename__ = "booking_daily_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    hall_id = Column(Integer, ForeignKey("halls.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(Enum(BookingStatusEnum), nullable=False)
+    bookings = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "hall_id", "status", name="uq_booking_daily_stats_day_hall_status"),
+        Index("ix_booking_daily_stats_owner_day", "owner_id", "day"),
+    )
+
+class HallDemand(Base):
+    """Booked hours per hall and local hour of the week (0 = Monday 00:00)"""
+    __tablename__ = "hall_demand"
+
+    hall_id = Column(Integer, primary_key=True)
+    hour_of_week = Column(Integer, primary_key=True)
+    booked_hours = Column(Float, nullable=False, default=0.0)
+
+class HallDailyUtilization(Base):
+    """Booked hours per hall and local day, counting only approved/completed bookings"""
+    __tablename__ = "hall_daily_utilization"
+
+    id = Column(Integer, primary_key=True, index=True)
+    hall_id = Column(Integer, ForeignKey("halls.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    booked_hours = Column(Float, nullable=False, default=0.0)
+    bookings = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("hall_id", "day", name="uq_hall_daily_utilization_hall_day"),
+    )
@@ -0,0 +1,264 @@
+# ==================== owner_feed.py ====================
+"""
+Live booking deltas for owner dashboards, sent as Server-Sent Events.
+
+Booking events (see events.py) become small deltas for the owner of the
+hall: booking_created and booking_status_changed. After the commit they
+are published on the cache backend's pub/sub, so a dashboard connected to
+any worker hears about writes made on every worker. Each worker keeps the
+last OWNER_FEED_REPLAY_SIZE deltas per owner with a connected dashboard.
+
+- Resuming: ids are "<worker>-<sequence>". A client reconnecting with
+  Last-Event-ID gets what it missed from the buffer. If that is gone (the
+  gap is too long, or it lands on another worker) it gets a `reset` event
+  and should refetch the dashboard once.
+- Backpressure: a connection holds no queue, only its last sent id and a
+  wake-up flag. A slow client reads the shared buffer at its own pace, and
+  one that falls further behind than the buffer is reset. Publishing
+  never waits for a client, and memory does not grow with the number of
+  connections.
+- Idle connections cost one parked task each. A comment line every
+  OWNER_FEED_KEEPALIVE_S keeps proxies from closing them.
+"""
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import AsyncIterator, Deque, Dict, List, NamedTuple, Optional, Set
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache import CACHE_PREFIX, cache
+from events import BookingCreated, BookingStatusChanged, subscribe
+from models import Booking, Hall
+
+logger = logging.getLogger("owner_feed")
+
+OWNER_FEED_REPLAY_SIZE = int(os.getenv("OWNER_FEED_REPLAY_SIZE", 256))
+OWNER_FEED_KEEPALIVE_S = float(os.getenv("OWNER_FEED_KEEPALIVE_S", 15))
+# Buffers kept for owners with no dashboard open, so a quick reconnect can resume
+OWNER_FEED_IDLE_OWNERS = int(os.getenv("OWNER_FEED_IDLE_OWNERS", 10_000))
+OWNER_FEED_RETRY_MS = 3000
+
+
+class Delta(NamedTuple):
+    seq: int
+    type: str
+    data: str  # JSON
+
+    def encode(self, origin: str) -> bytes:
+        return f"id: {origin}-{self.seq}\nevent: {self.type}\ndata: {self.data}\n\n".encode()
+
+
+class _Connection:
+    __slots__ = ("loop", "wake")
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+
+    def notify(self):
+        self.loop.call_soon_threadsafe(self.wake.set)
+
+
+class _OwnerChannel:
+    __slots__ = ("deltas", "connections", "dropped_through")
+
+    def __init__(self, replay_size: int, start: int):
+        self.deltas: Deque[Delta] = deque(maxlen=replay_size)
+        self.connections: Set[_Connection] = set()
+        # Deltas up to this sequence are not in the buffer (never seen, or evicted)
+        self.dropped_through = start
+
+    def append(self, delta: Delta):
+        if len(self.deltas) == self.deltas.maxlen:
+            self.dropped_through = self.deltas[0].seq
+        self.deltas.append(delta)
+
+    def since(self, last: int) -> Optional[List[Delta]]:
+        """Deltas after sequence `last`, or None when some of them are no longer buffered"""
+        if last < self.dropped_through:
+            return None
+        return [delta for delta in self.deltas if delta.seq > last]
+
+
+class OwnerFeed:
+    def __init__(self, backend, channel: str = f"{CACHE_PREFIX}:owner-feed",
+                 replay_size: int = OWNER_FEED_REPLAY_SIZE, keepalive: float = OWNER_FEED_KEEPALIVE_S,
+                 idle_owners: int = OWNER_FEED_IDLE_OWNERS):
+        self.backend = backend
+        self.channel = channel
+        self.replay_size = replay_size
+        self.keepalive = keepalive
+        self.idle_owners = idle_owners
+        self.origin = uuid.uuid4().hex[:12]
+
+        self._owners: Dict[int, _OwnerChannel] = {}
+        self._idle: "OrderedDict[int, None]" = OrderedDict()  # owners without connections, oldest first
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+
+    # ----- publishing (any thread, any worker) -----
+
+    def publish(self, owner_id: int, delta_type: str, data: dict):
+        self.backend.publish(self.channel, f"{owner_id}|{delta_type}|{json.dumps(data, default=str)}")
+
+    def apply(self, message):
+        """Buffer a published delta and wake the owner's connections"""
+        owner_id, delta_type, data = (message.decode() if isinstance(message, bytes) else message).split("|", 2)
+        with self._lock:
+            owner = self._owners.get(int(owner_id))
+            if owner is None:
+                return  # nobody is watching this owner on this worker
+            self._seq += 1
+            owner.append(Delta(self._seq, delta_type, data))
+            connections = list(owner.connections)
+        for connection in connections:
+            connection.notify()
+
+    def _ensure_listener(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                pubsub = self.backend.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self._listener = threading.Thread(target=self._listen, args=(pubsub,),
+                                                  name="owner-feed", daemon=True)
+                self._listener.start()
+
+    def _listen(self, pubsub):
+        while True:
+            try:
+                message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception:
+                # Connection trouble: deltas may be lost, so make every client refetch
+                self._reset_all()
+                time.sleep(1.0)
+                continue
+            if message and message.get("type") == "message":
+                try:
+                    self.apply(message["data"])
+                except Exception:
+                    # One bad message must not stop the listener for every dashboard
+                    logger.exception("owner feed: could not apply %r", message["data"])
+
+    def _reset_all(self):
+        with self._lock:
+            for owner in self._owners.values():
+                owner.deltas.clear()
+                owner.dropped_through = self._seq
+            connections = [connection for owner in self._owners.values() for connection in owner.connections]
+        for connection in connections:
+            connection.notify()
+
+    # ----- connections -----
+
+    def _parse(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Sequence of a Last-Event-ID from this worker; -1 when it must be reset, None when absent"""
+        if not last_event_id:
+            return None
+        origin, _, seq = last_event_id.rpartition("-")
+        return int(seq) if origin == self.origin and seq.isdigit() else -1
+
+    def _attach(self, owner_id: int, connection: _Connection) -> _OwnerChannel:
+        owner = self._owners.get(owner_id)
+        if owner is None:
+            owner = self._owners[owner_id] = _OwnerChannel(self.replay_size, self._seq)
+        self._idle.pop(owner_id, None)
+        owner.connections.add(connection)
+        return owner
+
+    def _detach(self, owner_id: int, connection: _Connection):
+        owner = self._owners[owner_id]
+        owner.connections.discard(connection)
+        if owner.connections:
+            return
+        # Keep the buffer for a quick reconnect, up to idle_owners of them
+        self._idle[owner_id] = None
+        while len(self._idle) > self.idle_owners:
+            del self._owners[self._idle.popitem(last=False)[0]]
+
+    async def stream(self, owner_id: int, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """SSE byte stream of one owner's deltas, resuming after last_event_id when it can"""
+        self._ensure_listener()
+        connection = _Connection()
+        with self._lock:
+            owner = self._attach(owner_id, connection)
+            last = self._parse(last_event_id)
+            if last is None:
+                last = self._seq
+            elif last > self._seq:
+                last = -1
+        try:
+            yield f"retry: {OWNER_FEED_RETRY_MS}\n\n".encode()
+            while True:
+                connection.wake.clear()
+                with self._lock:
+                    pending = owner.since(last)
+                    if pending is None:
+                        last = self._seq
+                if pending is None:
+                    yield Delta(last, "reset", "{}").encode(self.origin)
+                elif pending:
+                    last = pending[-1].seq
+                    yield b"".join(delta.encode(self.origin) for delta in pending)
+                else:
+                    try:
+                        await asyncio.wait_for(connection.wake.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        yield b": keepalive\n\n"
+        finally:
+            with self._lock:
+                self._detach(owner_id, connection)
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(owner.connections) for owner in self._owners.values())
+
+
+feed = OwnerFeed(cache.backend)
+
+
+# ---------- Booking events -> deltas ----------
+
+def _iso(moment: Optional[datetime]) -> Optional[str]:
+    return moment.isoformat() if moment else None
+
+
+@subscribe((BookingCreated, BookingStatusChanged), phase="transaction")
+def _queue_delta(db: Session, booking_event):
+    # The owner is only known through the hall; publish once the booking is committed
+    owner_id = db.get(Hall, booking_event.hall_id).owner_id
+    if isinstance(booking_event, BookingCreated):
+        booking = db.get(Booking, booking_event.booking_id)
+        delta = ("booking_created", {
+            "booking_id": booking.id, "hall_id": booking.hall_id, "user_id": booking.user_id,
+            "status": booking_event.status.value, "start_time": _iso(booking.start_time),
+            "end_time": _iso(booking.end_time), "total_amount": booking.total_amount,
+        })
+    else:
+        delta = ("booking_status_changed", {
+            "booking_id": booking_event.booking_id, "hall_id": booking_event.hall_id,
+            "old_status": booking_event.old_status.value if booking_event.old_status else None,
+            "new_status": booking_event.new_status.value,
+        })
+    db.info.setdefault("owner_feed", []).append((owner_id, *delta))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_deltas(session):
+    for owner_id, delta_type, data in session.info.pop("owner_feed", ()):
+        feed.publish(owner_id, delta_type, data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_deltas(session):
+    session.info.pop("owner_feed", None)
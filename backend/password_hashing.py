@@ -0,0 +1,176 @@
+# ==================== password_hashing.py ====================
+"""
+bcrypt hashing and verification off the request path.
+
+Hashes are computed in a dedicated, size-bounded process pool, so a login
+storm uses at most PASSWORD_HASH_WORKERS cores and never holds the GIL or the
+event loop. At most PASSWORD_HASH_MAX_PENDING operations may be queued or
+running; anything beyond that is rejected at once with 503 + Retry-After
+instead of queueing up behind work the client will have timed out on.
+Unless it is set, the bound is sized at warm-up from the measured cost of
+one hash: as much work as the pool gets through in PASSWORD_HASH_MAX_WAIT_S.
+
+BCRYPT_ROUNDS sets the cost. Hashes made with a different cost are flagged
+by verify_and_update(), and login stores the rehashed value.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# 0 workers hashes inline in the calling thread (single-process tools, debugging)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Unset: sized from PASSWORD_HASH_MAX_WAIT_S when the pool warms up
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 0)) or None
+PASSWORD_HASH_MAX_WAIT_S = float(os.getenv("PASSWORD_HASH_MAX_WAIT_S", 2.0))
+# Bound per worker until warm-up has measured a hash
+UNMEASURED_PENDING_PER_WORKER = 8
+RETRY_AFTER_SECONDS = 1
+
+_contexts = {}
+
+
+def _context(rounds: int) -> CryptContext:
+    # min == max rounds makes needs_update() flag hashes of any other cost
+    context = _contexts.get(rounds)
+    if context is None:
+        context = _contexts[rounds] = CryptContext(
+            schemes=["bcrypt"], deprecated="auto",
+            bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds
+        )
+    return context
+
+
+# ---------- Work done inside the pool ----------
+
+def _warm(rounds: int) -> float:
+    """Builds the context and loads the bcrypt backend in the worker; returns seconds per hash"""
+    context = _context(rounds)
+    context.handler().get_backend()
+    started = time.perf_counter()
+    context.hash("warm-up")
+    return time.perf_counter() - started
+
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _context(rounds).verify_and_update(password, hashed)
+
+
+# ---------- Pool management ----------
+
+class _BoundedPool:
+    def __init__(self, workers: int, max_pending: Optional[int] = None):
+        self.workers = workers
+        self.sized_by_wait = not max_pending
+        self.max_pending = max_pending or UNMEASURED_PENDING_PER_WORKER * max(workers, 1)
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                # spawn, not fork: the server process has threads (threadpool, event loop)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+        return self
+
+    def warm_up(self):
+        """Start every worker now so the first logins do not pay process start-up"""
+        self.start()
+        if self._executor is not None:
+            futures = [self._executor.submit(_warm, BCRYPT_ROUNDS) for _ in range(self.workers)]
+            hash_seconds = max(future.result() for future in futures)
+            if self.sized_by_wait:
+                # Whatever gets admitted finishes within PASSWORD_HASH_MAX_WAIT_S
+                self.max_pending = self.workers * max(1, int(PASSWORD_HASH_MAX_WAIT_S / hash_seconds))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.pending -= 1
+
+    def run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication service is busy, please retry",
+                    headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+                )
+            self.pending += 1
+
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._release()
+
+        try:
+            future: Future = self.start()._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future.result()
+
+
+_pool = _BoundedPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+
+def start_pool(warm: bool = True):
+    if warm:
+        _pool.warm_up()
+    else:
+        _pool.start()
+
+
+def shutdown_pool():
+    _pool.shutdown()
+
+
+def configure(rounds: Optional[int] = None, workers: Optional[int] = None, max_pending: Optional[int] = None):
+    """Change cost / pool size at runtime (benchmarks, tests); restarts the pool"""
+    global BCRYPT_ROUNDS, _pool
+    _pool.shutdown()
+    if rounds is not None:
+        BCRYPT_ROUNDS = rounds
+    workers = _pool.workers if workers is None else workers
+    _pool = _BoundedPool(workers, max_pending)
+
+
+def pool_stats() -> dict:
+    return {"workers": _pool.workers, "max_pending": _pool.max_pending, "pending": _pool.pending}
+
+
+# ---------- Public API ----------
+
+def hash_password(password: str) -> str:
+    return _pool.run(_hash, password, BCRYPT_ROUNDS)
+
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(matches, new_hash) - new_hash is set when the stored hash uses other parameters"""
+    return _pool.run(_verify_and_update, password, hashed, BCRYPT_ROUNDS)
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return verify_and_update(password, hashed)[0]
+
+
+def needs_rehash(hashed: str) -> bool:
+    return _context(BCRYPT_ROUNDS).needs_update(hashed)
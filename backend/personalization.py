@@ -0,0 +1,308 @@
+# ==================== personalization.py ====================
+"""
+Precomputed personalized recommendations.
+
+A user's taste is kept in user_profiles as running aggregates over the
+distinct halls they booked: location counts, facility counts, capacity sum
+and coordinate sums. Adding a booking updates those counters in place
+(record_booking) and marks the profile stale. Nothing is recomputed from the
+booking history.
+
+Scoring matches SimplePreferenceEngine.recommend_for_user, vectorized over
+the catalog snapshot. The top RECOMMENDATIONS_STORED halls are written to
+user_recommendations, and the endpoint reads them back with one indexed
+range query. Only a stale (or missing) profile is rescored on read.
+
+The batch job rebuilds profiles and recommendations for every active user
+(booked within RECOMMENDATION_ACTIVE_DAYS) in chunks, optionally across
+processes. Run it from the backend directory:
+
+    python personalization.py --workers 4 --chunk-size 1000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import create_engine, delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from catalog import CatalogSnapshot, get_snapshot
+from events import BookingCreated, subscribe
+from facilities import facility_set
+from geo import EARTH_RADIUS_KM, PROXIMITY_HALF_KM
+from lazy_imports import lazy_module
+from models import Booking, Hall, UserProfile, UserRecommendation
+
+np = lazy_module("numpy")
+
+RECOMMENDATIONS_STORED = int(os.getenv("RECOMMENDATIONS_STORED", 20))
+RECOMMENDATION_ACTIVE_DAYS = int(os.getenv("RECOMMENDATION_ACTIVE_DAYS", 365))
+
+
+class Preferences(NamedTuple):
+    preferred_location: Optional[str]
+    center: Optional[Tuple[float, float]]
+    common_facilities: List[str]
+    avg_capacity: float
+
+
+# ---------- Profiles ----------
+
+def new_profile(user_id: int) -> UserProfile:
+    return UserProfile(user_id=user_id, hall_ids="[]", location_counts="{}", facility_counts="{}",
+                       capacity_sum=0.0, latitude_sum=0.0, longitude_sum=0.0, located=0, stale=True)
+
+
+def add_halls(profile: UserProfile, halls: Iterable) -> int:
+    """Fold booked halls into the profile, each at most once; returns how many were new"""
+    hall_ids = json.loads(profile.hall_ids)
+    seen = set(hall_ids)
+    locations = json.loads(profile.location_counts)
+    facilities = json.loads(profile.facility_counts)
+    added = 0
+    for hall in halls:
+        if hall.id in seen:
+            continue
+        seen.add(hall.id)
+        hall_ids.append(hall.id)
+        added += 1
+        if hall.location:
+            locations[hall.location] = locations.get(hall.location, 0) + 1
+        for slug in sorted(facility_set(hall.facilities)):
+            facilities[slug] = facilities.get(slug, 0) + 1
+        profile.capacity_sum += hall.capacity or 0
+        if hall.latitude is not None and hall.longitude is not None:
+            profile.latitude_sum += hall.latitude
+            profile.longitude_sum += hall.longitude
+            profile.located += 1
+    if added:
+        profile.hall_ids = json.dumps(hall_ids)
+        profile.location_counts = json.dumps(locations)
+        profile.facility_counts = json.dumps(facilities)
+        profile.updated_at = datetime.utcnow()
+    return added
+
+
+def build_profile(user_id: int, booked_hall_ids: Iterable[int], snapshot: CatalogSnapshot) -> UserProfile:
+    profile = new_profile(user_id)
+    add_halls(profile, [hall for hall in map(snapshot.get, booked_hall_ids) if hall is not None])
+    return profile
+
+
+def preferences(profile: UserProfile) -> Optional[Preferences]:
+    halls = len(json.loads(profile.hall_ids))
+    if not halls:
+        return None
+    locations = json.loads(profile.location_counts)
+    facilities = json.loads(profile.facility_counts)
+    return Preferences(
+        preferred_location=max(locations.items(), key=lambda item: item[1])[0] if locations else None,
+        center=(profile.latitude_sum / profile.located, profile.longitude_sum / profile.located)
+        if profile.located else None,
+        # Ties keep first-seen order, as Counter.most_common does
+        common_facilities=[slug for slug, _ in sorted(facilities.items(), key=lambda item: -item[1])[:5]],
+        avg_capacity=profile.capacity_sum / halls,
+    )
+
+
+def record_booking(db: Session, user_id: int, hall):
+    """Fold a new booking into the user's profile; call before db.commit()"""
+    profile = db.get(UserProfile, user_id)
+    # Without a profile there is nothing to update: the first read builds it from history
+    if profile is not None and add_halls(profile, [hall]):
+        profile.stale = True
+
+
+@subscribe(BookingCreated, phase="transaction")
+def _on_booking_created(db: Session, event: BookingCreated):
+    # Fold the hall into the user's preference profile; recommendations are rescored on next read
+    record_booking(db, event.user_id, db.get(Hall, event.hall_id))
+
+
+# ---------- Scoring ----------
+
+def _haversine_km(lat: float, lng: float, lats, lngs):
+    phi1, phi2 = np.radians(lat), np.radians(lats)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def score_catalog(snapshot: CatalogSnapshot, prefs: Preferences):
+    """Score per snapshot position, as SimplePreferenceEngine.recommend_for_user computes it"""
+    scores = np.zeros(len(snapshot.records))
+    location_match = np.zeros(len(snapshot.records), dtype=bool)
+    if prefs.preferred_location:
+        location_match = np.isin(snapshot.location_codes, snapshot.locations.equal(prefs.preferred_location))
+
+    if prefs.center:
+        located = ~np.isnan(snapshot.latitude)
+        distances = _haversine_km(prefs.center[0], prefs.center[1], snapshot.latitude[located],
+                                  snapshot.longitude[located])
+        scores[located] += 3 * 0.5 ** (distances / PROXIMITY_HALF_KM)
+        scores[~located & location_match] += 3
+    else:
+        scores[location_match] += 3
+
+    for slug in prefs.common_facilities:
+        scores += snapshot.facility_mask(slug)
+
+    if prefs.avg_capacity:
+        with np.errstate(invalid="ignore"):
+            ratio = snapshot.capacity / prefs.avg_capacity
+            scores[(ratio >= 0.8) & (ratio <= 1.2)] += 2
+    return scores
+
+
+def top_halls(snapshot: CatalogSnapshot, prefs: Preferences, n: int) -> List[Tuple[int, float]]:
+    """(hall id, score) of the n best available halls with a positive score; ties by id"""
+    scores = score_catalog(snapshot, prefs)
+    candidates = np.flatnonzero(snapshot.live & snapshot.available & (scores > 0))
+    if len(candidates) > n:
+        # Only halls scoring at least the nth best can make the cut; keep their ties for the id order
+        cutoff = np.partition(scores[candidates], len(candidates) - n)[len(candidates) - n]
+        candidates = candidates[scores[candidates] >= cutoff]
+    order = candidates[np.lexsort((snapshot.ids[candidates], -scores[candidates]))][:n]
+    return [(int(snapshot.ids[position]), float(scores[position])) for position in order]
+
+
+def _recommendation_rows(user_id: int, ranked: List[Tuple[int, float]], now: datetime) -> List[dict]:
+    return [{"user_id": user_id, "rank": rank, "hall_id": hall_id, "score": score, "computed_at": now}
+            for rank, (hall_id, score) in enumerate(ranked)]
+
+
+# ---------- Online path ----------
+
+def refresh_user(db: Session, user_id: int):
+    """Rescore one user from their profile (built from history the first time) and store the result"""
+    snapshot = get_snapshot(db)
+    profile = db.get(UserProfile, user_id)
+    if profile is None:
+        booked = [hall_id for (hall_id,) in db.query(Booking.hall_id).filter(Booking.user_id == user_id).distinct()]
+        profile = build_profile(user_id, sorted(booked), snapshot)
+        db.add(profile)
+
+    prefs = preferences(profile)
+    ranked = top_halls(snapshot, prefs, RECOMMENDATIONS_STORED) if prefs else []
+    db.query(UserRecommendation).filter(UserRecommendation.user_id == user_id).delete(synchronize_session=False)
+    rows = _recommendation_rows(user_id, ranked, datetime.utcnow())
+    if rows:
+        db.execute(insert(UserRecommendation.__table__), rows)
+    profile.stale = False
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request stored the same user's recommendations first
+        db.rollback()
+
+
+def booked_hall_ids(db: Session, user_id: int) -> List[int]:
+    """Distinct halls the user booked, from the profile when there is one"""
+    profile = db.get(UserProfile, user_id)
+    if profile is not None:
+        return json.loads(profile.hall_ids)
+    return [hall_id for (hall_id,) in db.query(Booking.hall_id).filter(Booking.user_id == user_id).distinct()]
+
+
+def recommended_hall_ids(db: Session, user_id: int, top_n: int) -> List[int]:
+    profile = db.get(UserProfile, user_id)
+    if profile is None or profile.stale:
+        refresh_user(db, user_id)
+    return [hall_id for (hall_id,) in db.query(UserRecommendation.hall_id)
+            .filter(UserRecommendation.user_id == user_id)
+            .order_by(UserRecommendation.rank).limit(top_n)]
+
+
+# ---------- Batch job ----------
+
+def active_user_ids(engine, active_days: int = RECOMMENDATION_ACTIVE_DAYS) -> List[int]:
+    since = datetime.utcnow() - timedelta(days=active_days)
+    with engine.connect() as conn:
+        return [user_id for (user_id,) in conn.execute(
+            select(Booking.user_id).where(Booking.created_at >= since).distinct().order_by(Booking.user_id))]
+
+
+def process_chunk(engine, user_ids: List[int], top_n: int = RECOMMENDATIONS_STORED) -> int:
+    """Rebuild profiles and recommendations for a chunk of users in one transaction"""
+    with Session(engine) as db:
+        snapshot = get_snapshot(db)
+        booked: Dict[int, set] = {user_id: set() for user_id in user_ids}
+        for user_id, hall_id in db.execute(
+                select(Booking.user_id, Booking.hall_id).where(Booking.user_id.in_(user_ids))):
+            booked[user_id].add(hall_id)
+
+        now = datetime.utcnow()
+        profiles, recommendations = [], []
+        for user_id in user_ids:
+            profile = build_profile(user_id, sorted(booked[user_id]), snapshot)
+            profile.stale = False
+            prefs = preferences(profile)
+            recommendations.extend(_recommendation_rows(user_id, top_halls(snapshot, prefs, top_n) if prefs else [], now))
+            profiles.append({column.name: getattr(profile, column.name) for column in UserProfile.__table__.columns})
+
+        db.execute(delete(UserRecommendation.__table__).where(UserRecommendation.user_id.in_(user_ids)))
+        db.execute(delete(UserProfile.__table__).where(UserProfile.user_id.in_(user_ids)))
+        db.execute(insert(UserProfile.__table__), profiles)
+        if recommendations:
+            db.execute(insert(UserRecommendation.__table__), recommendations)
+        db.commit()
+    return len(user_ids)
+
+
+_worker_engines: Dict[str, object] = {}
+
+
+def _process_chunk_in_worker(database_url: str, user_ids: List[int], top_n: int) -> int:
+    # One engine (and so one catalog snapshot) per worker process, reused across chunks
+    engine = _worker_engines.get(database_url)
+    if engine is None:
+        engine = _worker_engines[database_url] = create_engine(database_url)
+    return process_chunk(engine, user_ids, top_n)
+
+
+def run_batch(engine, top_n: int = RECOMMENDATIONS_STORED, chunk_size: int = 1000, workers: int = 1,
+              active_days: int = RECOMMENDATION_ACTIVE_DAYS, log=print) -> int:
+    """Recompute every active user's recommendations; returns the number of users processed"""
+    started = time.perf_counter()
+    user_ids = active_user_ids(engine, active_days)
+    chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
+    log(f"Recomputing recommendations for {len(user_ids):,} users in {len(chunks)} chunks ({workers} workers)")
+
+    done = 0
+    if workers <= 1:
+        for chunk in chunks:
+            done += process_chunk(engine, chunk, top_n)
+    else:
+        url = engine.url.render_as_string(hide_password=False)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for processed in pool.map(_process_chunk_in_worker, [url] * len(chunks), chunks, [top_n] * len(chunks)):
+                done += processed
+                log(f"  {done:,}/{len(user_ids):,} users ({done / (time.perf_counter() - started):,.0f}/s)")
+    log(f"Done: {done:,} users in {time.perf_counter() - started:.1f}s")
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL from the environment / .env")
+    parser.add_argument("--top-n", type=int, default=RECOMMENDATIONS_STORED)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--active-days", type=int, default=RECOMMENDATION_ACTIVE_DAYS)
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from database import engine
+    run_batch(engine, top_n=args.top_n, chunk_size=args.chunk_size, workers=args.workers,
+              active_days=args.active_days)
+
+
+if __name__ == "__main__":
+    main()
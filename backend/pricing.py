@@ -0,0 +1,135 @@
+# ==================== pricing.py ====================
+"""
+Hourly prices per hall and exact quotes for bookings of any length.
+
+A hall's week is 168 hour slots (Monday 00:00 local first), each priced
+at the base price scaled by the hall's demand multiplier for that slot
+(see demand_forecast). While there is no booking history at all, every
+slot is the base price. The cached form is the prefix sum of those
+prices, so the cost of any interval is two lookups:
+
+    cost(start, end) = F(end) - F(start)
+    F(t) = weeks * week_price + prefix[slot] + fraction * price[slot]
+
+where t is in local hours since the week epoch. Bookings spanning hours,
+days, weekends or several weeks are priced exactly, and partial hours
+count partially. Each elapsed hour is charged at the price of the local
+clock hour it falls in, as in the demand curves. Across a daylight saving
+change the booking is split where the UTC offset changes, so a booking is
+always charged for its real duration: the repeated autumn hour is charged
+twice, the skipped spring hour not at all.
+
+Curves are cached in the "prices" namespace per hall, tagged with the hall
+version they were built at. A reader whose hall has another version builds
+its own curve, so a copy refilled from a stale hall cannot outlive the next
+fresh read. Curves are invalidated when the hall's base price changes, and
+when its demand does.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from cache import cache
+from demand_forecast import DEMAND_CACHE_TTL, HOURS_PER_WEEK, WEEK_EPOCH, hall_multipliers
+from events import HallChanged, subscribe
+from timeseries import get_timezone
+
+
+# UTC offsets change at most every few months; scan in steps shorter than that
+_OFFSET_SCAN_STEP = timedelta(days=7)
+
+
+def _utc(moment: datetime) -> datetime:
+    """Aware UTC moment; naive moments are UTC, as bookings are stored"""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def offset_spans(start: datetime, end: datetime) -> List[Tuple[datetime, datetime, timedelta]]:
+    """(start, end, UTC offset) pieces of [start, end) over which the local offset is constant"""
+    tz = get_timezone()
+    start, end = _utc(start), _utc(end)
+    spans = []
+    while start < end:
+        offset = start.astimezone(tz).utcoffset()
+        stop = min(end, start + _OFFSET_SCAN_STEP)
+        if stop.astimezone(tz).utcoffset() != offset:
+            # Bisect down to the second; transitions fall on whole seconds
+            low, high = start, stop
+            while high - low > timedelta(seconds=1):
+                middle = low + (high - low) / 2
+                if middle.astimezone(tz).utcoffset() == offset:
+                    low = middle
+                else:
+                    high = middle
+            stop = low.replace(microsecond=0) + timedelta(seconds=1)
+        spans.append((start, stop, offset))
+        start = stop
+    return spans
+
+
+def local_hours(moment: datetime, offset: timedelta) -> float:
+    """Local clock hours since the week epoch of a UTC moment, at the given UTC offset"""
+    return ((_utc(moment) + offset).replace(tzinfo=None) - WEEK_EPOCH) / timedelta(hours=1)
+
+
+class PriceCurve(NamedTuple):
+    prefix: Tuple[float, ...]  # prefix[slot] = price of the week's slots before slot, 169 entries
+
+    @classmethod
+    def from_prices(cls, prices: Sequence[float]) -> "PriceCurve":
+        prefix = [0.0]
+        for price in prices:
+            prefix.append(prefix[-1] + price)
+        return cls(tuple(prefix))
+
+    def price(self, slot: int) -> float:
+        return self.prefix[slot + 1] - self.prefix[slot]
+
+    def cost_until(self, hours: float) -> float:
+        """Price of every hour from the week epoch up to `hours`"""
+        weeks, offset = divmod(hours, HOURS_PER_WEEK)
+        slot = int(offset)
+        return weeks * self.prefix[-1] + self.prefix[slot] + (offset - slot) * self.price(slot)
+
+    def quote(self, start: datetime, end: datetime) -> float:
+        return round(sum(self.cost_until(local_hours(stop, offset)) - self.cost_until(local_hours(begin, offset))
+                         for begin, stop, offset in offset_spans(start, end)), 2)
+
+
+def weekly_prices(base_price: float, multipliers=None):
+    """The 168 hourly prices of a hall"""
+    if multipliers is None:
+        return [base_price] * HOURS_PER_WEEK
+    return [base_price * multiplier for multiplier in multipliers]
+
+
+def price_curve(db: Session, hall) -> PriceCurve:
+    """Cached price curve of a hall (a Hall or a catalog HallRecord), built at the hall's version"""
+    def load():
+        prices = weekly_prices(hall.price_per_hour or 0, hall_multipliers(db, hall.id))
+        return {"version": hall.version, "prefix": PriceCurve.from_prices(prices).prefix}
+
+    cached = cache.get_or_load("prices", hall.id, load, ttl=DEMAND_CACHE_TTL)
+    cached_version = cached.get("version") if isinstance(cached, dict) else None  # untagged: older format
+    if cached_version != hall.version:
+        # Built from another copy of the hall (e.g. a stale one that refilled the cache
+        # right after the price change was invalidated); never keep the older of the two
+        fresh = load()
+        if (hall.version or 0) > (cached_version or 0):
+            cache.set("prices", hall.id, fresh, ttl=DEMAND_CACHE_TTL)
+        cached = fresh
+    return PriceCurve(tuple(cached["prefix"]))
+
+
+@subscribe(HallChanged)
+def _drop_price_curve(event: HallChanged):
+    if event.deleted or "price_per_hour" in event.changed:
+        cache.invalidate("prices", event.hall_id)
+
+
+def quote_booking(db: Session, hall, start: datetime, end: datetime) -> float:
+    """Exact price of booking the hall from start to end"""
+    return price_curve(db, hall).quote(start, end)
@@ -0,0 +1,161 @@
+# ==================== query_profiler.py ====================
+"""
+SQL query profiler and N+1 detector.
+
+When QUERY_PROFILING=1, every statement run on the profiled engine (the one
+behind database.get_db) is captured with its duration and normalized into a
+fingerprint (literals and IN lists collapsed). A fingerprint that repeats
+N1_THRESHOLD times within one request is flagged as a likely N+1. The
+per-request summary is returned in the X-Query-Profile header and N+1
+suspects are logged.
+
+Tests use profile_queries() (or the query_budget fixture) to capture
+everything an engine runs inside a block, regardless of thread.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger("query_profiler")
+
+PROFILING_ENABLED = os.getenv("QUERY_PROFILING", "0").lower() in ("1", "true", "yes")
+N1_THRESHOLD = int(os.getenv("QUERY_PROFILING_N1_THRESHOLD", 5))
+PROFILE_HEADER = "X-Query-Profile"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement shape with literals, placeholders and IN lists collapsed"""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("IN (?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryProfile:
+    def __init__(self, n1_threshold: int = N1_THRESHOLD):
+        self.n1_threshold = n1_threshold
+        self.statements = []  # (fingerprint, statement, seconds)
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float):
+        with self._lock:
+            self.statements.append((fingerprint(statement), statement, seconds))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_time(self) -> float:
+        return sum(seconds for _, _, seconds in self.statements)
+
+    def repeated(self) -> Counter:
+        return Counter(shape for shape, _, _ in self.statements)
+
+    def n_plus_one(self) -> List[tuple]:
+        """(fingerprint, count) pairs repeated at least n1_threshold times"""
+        return [(shape, count) for shape, count in self.repeated().most_common() if count >= self.n1_threshold]
+
+    def summary(self) -> str:
+        return (f"queries={self.count}; time_ms={self.total_time * 1000:.1f}; "
+                f"distinct={len(self.repeated())}; n_plus_one={len(self.n_plus_one())}")
+
+    def report(self, limit: int = 10) -> str:
+        lines = [self.summary()]
+        for shape, count in self.repeated().most_common(limit):
+            flag = "  <-- N+1" if count >= self.n1_threshold else ""
+            lines.append(f"  {count:>4}x {shape}{flag}")
+        return "\n".join(lines)
+
+
+_request_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+# Profiles capturing every statement on the engine, whatever thread it runs on
+_global_profiles: List[QueryProfile] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["profiler_started"].pop()
+    profile = _request_profile.get()
+    if profile is not None:
+        profile.record(statement, seconds)
+    for collector in _global_profiles:
+        collector.record(statement, seconds)
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("profiler_started"):
+        connection.info["profiler_started"].pop()
+
+
+def install_profiler(engine):
+    """Attach the capture listeners to an engine (idempotent)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+@contextmanager
+def profile_queries(n1_threshold: int = N1_THRESHOLD):
+    """Capture every statement run on profiled engines inside the block"""
+    profile = QueryProfile(n1_threshold)
+    _global_profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        _global_profiles.remove(profile)
+
+
+class QueryProfilerMiddleware:
+    """Profiles each request and reports it in the X-Query-Profile header.
+
+    The header is written when the response starts, so statements issued
+    while a streaming body is sent are logged but not counted in it.
+    """
+
+    def __init__(self, app: ASGIApp, n1_threshold: int = N1_THRESHOLD):
+        self.app = app
+        self.n1_threshold = n1_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile(self.n1_threshold)
+        token = _request_profile.set(profile)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(raw=message["headers"])[PROFILE_HEADER] = profile.summary()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_profile.reset(token)
+            if profile.n_plus_one():
+                logger.warning("Possible N+1 on %s %s\n%s", scope["method"], scope["path"], profile.report())
@@ -0,0 +1,194 @@
+# ==================== rate_limit.py ====================
+"""
+Token-bucket rate limiting per route group.
+
+Each (group, client) pair owns one bucket of `burst` tokens refilled at
+`rate` tokens per second. A client is the authenticated user when the
+request carries a valid bearer token, otherwise its IP address. A bucket is
+two floats, and one that has refilled completely carries no information, so
+the in-memory backend evicts it once it goes idle. Memory is O(active keys).
+
+Buckets live in a backend. InMemoryBackend is the reference implementation
+and is per process. A shared store (e.g. Redis running the same refill
+arithmetic in a Lua script) can be plugged in with set_backend() so that all
+workers enforce one limit.
+
+Limits are read from the environment as "<count>/<second|minute|hour>",
+e.g. RATE_LIMIT_LOGIN="10/minute". RATE_LIMIT_ENABLED=0 turns limiting off.
+"""
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional
+
+from fastapi import HTTPException, Request, status
+from jose import JWTError, jwt
+
+from auth import ALGORITHM, SECRET_KEY
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1").lower() in ("1", "true", "yes")
+# Only trust X-Forwarded-For when a known proxy sits in front of the app
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0").lower() in ("1", "true", "yes")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+class Limit(NamedTuple):
+    rate: float  # tokens per second
+    burst: float  # bucket size
+
+
+def parse_limit(value: str) -> Limit:
+    count, _, period = value.partition("/")
+    seconds = _PERIODS.get(period.strip().lower())
+    if seconds is None or not count.strip().isdigit():
+        raise ValueError(f"Invalid rate limit {value!r}, expected e.g. '10/minute'")
+    return Limit(rate=int(count) / seconds, burst=float(count))
+
+
+RATE_LIMITS: Dict[str, Limit] = {
+    # Per IP: bcrypt makes every attempt expensive
+    "login": parse_limit(os.getenv("RATE_LIMIT_LOGIN", "10/minute")),
+    # Failed attempts per account (known or not), so a distributed guesser still hits a wall
+    # while requests that only name an email cannot lock its owner out
+    "login_account": parse_limit(os.getenv("RATE_LIMIT_LOGIN_ACCOUNT", "5/minute")),
+    "chatbot": parse_limit(os.getenv("RATE_LIMIT_CHATBOT", "30/minute")),
+    "ai": parse_limit(os.getenv("RATE_LIMIT_AI", "60/minute")),
+}
+
+
+class RateLimitBackend(ABC):
+    """Bucket storage; take() must be atomic per key"""
+
+    @abstractmethod
+    def take(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        """Spend `cost` tokens; returns 0 if allowed, else seconds until it would be"""
+
+    @abstractmethod
+    def peek(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        """Like take() but spends nothing"""
+
+    @abstractmethod
+    def reset(self):
+        """Forget every bucket"""
+
+
+class InMemoryBackend(RateLimitBackend):
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> (tokens, updated_at, full_at); least recently used first
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _evict(self, now: float):
+        # Refilled buckets are the same as absent ones; drop them from the LRU end
+        while self._buckets:
+            key, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now and len(self._buckets) < self.max_keys:
+                break
+            del self._buckets[key]
+
+    @staticmethod
+    def _tokens(entry: Optional[tuple], limit: Limit, now: float) -> float:
+        if entry is None:
+            return limit.burst
+        return min(limit.burst, entry[0] + (now - entry[1]) * limit.rate)
+
+    def take(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        now = self.clock()
+        with self._lock:
+            self._evict(now)
+            tokens = self._tokens(self._buckets.pop(key, None), limit, now)
+
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / limit.rate
+            self._buckets[key] = (tokens, now, now + (limit.burst - tokens) / limit.rate)
+            return wait
+
+    def peek(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        now = self.clock()
+        with self._lock:
+            tokens = self._tokens(self._buckets.get(key), limit, now)
+        return max(0.0, (cost - tokens) / limit.rate)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, Limit], backend: RateLimitBackend, enabled: bool = True):
+        self.limits = limits
+        self.backend = backend
+        self.enabled = enabled
+
+    def check(self, group: str, client: str, consume: bool = True):
+        """Raise 429 when the client's bucket is empty; consume=False leaves charging to charge()"""
+        if not self.enabled:
+            return
+        key, limit = f"{group}:{client}", self.limits[group]
+        wait = self.backend.take(key, limit) if consume else self.backend.peek(key, limit)
+        if wait > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please slow down",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+    def charge(self, group: str, client: str):
+        """Spend a token without rejecting, e.g. for an attempt that already failed"""
+        if self.enabled:
+            self.backend.take(f"{group}:{client}", self.limits[group])
+
+    def reset(self):
+        self.backend.reset()
+
+
+limiter = RateLimiter(RATE_LIMITS, InMemoryBackend(), enabled=RATE_LIMIT_ENABLED)
+
+
+def set_backend(backend: RateLimitBackend):
+    """Swap the bucket store, e.g. for one shared by all workers"""
+    limiter.backend = backend
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def client_key(request: Request) -> str:
+    """user:<email> for a valid bearer token (no DB lookup), else ip:<address>"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            subject: Optional[str] = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+        except JWTError:
+            subject = None
+        if subject:
+            return f"user:{subject}"
+    return f"ip:{client_ip(request)}"
+
+
+def rate_limit(group: str):
+    """Dependency limiting a route (or a whole router) under the given group"""
+    if group not in RATE_LIMITS:
+        raise ValueError(f"Unknown rate limit group {group!r}")
+
+    def dependency(request: Request):
+        limiter.check(group, client_key(request))
+    return dependency
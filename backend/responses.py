@@ -0,0 +1,35 @@
+# ==================== responses.py ====================
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library encoder
+    orjson = None
+
+
+def _default(obj: Any):
+    # Endpoints that hand back models directly (no response_model) are dumped by pydantic-core
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: orjson rendering of the already-validated payload.
+
+    FastAPI validates and dumps response_model data with pydantic-core, so the
+    only work left here is encoding plain Python values, which orjson does in
+    native code without the intermediate str of json.dumps.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
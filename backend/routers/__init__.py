@@ -6,6 +6,7 @@ from .owner import router as owner_router
 from .ai_recommendations import router as ai_recommendations_router
 from .ai_chatbot import router as ai_chatbot_router
 from .ai_pricing import router as ai_pricing_router
+from .analytics import router as analytics_router
 
 __all__ = [
     "auth_router", 
@@ -14,5 +15,6 @@ __all__ = [
     "owner_router",
     "ai_recommendations_router",
     "ai_chatbot_router", 
-    "ai_pricing_router"
+    "ai_pricing_router",
+    "analytics_router"
 ]
\ No newline at end of file
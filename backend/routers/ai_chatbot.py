@@ -1,10 +1,12 @@
 # ==================== routers/ai_chatbot.py ====================
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from rate_limit import rate_limit
 
-router = APIRouter(prefix="/api/chatbot", tags=["AI Chatbot"])
+# Unauthenticated, so limited per IP
+router = APIRouter(prefix="/api/chatbot", tags=["AI Chatbot"], dependencies=[Depends(rate_limit("chatbot"))])
 
 class ChatMessage(BaseModel):
     message: str
@@ -1,35 +1,29 @@
 # ==================== routers/ai_engines.py ====================
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
+from hall_embeddings import HallIndex
+from lazy_imports import lazy_module
+
+# scikit-learn / pandas take seconds to import; load them on first use
+sklearn_text = lazy_module("sklearn.feature_extraction.text")
+sklearn_pairwise = lazy_module("sklearn.metrics.pairwise")
 
 class HallRecommendationEngine:
     def __init__(self):
-        self.vectorizer = TfidfVectorizer(stop_words='english')
-        self.hall_features = None
+        self.hall_index = None
         
     def train(self, halls_data):
-        """Train the recommendation model with hall data"""
-        features_text = halls_data.apply(
-            lambda x: f"{x['name']} {x['description']} {x['facilities']} {x['location']}", 
-            axis=1
-        )
-        self.hall_features = self.vectorizer.fit_transform(features_text)
+        """Embed every hall (TF-IDF + SVD) and index the vectors for nearest-neighbour search"""
+        self.hall_index = HallIndex.build(halls_data.to_dict("records"))
+        
+    def add_halls(self, halls_data):
+        """Index new or edited halls without retraining"""
+        self.hall_index.add_halls(halls_data.to_dict("records"))
         
     def get_similar_halls(self, hall_id, halls_data, top_n=5):
         """Get similar halls based on content"""
-        if self.hall_features is None:
+        if self.hall_index is None:
             self.train(halls_data)
             
-        hall_idx = halls_data[halls_data['id'] == hall_id].index[0]
-        similarity_scores = cosine_similarity(
-            self.hall_features[hall_idx], 
-            self.hall_features
-        ).flatten()
-        
-        similar_indices = similarity_scores.argsort()[-top_n-1:-1][::-1]
-        return halls_data.iloc[similar_indices]['id'].tolist()
+        return [similar_id for similar_id, _ in self.hall_index.similar(hall_id, top_n)]
 
 class UserPreferenceEngine:
     def __init__(self):
@@ -56,7 +50,7 @@ class UserPreferenceEngine:
         profile = self.user_profiles[user_id]
         query_text = f"{profile['facilities']} {profile['locations']}"
         
-        vectorizer = TfidfVectorizer(stop_words='english')
+        vectorizer = sklearn_text.TfidfVectorizer(stop_words='english')
         hall_features = vectorizer.fit_transform(
             halls_data.apply(
                 lambda x: f"{x['facilities']} {x['location']}", 
@@ -65,7 +59,7 @@ class UserPreferenceEngine:
         )
         
         query_vector = vectorizer.transform([query_text])
-        similarity_scores = cosine_similarity(query_vector, hall_features).flatten()
+        similarity_scores = sklearn_pairwise.cosine_similarity(query_vector, hall_features).flatten()
         
         recommended_indices = similarity_scores.argsort()[-top_n:][::-1]
         return halls_data.iloc[recommended_indices]['id'].tolist()
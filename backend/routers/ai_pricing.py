@@ -1,13 +1,19 @@
 # ==================== routers/ai_pricing.py ====================
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 from database import get_db
 from auth import get_current_user
-from models import User, Hall, Booking
+from models import User
 from pydantic import BaseModel
+from typing import Optional
+from rate_limit import rate_limit
+from catalog import get_snapshot
+from demand_forecast import hall_multipliers
+from pricing import PriceCurve, price_curve
+from timeseries import local_time
 
-router = APIRouter(prefix="/api/ai", tags=["AI Pricing"])
+router = APIRouter(prefix="/api/ai", tags=["AI Pricing"], dependencies=[Depends(rate_limit("ai"))])
 
 class PriceSuggestionResponse(BaseModel):
     current_price: float
@@ -19,16 +25,27 @@ class SimplePriceOptimizer:
     def __init__(self):
         pass
     
-    def calculate_suggested_price(self, base_price: float, event_datetime: datetime, capacity: int) -> float:
-        """Calculate suggested price based on simple rules"""
+    def calculate_suggested_price(self, base_price: float, event_datetime: datetime, capacity: int,
+                                  curve: Optional[PriceCurve] = None, duration_hours: float = 1) -> float:
+        """Hourly price from the hall's demand-priced curve, or simple rules without history.
+
+        With a curve this is exactly what create_booking charges per hour for the
+        event. Naive datetimes are UTC, as bookings are stored; the rules look at the
+        local clock.
+        """
+        if curve is not None:
+            hours = max(1, duration_hours)
+            return curve.quote(event_datetime, event_datetime + timedelta(hours=hours)) / hours
+
+        local = local_time(event_datetime)
         # Weekend premium (20% increase)
-        if event_datetime.weekday() >= 5:  # Saturday or Sunday
+        if local.weekday() >= 5:  # Saturday or Sunday
             multiplier = 1.2
         # Evening premium (15% increase for events after 6 PM)
-        elif event_datetime.hour >= 18:
+        elif local.hour >= 18:
             multiplier = 1.15
         # Afternoon (standard)
-        elif event_datetime.hour >= 12:
+        elif local.hour >= 12:
             multiplier = 1.0
         # Morning discount (10% discount)
         else:
@@ -61,18 +78,21 @@ def get_price_suggestion(
     """Get AI-powered price suggestion for a hall"""
     try:
         # Get the hall
-        hall = db.query(Hall).filter(Hall.id == hall_id).first()
+        hall = get_snapshot(db).get(hall_id)
         if not hall:
             raise HTTPException(status_code=404, detail="Hall not found")
         
         # Parse datetime
         event_dt = datetime.fromisoformat(event_datetime.replace('Z', '+00:00'))
         
-        # Get price suggestion
+        # Get price suggestion; with demand history it is the curve bookings are charged from
+        curve = price_curve(db, hall) if hall_multipliers(db, hall_id) is not None else None
         suggested_price = price_optimizer.calculate_suggested_price(
             hall.price_per_hour, 
             event_dt, 
-            hall.capacity or 100
+            hall.capacity or 100,
+            curve=curve,
+            duration_hours=duration_hours
         )
         
         # Determine reason for suggestion
@@ -89,5 +109,7 @@ def get_price_suggestion(
             reason=reason
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating price suggestion: {str(e)}")
\ No newline at end of file
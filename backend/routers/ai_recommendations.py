@@ -4,9 +4,18 @@ from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
 from auth import get_current_user
-from models import User, Hall, Booking
+from models import User, Hall
 from schemas import HallResponse
+from rate_limit import rate_limit
+from cache import cache
+from catalog import get_snapshot
+from facilities import facility_set
+import collaborative
+import geo
+import hall_embeddings
+import personalization
 import random
+from itertools import islice
 
 class SimpleRecommendationEngine:
     def __init__(self):
@@ -15,12 +24,12 @@ class SimpleRecommendationEngine:
     def calculate_similarity(self, hall1, hall2):
         score = 0
         
-        if hall1.location and hall2.location:
-            loc1, loc2 = hall1.location.lower(), hall2.location.lower()
-            if loc1 == loc2:
-                score += 3
-            elif any(area in loc1 and area in loc2 for area in ['downtown', 'uptown', 'suburb', 'center']):
-                score += 1
+        # Real distance when both halls are on the map, else the same location text
+        distance = geo.hall_distance_km(hall1, hall2)
+        if distance is not None:
+            score += geo.proximity_score(distance)
+        elif hall1.location and hall2.location and hall1.location.lower() == hall2.location.lower():
+            score += 3
         
         if hall1.price_per_hour and hall2.price_per_hour:
             price1, price2 = hall1.price_per_hour, hall2.price_per_hour
@@ -35,9 +44,7 @@ class SimpleRecommendationEngine:
                 score += 1
         
         if hall1.facilities and hall2.facilities:
-            facilities1 = set(f.strip().lower() for f in hall1.facilities.split(','))
-            facilities2 = set(f.strip().lower() for f in hall2.facilities.split(','))
-            common_facilities = facilities1.intersection(facilities2)
+            common_facilities = facility_set(hall1.facilities) & facility_set(hall2.facilities)
             score += len(common_facilities) * 0.5
         
         return score
@@ -80,14 +87,15 @@ class SimplePreferenceEngine:
         all_facilities = []
         for hall in user_halls:
             if hall.facilities:
-                facilities = [f.strip().lower() for f in hall.facilities.split(',')]
-                all_facilities.extend(facilities)
+                all_facilities.extend(sorted(facility_set(hall.facilities)))
         
         from collections import Counter
         common_facilities = [facility for facility, count in Counter(all_facilities).most_common(5)]
         
         self.user_preferences[user_id] = {
             'preferred_location': preferred_location,
+            'center': geo.centroid([(h.latitude, h.longitude) for h in user_halls
+                                    if h.latitude is not None and h.longitude is not None]),
             'common_facilities': common_facilities,
             'avg_capacity': sum(h.capacity or 0 for h in user_halls) / len(user_halls) if user_halls else 100
         }
@@ -102,13 +110,15 @@ class SimplePreferenceEngine:
         for hall in halls:
             score = 0
             
-            if preferences['preferred_location'] and hall.location:
+            center = preferences['center']
+            if center and hall.latitude is not None and hall.longitude is not None:
+                score += geo.proximity_score(geo.haversine_km(center[0], center[1], hall.latitude, hall.longitude))
+            elif preferences['preferred_location'] and hall.location:
                 if hall.location.lower() == preferences['preferred_location'].lower():
                     score += 3
             
             if preferences['common_facilities'] and hall.facilities:
-                hall_facilities = [f.strip().lower() for f in hall.facilities.split(',')]
-                common_count = len(set(preferences['common_facilities']).intersection(hall_facilities))
+                common_count = len(facility_set(hall.facilities).intersection(preferences['common_facilities']))
                 score += common_count
             
             if hall.capacity and preferences['avg_capacity']:
@@ -127,6 +137,10 @@ class SimplePreferenceEngine:
         return recommended
     
     def get_popular_halls(self, halls, top_n=5):
+        # Most distinct customers first once a collaborative model is trained
+        model = collaborative.get_model()
+        if model is not None and halls:
+            return [halls[position] for position in model.most_popular([hall.id for hall in halls], top_n)]
         if len(halls) <= top_n:
             return halls
         return random.sample(halls, top_n)
@@ -134,7 +148,17 @@ class SimplePreferenceEngine:
 recommendation_engine = SimpleRecommendationEngine()
 preference_engine = SimplePreferenceEngine()
 
-router = APIRouter(prefix="/api/ai", tags=["AI Recommendations"])
+router = APIRouter(prefix="/api/ai", tags=["AI Recommendations"], dependencies=[Depends(rate_limit("ai"))])
+
+# Similar halls come from the embedding index, or a scan of the whole catalog
+# without one; the shared cache keeps only the resulting hall ids, invalidated
+# whenever the catalog changes
+RECOMMENDATION_TTL = 600
+
+
+def _halls_by_ids(db: Session, hall_ids):
+    snapshot = get_snapshot(db)
+    return [hall for hall in map(snapshot.get, hall_ids) if hall is not None]
 
 @router.get("/similar/{hall_id}", response_model=List[HallResponse])
 def get_similar_halls(
@@ -143,22 +167,39 @@ def get_similar_halls(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    try:
-        halls = db.query(Hall).filter(Hall.available == True).all()
+    def compute():
+        # Scored over the catalog snapshot's rows instead of freshly built ORM objects
+        snapshot = get_snapshot(db)
+        halls = snapshot.select(available=True)
         if not halls:
             return []
         
-        target_hall = db.query(Hall).filter(Hall.id == hall_id).first()
+        target_hall = snapshot.get(hall_id)
         if not target_hall:
             raise HTTPException(status_code=404, detail="Hall not found")
-            
+
+        # Nearest neighbours from the index; over-fetch since unavailable or deleted halls are skipped
+        index = hall_embeddings.get_index()
+        if index is not None:
+            neighbours = (snapshot.get(similar_id) for similar_id, _ in index.similar(hall_id, 2 * top_n))
+            similar_ids = [hall.id for hall in neighbours if hall is not None and hall.available][:top_n]
+            if similar_ids:
+                return similar_ids
+
+        # No index yet, or the hall was added after it was built: score every hall
         similar_halls = recommendation_engine.get_similar_halls(hall_id, halls, top_n)
         
         if not similar_halls:
             other_halls = [h for h in halls if h.id != hall_id]
             similar_halls = preference_engine.get_popular_halls(other_halls, top_n)
         
-        return similar_halls
+        return [hall.id for hall in similar_halls]
+
+    try:
+        hall_ids = cache.get_or_load("recommendations", f"similar:{hall_id}:{top_n}", compute, ttl=RECOMMENDATION_TTL)
+        return _halls_by_ids(db, hall_ids)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in similar halls recommendation: {str(e)}")
         fallback_halls = db.query(Hall).filter(Hall.available == True, Hall.id != hall_id).limit(top_n).all()
@@ -171,22 +212,32 @@ def get_personalized_recommendations(
     current_user: User = Depends(get_current_user)
 ):
     try:
-        user_bookings = db.query(Booking).filter(
-            Booking.user_id == current_user.id
-        ).all()
-        
-        booked_hall_ids = [booking.hall_id for booking in user_bookings]
-        
-        halls = db.query(Hall).filter(Hall.available == True).all()
-        if not halls:
-            return []
-        
-        preference_engine.update_user_profile(current_user.id, booked_hall_ids, halls)
-        recommended_halls = preference_engine.recommend_for_user(current_user.id, halls, top_n)
-        
-        return recommended_halls
+        # Precomputed by the batch job; rescored here only after the user books
+        snapshot = get_snapshot(db)
+        stored = personalization.recommended_hall_ids(db, current_user.id, personalization.RECOMMENDATIONS_STORED)
+        # Halls that became unavailable since the last scoring are skipped
+        recommended = [hall for hall in map(snapshot.get, stored) if hall is not None and hall.available][:top_n]
+        if recommended:
+            return recommended
+        return preference_engine.get_popular_halls(snapshot.select(available=True), top_n)
         
     except Exception as e:
         print(f"Error in personalized recommendations: {str(e)}")
         fallback_halls = db.query(Hall).filter(Hall.available == True).limit(top_n).all()
-        return fallback_halls
\ No newline at end of file
+        return fallback_halls
+
+@router.get("/collaborative", response_model=List[HallResponse])
+def get_collaborative_recommendations(
+    top_n: int = 5,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Halls booked by customers who booked the same halls as this user"""
+    snapshot = get_snapshot(db)
+    model = collaborative.get_model()
+    ranked = model.recommend(personalization.booked_hall_ids(db, current_user.id)) if model else []
+    halls = (snapshot.get(hall_id) for hall_id, _ in ranked)
+    recommended = list(islice((hall for hall in halls if hall is not None and hall.available), top_n))
+    if recommended:
+        return recommended
+    return preference_engine.get_popular_halls(snapshot.select(available=True), top_n)
@@ -1,11 +1,13 @@
 # ==================== routers/analytics.py ====================
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
+from typing import Optional
 from database import get_db
 from auth import get_current_admin
-from models import User, Hall, Booking, BookingStatusEnum
+from models import User, Hall, Booking, BookingStatusEnum, BookingDailyStat
+from timeseries import get_series, ANALYTICS_TIMEZONE
 from sqlalchemy import func
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
 
@@ -53,19 +55,26 @@ def get_dashboard_stats(
 @router.get("/revenue")
 def get_revenue_analytics(
     period: str = "monthly",  # monthly, weekly, daily
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    hall_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_admin: User = Depends(get_current_admin)
 ):
-    # This would typically involve more complex date grouping
-    # Simplified version
+    # Both reads go to the daily rollup instead of scanning bookings
+    series = get_series(db, period=period, start=start, end=end, hall_id=hall_id)
+
     revenue_by_status = db.query(
-        Booking.status,
-        func.sum(Booking.total_amount).label('revenue')
-    ).group_by(Booking.status).all()
+        BookingDailyStat.status,
+        func.sum(BookingDailyStat.revenue).label('revenue')
+    ).group_by(BookingDailyStat.status).all()
     
     return {
+        "period": period,
+        "timezone": ANALYTICS_TIMEZONE,
+        "series": series,
         "revenue_by_status": [
             {"status": status.value, "revenue": revenue} 
             for status, revenue in revenue_by_status
         ]
-    }
\ No newline at end of file
+    }
@@ -4,8 +4,9 @@ from sqlalchemy.orm import Session
 from database import get_db
 from schemas import UserCreate, UserLogin, Token, ProfileUpdate, UserResponse
 from crud import create_user, get_user_by_email
-from auth import verify_password, create_access_token, get_current_user, get_password_hash  # Use auth.py functions
+from auth import verify_password, verify_and_update_password, create_access_token, get_current_user, get_password_hash  # Use auth.py functions
 from models import User
+from rate_limit import limiter, rate_limit
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
@@ -25,14 +26,25 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
             detail=str(e)
         )
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit("login"))])
 def login(user_data: UserLogin, db: Session = Depends(get_db)):
+    account = user_data.email.lower()
+    limiter.check("login_account", account, consume=False)
     user = get_user_by_email(db, user_data.email)
-    if not user or not verify_password(user_data.password, user.password):
+    verified, new_hash = verify_and_update_password(user_data.password, user.password) if user else (False, None)
+    if not verified:
+        # Only failures count against the account, the same for unknown emails
+        limiter.charge("login_account", account)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
+
+    # Stored hash used an older cost; upgrade it while we have the plain password
+    if new_hash:
+        user.password = new_hash
+        db.commit()
+        db.refresh(user)
     
     access_token = create_access_token(data={"sub": user.email})
     return {
@@ -45,8 +57,9 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
 def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+# Sync so bcrypt and DB work run in the threadpool, not on the event loop
 @router.put("/profile", response_model=UserResponse)
-async def update_profile(
+def update_profile(
     profile_data: ProfileUpdate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
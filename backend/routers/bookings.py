@@ -1,16 +1,17 @@
 # ==================== routers/bookings.py ====================
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime  # Add datetime import
 from database import get_db
-from schemas import BookingCreate, BookingResponse, BookingStatsResponse  # Add BookingStatsResponse import
+from schemas import BookingCreate, BookingQuote, BookingResponse, BookingStatsResponse  # Add BookingStatsResponse import
 from crud import (
-    create_booking, get_user_bookings, get_all_bookings,
+    create_booking, get_booking_quote, get_user_bookings, get_all_bookings,
     update_booking_status, cancel_booking
 )
 from auth import get_current_user, get_current_admin
 from models import User, BookingStatusEnum, Booking  # Add Booking import
+from exports import build_export_query, export_response
 
 router = APIRouter(prefix="/api/bookings", tags=["Bookings"])
 
@@ -22,6 +23,15 @@ def create_new_booking(
 ):
     return create_booking(db, booking, current_user.id)
 
+@router.post("/quote", response_model=BookingQuote)
+def quote_new_booking(
+    booking: BookingCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Price a booking exactly as creating it would, without booking"""
+    return get_booking_quote(db, booking)
+
 @router.get("/my-bookings", response_model=List[BookingResponse])
 def get_my_bookings(
     db: Session = Depends(get_db),
@@ -36,6 +46,20 @@ def list_all_bookings(
 ):
     return get_all_bookings(db)
 
+@router.get("/export")
+def export_all_bookings(
+    format: str = "csv",  # csv, ndjson
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    hall_id: Optional[int] = None,
+    status: Optional[BookingStatusEnum] = None,
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream every booking matching the filters as CSV or NDJSON"""
+    query = build_export_query(start=start, end=end, hall_id=hall_id, status=status)
+    return export_response(db, query, format, "bookings")
+
 @router.put("/{booking_id}/approve", response_model=BookingResponse)
 def approve_booking(
     booking_id: int,
@@ -61,7 +85,7 @@ def cancel_user_booking(
     return cancel_booking(db, booking_id, current_user.id)
 
 @router.get("/stats/user", response_model=BookingStatsResponse)  # Changed endpoint path
-async def get_booking_stats(
+def get_booking_stats(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
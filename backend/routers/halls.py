@@ -1,27 +1,46 @@
 # ==================== routers/halls.py ====================
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from database import get_db
-from schemas import HallCreate, HallResponse, HallUpdate, HallStatsResponse
+from schemas import HallCreate, HallResponse, HallUpdate, HallStatsResponse, HallFacetsResponse
 from crud import create_hall, get_halls, get_hall, update_hall, delete_hall
 from auth import get_current_admin, get_current_user, get_current_owner  # Add get_current_owner
 from models import User, Hall
-from sqlalchemy import or_
+from versioning import (
+    get_catalog_version, get_hall_version, make_etag, query_fingerprint,
+    etag_matches, not_modified, set_etag
+)
+from sqlalchemy import false, or_
+import catalog
+import facilities as facility_index
+import geo
+
+# Radius used when only lat/lng are given
+DEFAULT_RADIUS_KM = 25.0
 
 router = APIRouter(prefix="/api/halls", tags=["Halls"])
 
-@router.get("/", response_model=List[HallResponse])
-def list_halls(
-    skip: int = 0,
-    limit: int = 100,
-    search: Optional[str] = Query(None, description="Search by name, location, or facilities"),
-    min_capacity: Optional[int] = Query(None, description="Minimum capacity"),
-    max_price: Optional[float] = Query(None, description="Maximum price per hour"),
-    location: Optional[str] = Query(None, description="Filter by location"),
-    db: Session = Depends(get_db)
-):
+# sort option -> ORDER BY. Ties break on id in the same direction, so each order matches
+# one of the ix_halls_sort_* indexes exactly and a page is an index range scan, never a filesort.
+SORT_OPTIONS = {
+    "price": (Hall.price_per_hour.asc(), Hall.id.asc()),
+    "-price": (Hall.price_per_hour.desc(), Hall.id.desc()),
+    "capacity": (Hall.capacity.asc(), Hall.id.asc()),
+    "-capacity": (Hall.capacity.desc(), Hall.id.desc()),
+    "name": (Hall.name.asc(), Hall.id.asc()),
+}
+DEFAULT_ORDER = (Hall.id.asc(),)
+SORT_COLUMNS = {"price": Hall.price_per_hour, "capacity": Hall.capacity, "name": Hall.name}
+
+def filter_halls(db: Session, search: Optional[str] = None, min_capacity: Optional[int] = None,
+                 max_price: Optional[float] = None, location: Optional[str] = None,
+                 facilities: Optional[str] = None, available: Optional[bool] = None):
+    """Hall query with the catalog filters shared by the list and the facet counts"""
     query = db.query(Hall)
+
+    if available is not None:
+        query = query.filter(Hall.available == available)
     
     # Search functionality
     if search:
@@ -44,18 +63,127 @@ def list_halls(
     # Filter by location
     if location:
         query = query.filter(Hall.location.ilike(f"%{location}%"))
+
+    # Exact facility match: the hall must have every listed facility
+    if facilities:
+        ids = facility_index.facility_ids(db, facilities.split(","))
+        query = facility_index.filter_all(query, ids) if ids is not None else query.filter(false())
+
+    return query
+
+@router.get("/", response_model=List[HallResponse])
+def list_halls(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = Query(None, description="Search by name, location, or facilities"),
+    min_capacity: Optional[int] = Query(None, description="Minimum capacity"),
+    max_price: Optional[float] = Query(None, description="Maximum price per hour"),
+    location: Optional[str] = Query(None, description="Filter by location"),
+    facilities: Optional[str] = Query(None, description="Comma-separated facilities the hall must all have"),
+    available: Optional[bool] = Query(None, description="Only available (true) or unavailable (false) halls"),
+    sort: Optional[str] = Query(None, description="price, -price, capacity, -capacity or name; ties by id"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude to search around"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitude to search around"),
+    radius_km: Optional[float] = Query(None, gt=0, description="Only halls within this distance of lat/lng"),
+    nearest: Optional[int] = Query(None, gt=0, le=1000, description="Only the N halls nearest to lat/lng"),
+    db: Session = Depends(get_db)
+):
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat and lng must be given together")
+    if (radius_km or nearest) and lat is None:
+        raise HTTPException(status_code=400, detail="radius_km and nearest require lat and lng")
+    if sort is not None and sort not in SORT_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(SORT_OPTIONS)}")
+
+    # Plain catalog filters are answered from the in-memory snapshot, no query at all when it is fresh
+    if catalog.CATALOG_ENABLED and not (search or facilities or lat is not None):
+        snapshot = catalog.get_snapshot(db)
+        etag = make_etag("halls", snapshot.catalog_version, query_fingerprint(request))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+        return snapshot.select(min_capacity=min_capacity, max_price=max_price, location=location,
+                               available=available, sort=sort or "id", skip=skip, limit=limit)
+
+    # Conditional GET: the catalog version plus the filters identify the response
+    etag = make_etag("halls", get_catalog_version(db), query_fingerprint(request))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+
+    query = filter_halls(db, search, min_capacity, max_price, location, facilities, available)
+
+    # Location search: nearest first, with the distance in the response
+    if lat is not None:
+        if nearest:
+            pairs = geo.nearest_candidates(query, lat, lng, nearest, max_radius_km=radius_km)
+        else:
+            pairs = geo.radius_candidates(query, lat, lng, radius_km or DEFAULT_RADIUS_KM)
+        if sort:
+            # Explicit sort over the halls found around the point, before any full row is loaded
+            pairs = geo.order_candidates(query, pairs, SORT_COLUMNS[sort.lstrip("-")], sort.startswith("-"))
+        halls = []
+        for hall, distance in geo.load(query, pairs[skip:skip + limit]):
+            hall.distance_km = round(distance, 3)
+            halls.append(hall)
+        return halls
     
-    return query.offset(skip).limit(limit).all()
+    return query.order_by(*SORT_OPTIONS.get(sort, DEFAULT_ORDER)).offset(skip).limit(limit).all()
+
+@router.get("/facets", response_model=HallFacetsResponse)
+def hall_facets(
+    request: Request,
+    response: Response,
+    search: Optional[str] = Query(None, description="Search by name, location, or facilities"),
+    min_capacity: Optional[int] = Query(None, description="Minimum capacity"),
+    max_price: Optional[float] = Query(None, description="Maximum price per hour"),
+    location: Optional[str] = Query(None, description="Filter by location"),
+    facilities: Optional[str] = Query(None, description="Comma-separated facilities the hall must all have"),
+    available: Optional[bool] = Query(None, description="Only available (true) or unavailable (false) halls"),
+    db: Session = Depends(get_db)
+):
+    """Result count and per-facility counts for the same filters as the hall list"""
+    etag = make_etag("halls-facets", get_catalog_version(db), query_fingerprint(request))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+
+    query = filter_halls(db, search, min_capacity, max_price, location, facilities, available)
+    return {"total": query.order_by(None).count(), "facilities": facility_index.facet_counts(db, query)}
 
 @router.get("/available", response_model=List[HallResponse])
-def get_available_halls(db: Session = Depends(get_db)):
+def get_available_halls(request: Request, response: Response, db: Session = Depends(get_db)):
+    if catalog.CATALOG_ENABLED:
+        snapshot = catalog.get_snapshot(db)
+        etag = make_etag("halls-available", snapshot.catalog_version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+        return snapshot.select(available=True)
+
+    etag = make_etag("halls-available", get_catalog_version(db))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+
     return db.query(Hall).filter(Hall.available == True).all()
 
 @router.get("/{hall_id}", response_model=HallResponse)
-def get_hall_by_id(hall_id: int, db: Session = Depends(get_db)):
-    hall = get_hall(db, hall_id)
+def get_hall_by_id(hall_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = get_hall_version(db, hall_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Hall not found")
+    etag = make_etag("hall", hall_id, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # The body must be the version the ETag names, not an older cached copy
+    hall = get_hall(db, hall_id, version=version)
     if not hall:
         raise HTTPException(status_code=404, detail="Hall not found")
+    set_etag(response, make_etag("hall", hall_id, hall.version))
     return hall
 
 # Allow both admin and hall owners to create halls
@@ -97,7 +225,7 @@ def delete_hall_by_id(
         return delete_hall(db, hall_id, current_user.id)
 
 @router.get("/stats/owner", response_model=HallStatsResponse)
-async def get_hall_stats(
+def get_hall_stats(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -1,9 +1,10 @@
 # ==================== routers/owner.py ====================
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from typing import List
-from datetime import datetime, timedelta
+from sqlalchemy import func
+from typing import List, Optional
+from datetime import date, datetime, timedelta
 from pydantic import BaseModel  # Add this import
 
 from database import get_db
@@ -12,8 +13,12 @@ from crud import (
     create_hall, get_owner_halls, update_hall, delete_hall,
     get_owner_bookings, update_booking_status
 )
-from auth import get_current_user, get_current_owner
-from models import User, Hall, Booking
+from auth import get_current_user, get_current_owner, get_stream_owner, create_stream_token, STREAM_TOKEN_EXPIRE_SECONDS
+from models import User, Hall, Booking, BookingStatusEnum
+from timeseries import get_series, local_day, ANALYTICS_TIMEZONE
+from utilization import get_hall_occupancy
+from exports import build_export_query, export_response
+from owner_feed import feed
 
 router = APIRouter(prefix="/api/owner", tags=["Hall Owner"])
 
@@ -62,8 +67,24 @@ def get_owner_bookings_endpoint(
 ):
     return get_owner_bookings(db, current_user.id)
 
+@router.get("/bookings/export")
+def export_owner_bookings(
+    format: str = "csv",  # csv, ndjson
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    hall_id: Optional[int] = None,
+    status: Optional[BookingStatusEnum] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_owner)
+):
+    """Stream bookings for the owner's halls as CSV or NDJSON"""
+    query = build_export_query(
+        owner_id=current_user.id, start=start, end=end, hall_id=hall_id, status=status
+    )
+    return export_response(db, query, format, "owner-bookings")
+
 @router.get("/stats", response_model=OwnerStatsResponse)
-async def get_owner_stats(
+def get_owner_stats(
     current_user: User = Depends(get_current_owner),
     db: Session = Depends(get_db)
 ):
@@ -174,37 +195,56 @@ def reject_booking(
     db.refresh(booking)
     return {"message": "Booking rejected successfully", "booking": booking}
 
+# Live dashboard updates (Server-Sent Events)
+@router.post("/stream-token")
+def issue_stream_token(current_user: User = Depends(get_current_owner)):
+    """Short-lived token for EventSource, which cannot send an Authorization header"""
+    return {"stream_token": create_stream_token(current_user.email), "expires_in": STREAM_TOKEN_EXPIRE_SECONDS}
+
+@router.get("/stream")
+async def stream_owner_updates(
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_stream_owner)
+):
+    """Push booking_created / booking_status_changed deltas for the owner's halls"""
+    owner_id = current_user.id
+    # The stream never queries; return the connection to the pool instead of holding it open.
+    # async so this runs on the loop: under a burst of reconnects every threadpool worker can
+    # be waiting for a pooled connection, and a threaded close would never get to run
+    db.close()
+    return StreamingResponse(
+        feed.stream(owner_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Chart endpoints (keep as is)
 @router.get("/charts/booking-trends")
-async def get_booking_trends(
+def get_booking_trends(
     current_user: User = Depends(get_current_owner),
     db: Session = Depends(get_db)
 ):
     """Get booking trends for the last 6 months"""
     try:
-        six_months_ago = datetime.utcnow() - timedelta(days=180)
-        
-        monthly_data = db.query(
-            extract('month', Booking.created_at).label('month'),
-            extract('year', Booking.created_at).label('year'),
-            func.count(Booking.id).label('bookings'),
-            func.sum(Booking.total_amount).label('revenue')
-        ).join(Hall).filter(
-            Hall.owner_id == current_user.id,
-            Booking.created_at >= six_months_ago
-        ).group_by(
-            extract('year', Booking.created_at),
-            extract('month', Booking.created_at)
-        ).order_by('year', 'month').all()
+        end = local_day(datetime.utcnow())
+        series = get_series(
+            db,
+            period="monthly",
+            start=end - timedelta(days=180),
+            end=end,
+            owner_id=current_user.id,
+            revenue_statuses=None
+        )
         
         months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
         chart_data = []
         
-        for data in monthly_data:
+        for data in series:
             chart_data.append({
-                'month': months[data.month - 1],
-                'bookings': data.bookings,
-                'revenue': float(data.revenue or 0)
+                'month': months[int(data['period_start'][5:7]) - 1],
+                'bookings': data['bookings'],
+                'revenue': data['revenue']
             })
         
         return chart_data
@@ -212,27 +252,50 @@ async def get_booking_trends(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching chart data: {str(e)}")
 
+@router.get("/charts/revenue")
+def get_revenue_series(
+    period: str = "monthly",  # monthly, weekly, daily
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    hall_id: Optional[int] = None,
+    current_user: User = Depends(get_current_owner),
+    db: Session = Depends(get_db)
+):
+    """Time-bucketed bookings and revenue for the owner's halls, read from the daily rollup"""
+    series = get_series(
+        db,
+        period=period,
+        start=start,
+        end=end,
+        owner_id=current_user.id,
+        hall_id=hall_id
+    )
+    return {
+        "period": period,
+        "timezone": ANALYTICS_TIMEZONE,
+        "series": series
+    }
+
 @router.get("/charts/hall-performance")
-async def get_hall_performance(
+def get_hall_performance(
+    days: int = Query(30, ge=1, le=366, description="Window length in days, ending today"),
     current_user: User = Depends(get_current_owner),
     db: Session = Depends(get_db)
 ):
-    """Get performance data for each hall"""
+    """Get occupancy (booked hours / bookable hours) for each hall"""
     try:
-        hall_performance = db.query(
-            Hall.name,
-            func.count(Booking.id).label('bookings'),
-            func.avg(Booking.total_amount).label('avg_revenue')
-        ).outerjoin(Booking).filter(
-            Hall.owner_id == current_user.id
-        ).group_by(Hall.id, Hall.name).all()
+        halls = db.query(Hall.id, Hall.name).filter(Hall.owner_id == current_user.id).all()
+        occupancy = get_hall_occupancy(db, [hall.id for hall in halls], days=days)
         
         performance_data = []
-        for hall in hall_performance:
+        for hall in halls:
+            stats = occupancy[hall.id]
             performance_data.append({
                 'name': hall.name,
-                'bookings': hall.bookings,
-                'occupancy': min((hall.bookings / 30) * 100, 100)
+                'bookings': stats['bookings'],
+                'booked_hours': stats['booked_hours'],
+                'bookable_hours': stats['bookable_hours'],
+                'occupancy': stats['occupancy']
             })
         
         return performance_data
@@ -240,7 +303,7 @@ async def get_hall_performance(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching performance data: {str(e)}")
 @router.get("/debug/bookings")
-async def debug_owner_bookings(
+def debug_owner_bookings(
     current_user: User = Depends(get_current_owner),
     db: Session = Depends(get_db)
 ):
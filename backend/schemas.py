@@ -63,6 +63,8 @@ class HallBase(BaseModel):
     price_per_hour: Optional[float] = None
     facilities: Optional[str] = None
     location: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     image_url: Optional[str] = None
     available: bool = True
 
@@ -76,10 +78,20 @@ class HallResponse(HallBase):
     id: int
     owner_id: int
     owner: Optional[UserResponse] = None
+    distance_km: Optional[float] = None  # Only set by location searches
     
     class Config:
         from_attributes = True
 
+class FacetCount(BaseModel):
+    slug: str
+    name: str
+    count: int
+
+class HallFacetsResponse(BaseModel):
+    total: int
+    facilities: List[FacetCount]
+
 # Booking Schemas
 class BookingBase(BaseModel):
     hall_id: int
@@ -93,6 +105,14 @@ class BookingBase(BaseModel):
 class BookingCreate(BookingBase):
     pass
 
+class BookingQuote(BaseModel):
+    hall_id: int
+    start_time: datetime
+    end_time: datetime
+    hours: float
+    total_amount: float
+    available: bool
+
 class BookingResponse(BookingBase):
     id: int
     user_id: int
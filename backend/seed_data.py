@@ -0,0 +1,337 @@
+# ==================== seed_data.py ====================
+"""
+Deterministic synthetic data generator and bulk loader.
+
+Generates owners, customers, halls and bookings with plausible distributions
+(weekend/evening-heavy start times, event-type dependent durations, lead times,
+status depending on past/future) and streams them into the database in
+executemany batches. Bookings of one hall never overlap: every booking owns a
+distinct (day, morning/evening slot) pair and ends inside that slot.
+
+Examples (run from the backend directory):
+    python seed_data.py --reset --owners 10000 --halls 100000 --bookings 10000000
+    python seed_data.py --database-url sqlite:///./perf.db --reset --bookings 1000000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, func, insert, select
+
+import geo
+from database import Base
+from facilities import slugify
+from models import Booking, CatalogVersion, Facility, Hall, HallFacility, RoleEnum, User
+
+DEFAULT_PASSWORD = "password123"
+
+CITIES = ["Chennai", "Mumbai", "Delhi", "Bangalore", "Hyderabad", "Pune", "Kolkata", "Ahmedabad", "Jaipur", "Kochi"]
+# (latitude, longitude) of each city centre; halls scatter around it
+CITY_CENTERS = np.array([
+    (13.0827, 80.2707), (19.0760, 72.8777), (28.6139, 77.2090), (12.9716, 77.5946), (17.3850, 78.4867),
+    (18.5204, 73.8567), (22.5726, 88.3639), (23.0225, 72.5714), (26.9124, 75.7873), (9.9312, 76.2673),
+])
+CITY_SPREAD_KM = 12.0
+CITY_WEIGHTS = [0.14, 0.16, 0.15, 0.14, 0.1, 0.08, 0.08, 0.06, 0.05, 0.04]
+AREAS = ["Downtown", "Uptown", "Central", "Suburb", "Old City", "Tech Park", "Lakeside", "Airport Road"]
+FACILITIES = ["AC", "Parking", "Stage", "Catering", "WiFi", "Projector", "Sound System",
+              "Dance Floor", "Green Room", "Power Backup", "Valet", "Bar"]
+HALL_KINDS = ["Banquet Hall", "Convention Centre", "Conference Room", "Party Hall", "Mandapam", "Auditorium"]
+CAPACITIES = np.array([30, 50, 80, 100, 150, 200, 300, 500, 800, 1200])
+CAPACITY_WEIGHTS = np.array([0.06, 0.12, 0.14, 0.18, 0.16, 0.13, 0.1, 0.07, 0.03, 0.01])
+
+EVENT_TYPES = ["wedding", "conference", "meeting", "party", "birthday", "corporate"]
+EVENT_WEIGHTS = np.array([0.18, 0.14, 0.26, 0.2, 0.14, 0.08])
+# (min, max) hours per event type
+EVENT_DURATIONS = np.array([[5, 8], [4, 8], [1, 3], [3, 5], [2, 4], [2, 6]])
+
+# Each day has a morning slot (ends by 14:00) and an evening slot (ends by midnight)
+MORNING_STARTS, MORNING_WEIGHTS = np.array([8, 9, 10, 11]), np.array([0.2, 0.35, 0.3, 0.15])
+EVENING_STARTS = np.array([14, 15, 16, 17, 18, 19, 20])
+EVENING_WEIGHTS = np.array([0.08, 0.1, 0.12, 0.18, 0.24, 0.18, 0.1])
+SLOT_END = np.array([14, 24])
+
+PAST_STATUSES, PAST_WEIGHTS = ["COMPLETED", "CANCELLED", "REJECTED"], [0.8, 0.12, 0.08]
+FUTURE_STATUSES, FUTURE_WEIGHTS = ["APPROVED", "PENDING", "CANCELLED"], [0.55, 0.35, 0.1]
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_users(rng, owners, users, password, now):
+    yield {"id": 1, "email": "admin@example.com", "password": password, "full_name": "Admin",
+           "phone": None, "role": RoleEnum.ADMIN, "created_at": now}
+    for index in range(owners):
+        yield {"id": 2 + index, "email": f"owner{index}@example.com", "password": password,
+               "full_name": f"Owner {index}", "phone": f"9{rng.integers(10**8, 10**9)}",
+               "role": RoleEnum.HALL_OWNER, "created_at": now}
+    for index in range(users):
+        yield {"id": 2 + owners + index, "email": f"user{index}@example.com", "password": password,
+               "full_name": f"User {index}", "phone": None, "role": RoleEnum.USER, "created_at": now}
+
+
+def generate_halls(rng, halls, owners):
+    """Hall attributes as arrays; owners get a skewed number of halls"""
+    owner_weights = rng.pareto(1.5, owners) + 1
+    owner_ids = rng.choice(owners, size=halls, p=owner_weights / owner_weights.sum()) + 2
+    capacities = rng.choice(CAPACITIES, size=halls, p=CAPACITY_WEIGHTS)
+    cities = rng.choice(len(CITIES), size=halls, p=CITY_WEIGHTS)
+    # Price grows with capacity, with city-level and per-hall noise
+    city_factor = np.linspace(1.3, 0.8, len(CITIES))[cities]
+    prices = np.round(400 + capacities * 6 * city_factor * rng.lognormal(0, 0.25, halls), -1)
+    # Separate stream, so adding coordinates did not change the rest of the data for a seed
+    geo_rng = np.random.default_rng(rng.bit_generator.seed_seq.spawn(1)[0])
+    offsets_km = geo_rng.normal(0, CITY_SPREAD_KM / 2, (halls, 2))
+    latitudes = CITY_CENTERS[cities, 0] + offsets_km[:, 0] / geo.KM_PER_DEGREE
+    longitudes = CITY_CENTERS[cities, 1] + offsets_km[:, 1] / (
+        geo.KM_PER_DEGREE * np.cos(np.radians(CITY_CENTERS[cities, 0])))
+    return {
+        "owner_ids": owner_ids,
+        "capacities": capacities,
+        "cities": cities,
+        "areas": rng.integers(0, len(AREAS), halls),
+        "kinds": rng.integers(0, len(HALL_KINDS), halls),
+        "prices": prices,
+        "available": rng.random(halls) > 0.08,
+        "facility_masks": rng.random((halls, len(FACILITIES))) < 0.45,
+        "latitudes": np.round(latitudes, 6),
+        "longitudes": np.round(longitudes, 6),
+    }
+
+
+def iter_halls(attrs):
+    for index in range(len(attrs["owner_ids"])):
+        city, area = CITIES[attrs["cities"][index]], AREAS[attrs["areas"][index]]
+        facilities = [name for name, present in zip(FACILITIES, attrs["facility_masks"][index]) if present]
+        yield {
+            "id": index + 1,
+            "name": f"{area} {HALL_KINDS[attrs['kinds'][index]]} {index + 1}",
+            "description": f"{HALL_KINDS[attrs['kinds'][index]]} in {area}, {city} for up to "
+                           f"{attrs['capacities'][index]} guests.",
+            "capacity": int(attrs["capacities"][index]),
+            "price_per_hour": float(attrs["prices"][index]),
+            "facilities": ", ".join(facilities) or "Parking",
+            "location": f"{area}, {city}",
+            "latitude": float(attrs["latitudes"][index]),
+            "longitude": float(attrs["longitudes"][index]),
+            # Bulk inserts skip ORM events, so compute the geohash here
+            "geohash": geo.encode(attrs["latitudes"][index], attrs["longitudes"][index]),
+            "image_url": None,
+            "available": bool(attrs["available"][index]),
+            "owner_id": int(attrs["owner_ids"][index]),
+            "version": 1,
+        }
+
+
+def iter_hall_facilities(attrs):
+    """hall_facilities rows matching the text written by iter_halls (ids follow FACILITIES)"""
+    parking = FACILITIES.index("Parking") + 1
+    for index, mask in enumerate(attrs["facility_masks"]):
+        facility_ids = np.flatnonzero(mask) + 1
+        for facility_id in (facility_ids if len(facility_ids) else [parking]):
+            yield {"hall_id": index + 1, "facility_id": int(facility_id)}
+
+
+def iter_bookings(rng, attrs, total_bookings, users, first_user_id, window_start, days, now, chunk_halls=2000):
+    """Stream booking rows hall chunk by hall chunk; memory is bounded by the chunk"""
+    halls = len(attrs["owner_ids"])
+    n_slots = days * 2
+
+    # Slot weights: weekends x2, evenings x1.5
+    weekdays = (np.arange(days) + window_start.weekday()) % 7
+    day_weight = np.where(weekdays >= 5, 2.0, 1.0)
+    slot_weight = np.repeat(day_weight, 2) * np.tile([1.0, 1.5], days)
+    slot_weight /= slot_weight.sum()
+
+    # Popular halls get more bookings (lognormal popularity), capped by free slots
+    popularity = rng.lognormal(0, 0.6, halls)
+    counts = rng.poisson(total_bookings * popularity / popularity.sum())
+    counts = np.minimum(counts, n_slots)
+
+    booking_id = 1
+    for chunk_start in range(0, halls, chunk_halls):
+        chunk = range(chunk_start, min(halls, chunk_start + chunk_halls))
+        hall_index = np.repeat(np.array(chunk), counts[chunk.start:chunk.stop])
+        if not len(hall_index):
+            continue
+        slots = np.concatenate([
+            rng.choice(n_slots, size=counts[index], replace=False, p=slot_weight) for index in chunk
+            if counts[index]
+        ])
+        size = len(slots)
+        day, evening = slots // 2, slots % 2
+
+        event = rng.choice(len(EVENT_TYPES), size=size, p=EVENT_WEIGHTS)
+        start_hour = np.where(
+            evening == 1,
+            rng.choice(EVENING_STARTS, size=size, p=EVENING_WEIGHTS),
+            rng.choice(MORNING_STARTS, size=size, p=MORNING_WEIGHTS),
+        )
+        duration = rng.integers(EVENT_DURATIONS[event, 0], EVENT_DURATIONS[event, 1] + 1)
+        duration = np.minimum(duration, SLOT_END[evening] - start_hour)
+
+        base = np.datetime64(window_start, "h")
+        starts = base + (day * 24 + start_hour).astype("timedelta64[h]")
+        ends = starts + duration.astype("timedelta64[h]")
+        lead_minutes = (rng.exponential(21 * 24 * 60, size) + 60).astype("int64")
+        created = starts - lead_minutes.astype("timedelta64[m]")
+        now64 = np.datetime64(now, "m")
+        created = np.minimum(created, now64 - rng.integers(1, 600, size).astype("timedelta64[m]"))
+
+        past = ends < np.datetime64(now, "h")
+        status = np.where(
+            past,
+            rng.choice(PAST_STATUSES, size=size, p=PAST_WEIGHTS),
+            rng.choice(FUTURE_STATUSES, size=size, p=FUTURE_WEIGHTS),
+        )
+        capacity = attrs["capacities"][hall_index]
+        attendees = np.maximum(10, (capacity * rng.uniform(0.3, 1.0, size)).astype("int64"))
+        amounts = np.round(duration * attrs["prices"][hall_index], 2)
+        user_ids = first_user_id + rng.integers(0, users, size)
+
+        starts_py = starts.astype("datetime64[s]").tolist()
+        ends_py = ends.astype("datetime64[s]").tolist()
+        created_py = created.astype("datetime64[s]").tolist()
+        for offset in range(size):
+            kind = EVENT_TYPES[event[offset]]
+            yield {
+                "id": booking_id,
+                "user_id": int(user_ids[offset]),
+                "hall_id": int(hall_index[offset]) + 1,
+                "start_time": starts_py[offset],
+                "end_time": ends_py[offset],
+                "event_name": f"{kind.title()} #{booking_id}",
+                "event_type": kind,
+                "attendees": int(attendees[offset]),
+                "total_amount": float(amounts[offset]),
+                "status": str(status[offset]),
+                "created_at": created_py[offset],
+                "remarks": None,
+            }
+            booking_id += 1
+
+
+def _prepare_connection(conn):
+    # Bulk load settings; integrity is guaranteed by construction
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        conn.exec_driver_sql("PRAGMA journal_mode=MEMORY")
+    elif conn.dialect.name == "mysql":
+        conn.exec_driver_sql("SET unique_checks=0")
+        conn.exec_driver_sql("SET foreign_key_checks=0")
+
+
+def _load(engine, table, rows, batch_size, log, label):
+    started = time.perf_counter()
+    loaded = 0
+    with engine.connect() as conn:
+        _prepare_connection(conn)
+        for batch in _batched(rows, batch_size):
+            conn.execute(insert(table), batch)
+            conn.commit()
+            loaded += len(batch)
+            if loaded % (batch_size * 50) < batch_size:
+                log(f"  {label}: {loaded:,} rows ({loaded / (time.perf_counter() - started):,.0f}/s)")
+    log(f"  {label}: {loaded:,} rows in {time.perf_counter() - started:.1f}s")
+    return loaded
+
+
+def generate(engine, owners=10000, halls=100000, users=200000, bookings=10000000, seed=42,
+             batch_size=10000, months_back=18, months_ahead=6, reset=False, rollups=True,
+             password_hash=None, now=None, log=print):
+    """Generate and load the whole dataset; returns row counts"""
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(User.__table__)).scalar():
+            raise SystemExit("Database is not empty; pass --reset to drop and recreate the tables")
+
+    if password_hash is None:
+        from auth import get_password_hash
+        # One hash shared by every generated account; bcrypt per user would dominate the load
+        password_hash = get_password_hash(DEFAULT_PASSWORD)
+
+    rng = np.random.default_rng(seed)
+    now = (now or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+    window_start = (now - timedelta(days=30 * months_back)).replace(hour=0)
+    days = 30 * (months_back + months_ahead)
+
+    log(f"Loading {owners:,} owners, {users:,} users, {halls:,} halls, ~{bookings:,} bookings (seed={seed})")
+    counts = {}
+    counts["users"] = _load(engine, User.__table__, iter_users(rng, owners, users, password_hash, now),
+                            batch_size, log, "users")
+    attrs = generate_halls(rng, halls, owners)
+    counts["halls"] = _load(engine, Hall.__table__, iter_halls(attrs), batch_size, log, "halls")
+    with engine.begin() as conn:
+        conn.execute(insert(Facility.__table__), [
+            {"id": index + 1, "slug": slugify(name), "name": name} for index, name in enumerate(FACILITIES)
+        ])
+    _load(engine, HallFacility.__table__, iter_hall_facilities(attrs), batch_size, log, "hall facilities")
+    counts["bookings"] = _load(
+        engine, Booking.__table__,
+        iter_bookings(rng, attrs, bookings, users, owners + 2, window_start, days, now),
+        batch_size, log, "bookings"
+    )
+
+    with engine.begin() as conn:
+        conn.execute(insert(CatalogVersion.__table__), [{"name": "halls", "version": 2}])
+
+    if rollups:
+        from sqlalchemy.orm import Session
+        from demand_forecast import rebuild_demand
+        from timeseries import rebuild_daily_stats
+        from utilization import rebuild_utilization
+
+        started = time.perf_counter()
+        with Session(engine) as session:
+            rebuild_daily_stats(session)
+            rebuild_utilization(session)
+            rebuild_demand(session, now=now)
+        log(f"  rollups rebuilt in {time.perf_counter() - started:.1f}s")
+
+    counts.update({"owners": owners, "customers": users, "first_user_id": owners + 2})
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL from the environment / .env")
+    parser.add_argument("--owners", type=int, default=10000)
+    parser.add_argument("--halls", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=200000, help="customer accounts")
+    parser.add_argument("--bookings", type=int, default=10000000, help="approximate total bookings")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--months-back", type=int, default=18)
+    parser.add_argument("--months-ahead", type=int, default=6)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    parser.add_argument("--skip-rollups", action="store_true", help="do not rebuild analytics rollups")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from database import DATABASE_URL
+        engine = create_engine(DATABASE_URL)
+
+    started = time.perf_counter()
+    counts = generate(
+        engine, owners=args.owners, halls=args.halls, users=args.users, bookings=args.bookings,
+        seed=args.seed, batch_size=args.batch_size, months_back=args.months_back,
+        months_ahead=args.months_ahead, reset=args.reset, rollups=not args.skip_rollups
+    )
+    print(f"Done in {time.perf_counter() - started:.1f}s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
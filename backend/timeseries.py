@@ -0,0 +1,259 @@
+# ==================== timeseries.py ====================
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+from zoneinfo import ZoneInfo
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from database import upsert
+from events import BookingCreated, BookingStatusChanged, status_move, subscribe
+from models import Booking, BookingDailyStat, BookingStatusEnum, Hall
+
+# Day boundaries for every bucket are taken in this timezone
+ANALYTICS_TIMEZONE = os.getenv("ANALYTICS_TIMEZONE", "UTC")
+
+# Accept both the API wording (daily/weekly/monthly) and the bucket names
+PERIODS = {
+    "daily": "day",
+    "day": "day",
+    "weekly": "week",
+    "week": "week",
+    "monthly": "month",
+    "month": "month",
+}
+
+# Default window (in buckets) when the caller does not pass a start date
+DEFAULT_BUCKETS = {"day": 30, "week": 12, "month": 12}
+
+# Statuses that count as earned revenue (same as the owner stats endpoint)
+REVENUE_STATUSES = (BookingStatusEnum.APPROVED, BookingStatusEnum.COMPLETED)
+
+
+def get_timezone() -> ZoneInfo:
+    return ZoneInfo(ANALYTICS_TIMEZONE)
+
+
+def local_time(moment: datetime) -> datetime:
+    """Convert a naive UTC timestamp (as stored in the DB) or an aware one to analytics local time"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(get_timezone())
+
+
+def local_day(moment: datetime) -> date:
+    """Convert a naive UTC timestamp (as stored in the DB) to the analytics local day"""
+    return local_time(moment).date()
+
+
+def normalize_period(period: str) -> str:
+    bucket = PERIODS.get((period or "").lower())
+    if bucket is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid period, expected one of: daily, weekly, monthly"
+        )
+    return bucket
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        # ISO weeks start on Monday
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return start + timedelta(days=1)
+
+
+def bucket_label(start: date, bucket: str) -> str:
+    if bucket == "week":
+        iso_year, iso_week, _ = start.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    if bucket == "month":
+        return start.strftime("%Y-%m")
+    return start.isoformat()
+
+
+def iter_buckets(start: date, end: date, bucket: str) -> List[date]:
+    """All bucket starts covering [start, end], so empty periods show up as zeros"""
+    buckets = []
+    current = bucket_start(start, bucket)
+    while current <= end:
+        buckets.append(current)
+        current = next_bucket(current, bucket)
+    return buckets
+
+
+def default_window(bucket: str, end: Optional[date] = None):
+    end = end or local_day(datetime.utcnow())
+    start = bucket_start(end, bucket)
+    for _ in range(DEFAULT_BUCKETS[bucket] - 1):
+        start = bucket_start(start - timedelta(days=1), bucket)
+    return start, end
+
+
+# ---------- Rollup maintenance ----------
+
+def _bump(db: Session, day: date, hall_id: int, owner_id: int,
+          status: BookingStatusEnum, bookings: int, revenue: float):
+    upsert(db, BookingDailyStat, {
+        "day": day,
+        "hall_id": hall_id,
+        "owner_id": owner_id,
+        "status": status,
+        "bookings": bookings,
+        "revenue": revenue
+    }, keys=("day", "hall_id", "status"), increments={"bookings": bookings, "revenue": revenue})
+
+
+def record_booking_change(db: Session, booking: Booking, owner_id: int, old_status=None, new_status=None):
+    """Apply a booking insert (old_status=None) or status move to the daily rollup.
+
+    Runs as a transaction subscriber of the booking events, so the rollup and
+    the booking change land in the same transaction. new_status defaults to
+    the row's current status.
+    """
+    new_status = BookingStatusEnum(new_status or booking.status or BookingStatusEnum.PENDING)
+    old_status = BookingStatusEnum(old_status) if old_status is not None else None
+    if old_status == new_status:
+        return
+
+    day = local_day(booking.created_at or datetime.utcnow())
+    amount = booking.total_amount or 0.0
+
+    if old_status is not None:
+        _bump(db, day, booking.hall_id, owner_id, old_status, -1, -amount)
+    _bump(db, day, booking.hall_id, owner_id, new_status, 1, amount)
+
+
+@subscribe((BookingCreated, BookingStatusChanged), phase="transaction")
+def _on_booking_event(db: Session, event):
+    booking = db.get(Booking, event.booking_id)
+    record_booking_change(db, booking, db.get(Hall, event.hall_id).owner_id, *status_move(event))
+
+
+def rebuild_daily_stats(db: Session, halls_per_chunk: int = 500):
+    """Recompute the whole rollup from the bookings table (backfill / repair).
+
+    Works through hall id ranges so memory stays bounded on large tables.
+    """
+    db.query(BookingDailyStat).delete(synchronize_session=False)
+    max_hall_id = db.query(func.max(Hall.id)).scalar() or 0
+    written = 0
+
+    for first_hall_id in range(1, max_hall_id + 1, halls_per_chunk):
+        totals = defaultdict(lambda: [0, 0.0])
+        owners = {}
+        rows = db.query(
+            Booking.hall_id, Booking.status, Booking.created_at, Booking.total_amount, Hall.owner_id
+        ).join(Hall, Hall.id == Booking.hall_id).filter(
+            Booking.hall_id >= first_hall_id,
+            Booking.hall_id < first_hall_id + halls_per_chunk
+        ).all()
+
+        for hall_id, status, created_at, total_amount, owner_id in rows:
+            key = (local_day(created_at or datetime.utcnow()), hall_id, BookingStatusEnum(status))
+            totals[key][0] += 1
+            totals[key][1] += total_amount or 0.0
+            owners[hall_id] = owner_id
+
+        db.bulk_insert_mappings(BookingDailyStat, [
+            {
+                "day": day,
+                "hall_id": hall_id,
+                "owner_id": owners[hall_id],
+                "status": status,
+                "bookings": count,
+                "revenue": revenue
+            }
+            for (day, hall_id, status), (count, revenue) in totals.items()
+        ])
+        written += len(totals)
+
+    db.commit()
+    return written
+
+
+# ---------- Series queries ----------
+
+def get_series(
+    db: Session,
+    period: str = "monthly",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    owner_id: Optional[int] = None,
+    hall_id: Optional[int] = None,
+    revenue_statuses: Optional[Iterable[BookingStatusEnum]] = REVENUE_STATUSES
+):
+    """Bookings and revenue per day / ISO week / month, gaps filled with zeros.
+
+    Reads only the daily rollup, so the cost is one indexed range read of at most
+    one row per day in the window. revenue_statuses=None sums every status.
+    """
+    bucket = normalize_period(period)
+    if start is None:
+        start, default_end = default_window(bucket, end)
+        end = end or default_end
+    end = end or local_day(datetime.utcnow())
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    if revenue_statuses is None:
+        revenue_column = BookingDailyStat.revenue
+    else:
+        revenue_column = case(
+            (BookingDailyStat.status.in_(list(revenue_statuses)), BookingDailyStat.revenue),
+            else_=0.0
+        )
+
+    query = db.query(
+        BookingDailyStat.day,
+        func.sum(BookingDailyStat.bookings).label("bookings"),
+        func.sum(revenue_column).label("revenue")
+    ).filter(
+        BookingDailyStat.day >= bucket_start(start, bucket),
+        BookingDailyStat.day <= end
+    )
+    if owner_id is not None:
+        query = query.filter(BookingDailyStat.owner_id == owner_id)
+    if hall_id is not None:
+        query = query.filter(BookingDailyStat.hall_id == hall_id)
+
+    totals = defaultdict(lambda: [0, 0.0])
+    for day, bookings, revenue in query.group_by(BookingDailyStat.day).all():
+        slot = totals[bucket_start(day, bucket)]
+        slot[0] += int(bookings or 0)
+        slot[1] += float(revenue or 0)
+
+    return [
+        {
+            "period_start": slot_start.isoformat(),
+            "label": bucket_label(slot_start, bucket),
+            "bookings": totals[slot_start][0],
+            "revenue": round(totals[slot_start][1], 2)
+        }
+        for slot_start in iter_buckets(start, end, bucket)
+    ]
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild_daily_stats(session)} daily rollup rows")
+    finally:
+        session.close()
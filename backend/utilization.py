@@ -0,0 +1,137 @@
+# ==================== utilization.py ====================
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import os
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import upsert
+from events import BookingCreated, BookingStatusChanged, status_move, subscribe
+from models import Booking, BookingStatusEnum, HallDailyUtilization
+from timeseries import get_timezone, local_day
+
+# Hours a hall can be booked on a single day; occupancy is booked / bookable
+BOOKABLE_HOURS_PER_DAY = float(os.getenv("BOOKABLE_HOURS_PER_DAY", 12))
+
+# Only confirmed bookings occupy the hall
+OCCUPYING_STATUSES = (BookingStatusEnum.APPROVED, BookingStatusEnum.COMPLETED)
+
+
+def _is_occupying(status) -> bool:
+    return status is not None and BookingStatusEnum(status) in OCCUPYING_STATUSES
+
+
+def split_hours_by_day(start_time: datetime, end_time: datetime) -> Dict[date, float]:
+    """Break a booking (naive UTC timestamps) into booked hours per local day"""
+    tz = get_timezone()
+    current = start_time.replace(tzinfo=timezone.utc).astimezone(tz)
+    end = end_time.replace(tzinfo=timezone.utc).astimezone(tz)
+
+    hours = {}
+    while current < end:
+        next_midnight = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+        chunk_end = min(end, next_midnight)
+        hours[current.date()] = hours.get(current.date(), 0.0) + (chunk_end - current).total_seconds() / 3600
+        current = chunk_end
+    return hours
+
+
+def _bump(db: Session, hall_id: int, day: date, hours: float, bookings: int):
+    upsert(db, HallDailyUtilization, {"hall_id": hall_id, "day": day, "booked_hours": hours, "bookings": bookings},
+           keys=("hall_id", "day"), increments={"booked_hours": hours, "bookings": bookings})
+
+
+def record_utilization_change(db: Session, booking: Booking, old_status=None, new_status=None):
+    """Add or remove a booking's hours when it enters or leaves an occupying status"""
+    was_occupying = _is_occupying(old_status)
+    is_occupying = _is_occupying(new_status or booking.status)
+    if was_occupying == is_occupying:
+        return
+
+    sign = 1 if is_occupying else -1
+    first_day = local_day(booking.start_time)
+    for day, hours in split_hours_by_day(booking.start_time, booking.end_time).items():
+        _bump(db, booking.hall_id, day, sign * hours, sign if day == first_day else 0)
+
+
+@subscribe((BookingCreated, BookingStatusChanged), phase="transaction")
+def _on_booking_event(db: Session, event):
+    record_utilization_change(db, db.get(Booking, event.booking_id), *status_move(event))
+
+
+def rebuild_utilization(db: Session, halls_per_chunk: int = 500):
+    """Recompute the utilization table from confirmed bookings (backfill / repair)"""
+    db.query(HallDailyUtilization).delete(synchronize_session=False)
+    max_hall_id = db.query(func.max(Booking.hall_id)).scalar() or 0
+    written = 0
+
+    for first_hall_id in range(1, max_hall_id + 1, halls_per_chunk):
+        totals = defaultdict(lambda: [0.0, 0])
+        rows = db.query(Booking.hall_id, Booking.start_time, Booking.end_time).filter(
+            Booking.hall_id >= first_hall_id,
+            Booking.hall_id < first_hall_id + halls_per_chunk,
+            Booking.status.in_(OCCUPYING_STATUSES)
+        ).all()
+
+        for hall_id, start_time, end_time in rows:
+            first_day = local_day(start_time)
+            for day, hours in split_hours_by_day(start_time, end_time).items():
+                totals[(hall_id, day)][0] += hours
+                if day == first_day:
+                    totals[(hall_id, day)][1] += 1
+
+        db.bulk_insert_mappings(HallDailyUtilization, [
+            {"hall_id": hall_id, "day": day, "booked_hours": hours, "bookings": bookings}
+            for (hall_id, day), (hours, bookings) in totals.items()
+        ])
+        written += len(totals)
+
+    db.commit()
+    return written
+
+
+def get_hall_occupancy(db: Session, hall_ids: List[int], days: int = 30, end: Optional[date] = None):
+    """Booked hours, bookings and occupancy % per hall over the last `days` local days.
+
+    Reads at most `days` rollup rows per hall through the (hall_id, day) index,
+    independent of how much booking history the hall has.
+    """
+    end = end or local_day(datetime.utcnow())
+    start = end - timedelta(days=days - 1)
+    bookable_hours = days * BOOKABLE_HOURS_PER_DAY
+
+    usage = {hall_id: (0.0, 0) for hall_id in hall_ids}
+    if hall_ids:
+        rows = db.query(
+            HallDailyUtilization.hall_id,
+            func.sum(HallDailyUtilization.booked_hours),
+            func.sum(HallDailyUtilization.bookings)
+        ).filter(
+            HallDailyUtilization.hall_id.in_(hall_ids),
+            HallDailyUtilization.day >= start,
+            HallDailyUtilization.day <= end
+        ).group_by(HallDailyUtilization.hall_id).all()
+        for hall_id, hours, bookings in rows:
+            usage[hall_id] = (float(hours or 0), int(bookings or 0))
+
+    return {
+        hall_id: {
+            "booked_hours": round(hours, 2),
+            "bookable_hours": bookable_hours,
+            "bookings": bookings,
+            "occupancy": round(min(hours / bookable_hours * 100, 100), 2) if bookable_hours else 0.0
+        }
+        for hall_id, (hours, bookings) in usage.items()
+    }
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild_utilization(session)} utilization rows")
+    finally:
+        session.close()
@@ -0,0 +1,97 @@
+# ==================== versioning.py ====================
+from hashlib import sha1
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from cache import invalidate_on_commit
+from database import upsert
+from catalog import log_owner_halls
+from events import UserChanged, subscribe
+from models import CatalogVersion, Hall
+
+HALL_CATALOG = "halls"
+# User fields nested in hall responses (the owner)
+OWNER_FIELDS = frozenset({"email", "full_name", "phone", "role"})
+
+
+# ---------- Version counters ----------
+
+def bump_catalog_version(db: Session, name: str = HALL_CATALOG):
+    """Increment a collection version; call before db.commit() of the change"""
+    # A missing row reads as version 1, so the first bump stores 2
+    upsert(db, CatalogVersion, {"name": name, "version": 2}, keys=("name",), increments={"version": 1})
+    if name == HALL_CATALOG:
+        # Recommendations are computed over the whole catalog
+        invalidate_on_commit(db, "recommendations")
+
+
+def get_catalog_version(db: Session, name: str = HALL_CATALOG) -> int:
+    # Single primary key lookup returning a scalar, no ORM objects are built
+    return db.query(CatalogVersion.version).filter(CatalogVersion.name == name).scalar() or 1
+
+
+def bump_hall_version(db: Session, hall: Hall):
+    hall.version = (hall.version or 1) + 1
+    bump_catalog_version(db)
+
+
+def bump_owner_halls(db: Session, owner_id: int):
+    """Owner details are nested in every hall response, so their halls change with them"""
+    updated = db.query(Hall).filter(Hall.owner_id == owner_id).update(
+        {Hall.version: Hall.version + 1}, synchronize_session=False
+    )
+    if updated:
+        bump_catalog_version(db)
+        invalidate_on_commit(db, "halls")
+        # Bulk update: no mapper events, so log the halls for the catalog snapshots here
+        log_owner_halls(db, owner_id)
+
+
+@subscribe(UserChanged, phase="transaction")
+def _on_user_changed(db: Session, event: UserChanged):
+    # Owner details are embedded in hall responses, so their halls change with them
+    if not event.created and not event.deleted and event.changed & OWNER_FIELDS:
+        bump_owner_halls(db, event.user_id)
+
+
+def get_hall_version(db: Session, hall_id: int) -> Optional[int]:
+    return db.query(Hall.version).filter(Hall.id == hall_id).scalar()
+
+
+# ---------- Conditional GET helpers ----------
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def query_fingerprint(request: Request) -> str:
+    """Stable digest of the query string, so each filter combination has its own ETag"""
+    items = sorted(request.query_params.multi_items())
+    return sha1(repr(items).encode()).hexdigest()[:16]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"